@@ -17,8 +17,8 @@ version = '0.' + count_travis()
 @init
 def set_properties(project):
     project.depends_on('imageio')
-    project.depends_on('numpy')
-    project.depends_on('scikit-image')
+    # sliding_window_view needs numpy 1.20
+    project.depends_on('numpy', '>=1.20')
     project.depends_on('scipy')
     project.depends_on('docopt')
     
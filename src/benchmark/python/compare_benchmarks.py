@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Compare two result files of run_benchmarks.py
+
+Usage:
+    compare_benchmarks.py BASELINE CANDIDATE
+
+Ratios are candidate time over baseline time, so values below 1 are
+speedups.
+"""
+import json
+
+from docopt import docopt
+
+PARAMETERS = ['shape', 'noise', 'glints', 'downsample', 'step', 'npoints',
+              'module']
+
+
+def describe(result):
+    return ', '.join('{}={}'.format(key, result[key])
+                     for key in PARAMETERS if key in result)
+
+
+def compare(baseline, candidate):
+    for benchmark in ['image2position', 'coarse_to_fine',
+                      'adaptive_threshold', 'wait_for_fixation',
+                      'estimate_matrices', 'import']:
+        if benchmark not in baseline or benchmark not in candidate:
+            continue
+        print(benchmark)
+        for old, new in zip(baseline[benchmark], candidate[benchmark]):
+            print('  {:40s} {:10.3f} ms -> {:10.3f} ms  ({:.2f}x)'.format(
+                describe(old), 1000*old['best_s'], 1000*new['best_s'],
+                new['best_s']/old['best_s']))
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    with open(args['BASELINE']) as f:
+        baseline = json.load(f)
+    with open(args['CANDIDATE']) as f:
+        candidate = json.load(f)
+    print('{} -> {}'.format(baseline['revision'], candidate['revision']))
+    compare(baseline, candidate)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""
+Compare seeded region growing to labelling the full frame
+
+Usage:
+    region_growing_benchmark.py [options]
+
+Options:
+    -n N, --repeats=N
+        Number of calls per measurement [Default: 50]
+    -g N, --glints=N
+        Number of specular glints in the frame [Default: 300]
+"""
+import timeit
+
+from docopt import docopt
+
+from vyu.image import image2position
+from vyu.synthetic import make_eye_frame
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    repeats = int(args['--repeats'])
+    frame = make_eye_frame((480, 640), noise=10,
+                           glints=int(args['--glints']))
+
+    assert (image2position(frame, seeded=True) ==
+            image2position(frame, seeded=False))
+
+    for seeded in [False, True]:
+        duration = timeit.timeit(lambda: image2position(frame, seeded=seeded),
+                                 number=repeats) / repeats
+        print('seeded={}: {:.3f} ms per frame'.format(seeded, 1000*duration))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Run the benchmark suite on synthetic eye images
+
+Usage:
+    run_benchmarks.py [options]
+
+Options:
+    -o FILE, --output=FILE
+        Write results as json to FILE instead of stdout
+    -n N, --repeats=N
+        Number of repetitions per measurement [Default: 20]
+    -q, --quick
+        Only run the smallest configurations
+"""
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+from docopt import docopt
+
+from vyu import area, calibration
+from vyu.image import (AdaptiveThreshold, PupilLocator, image2position,
+                       rgb2gray)
+from vyu.synthetic import SyntheticReader, make_eye_frame, make_trajectory
+from vyu.tracker import EyeTracker
+
+RESOLUTIONS = [(240, 320), (480, 640), (1080, 1920)]
+NOISE_LEVELS = [0., 10.]
+GLINT_COUNTS = [0, 100]
+CALIBRATION_POINTS = [5, 9, 25]
+DOWNSAMPLE_FACTORS = [4, 8]
+HISTOGRAM_STEPS = [1, 4, 8]
+# numpy is the baseline, every script pays for it anyway
+IMPORTED_MODULES = ['numpy', 'vyu.image', 'vyu.tracker']
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_call(func, repeats):
+    # Best of the per-call times, which is the least affected by other load
+    timer = timeit.Timer(func)
+    times = timer.repeat(repeat=repeats, number=1)
+    return {'best_s': min(times), 'median_s': float(np.median(times))}
+
+
+def benchmark_image2position(resolutions, repeats):
+    results = []
+    for shape, noise, glints in itertools.product(resolutions, NOISE_LEVELS,
+                                                  GLINT_COUNTS):
+        frame = make_eye_frame(shape, noise=noise, glints=glints)
+        result = time_call(lambda: image2position(frame), repeats)
+        result.update(shape=list(shape), noise=noise, glints=glints,
+                      fps=1./result['best_s'])
+        results.append(result)
+    return results
+
+
+def benchmark_coarse_to_fine(resolutions, repeats):
+    results = []
+    for shape, factor in itertools.product(resolutions, DOWNSAMPLE_FACTORS):
+        frame = make_eye_frame(shape, noise=10., glints=100)
+        locator = PupilLocator(downsample=factor)
+        result = time_call(lambda: locator.search_full(frame), repeats)
+        error = np.subtract(locator.search_full(frame), image2position(frame))
+        result.update(shape=list(shape), downsample=factor,
+                      fps=1./result['best_s'],
+                      error_px=float(np.abs(error).max()))
+        results.append(result)
+    return results
+
+
+def benchmark_adaptive_threshold(resolutions, repeats):
+    # The error is relative to the threshold from the full resolution
+    # histogram
+    results = []
+    for shape in resolutions:
+        grayscale_img = rgb2gray(make_eye_frame(shape, noise=10.,
+                                                glints=100))
+        exact = AdaptiveThreshold(step=1)(grayscale_img)
+        for step in HISTOGRAM_STEPS:
+            thres = AdaptiveThreshold(step=step)
+            result = time_call(lambda: thres(grayscale_img), repeats)
+            result.update(shape=list(shape), step=step,
+                          error=float(abs(thres.value - exact)))
+            results.append(result)
+    return results
+
+
+def benchmark_wait_for_fixation(resolutions, repeats):
+    results = []
+    for shape in resolutions:
+        target = np.array(shape)/4.
+        trajectory = make_trajectory(10, np.array(shape)/2., target, 5)
+        reader = SyntheticReader(trajectory, shape, noise=10., glints=10)
+        tracker = EyeTracker(reader)
+        target_area = area.Circle(target, min(shape)/20.)
+
+        latencies = []
+        for _ in range(repeats):
+            # Time from delivering the first frame on target to returning
+            onset = {}
+            reader.on_frame = lambda i: onset.setdefault(
+                i, time.perf_counter())
+            tracker.wait_for_fixation(target_area, patience=0.)
+            latencies.append(time.perf_counter() - onset[5])
+        results.append({'shape': list(shape),
+                        'best_s': min(latencies),
+                        'median_s': float(np.median(latencies))})
+    return results
+
+
+def benchmark_estimate_matrices(repeats):
+    rng = np.random.RandomState(0)
+    results = []
+    for npoints in CALIBRATION_POINTS:
+        image_locations = rng.uniform(0, 480, size=(npoints, 2))
+        target_locations = rng.uniform(-10, 10, size=(npoints, 2))
+        result = time_call(lambda: calibration.estimate_matrices(
+            target_locations, image_locations), repeats)
+        result['npoints'] = npoints
+        results.append(result)
+    return results
+
+
+def benchmark_import(repeats):
+    # Wall time of a fresh interpreter that imports the module, which is the
+    # startup cost of every script and of every spawned process
+    results = []
+    for module in IMPORTED_MODULES:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.check_call([sys.executable, '-c', 'import ' + module])
+            times.append(time.perf_counter() - start)
+        results.append({'module': module,
+                        'best_s': min(times),
+                        'median_s': float(np.median(times))})
+    return results
+
+
+def run(repeats, quick=False):
+    resolutions = RESOLUTIONS[:1] if quick else RESOLUTIONS
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repeats': repeats,
+        'image2position': benchmark_image2position(resolutions, repeats),
+        'coarse_to_fine': benchmark_coarse_to_fine(resolutions, repeats),
+        'adaptive_threshold': benchmark_adaptive_threshold(resolutions,
+                                                           repeats),
+        'wait_for_fixation': benchmark_wait_for_fixation(resolutions,
+                                                         repeats),
+        'estimate_matrices': benchmark_estimate_matrices(repeats),
+        'import': benchmark_import(min(repeats, 5) if quick else repeats),
+    }
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    results = run(int(args['--repeats']), args['--quick'])
+    if args['--output']:
+        with open(args['--output'], 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+
+class AsyncEyeTracker(object):
+    # asyncio front end for an EyeTracker. Frames are read and processed on a
+    # single background thread and every sample is handed to all consumers,
+    # so any number of streams and waiters share one acquisition stream.
+    # Consumers that fall behind by more than maxsize samples lose the oldest
+    # ones.
+
+    def __init__(self, tracker, maxsize=64):
+        self.tracker = tracker
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    async def samples(self):
+        # Yields (timestamp, screen position) of every new frame
+        queue = asyncio.Queue(self.maxsize)
+        self._subscribers.add(queue)
+        self._start(asyncio.get_running_loop())
+        try:
+            while True:
+                sample = await queue.get()
+                if sample is None:
+                    return
+                yield sample
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers:
+                self._stop.set()
+
+    async def wait_for_fixation(self, target_area, patience=0.2,
+                                timeout=None):
+        # Returns the timestamp of the frame that completed the fixation.
+        # Raises asyncio.TimeoutError after timeout seconds.
+        return await asyncio.wait_for(
+            self._wait_for_fixation(target_area, patience), timeout)
+
+    async def _wait_for_fixation(self, target_area, patience):
+        fixation_start = None
+        stream = self.samples()
+        try:
+            async for timestamp, position in stream:
+                if position in target_area:
+                    if fixation_start is None:
+                        fixation_start = timestamp
+                    if timestamp - fixation_start >= patience:
+                        return timestamp
+                else:
+                    fixation_start = None
+        finally:
+            # Unsubscribe right away instead of when the generator is
+            # garbage collected
+            await stream.aclose()
+
+    def _start(self, loop):
+        with self._lock:
+            self._stop.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._acquire,
+                                                args=(loop,), daemon=True)
+                self._thread.start()
+
+    def _acquire(self, loop):
+        for timestamp, position in self.tracker.samples():
+            with self._lock:
+                if self._stop.is_set():
+                    self._thread = None
+                    return
+            sample = timestamp, self.tracker.image2screen(position)
+            if not self._call_soon(loop, sample):
+                return
+        with self._lock:
+            self._thread = None
+        # End of a finite stream (e.g. a recording)
+        self._call_soon(loop, None)
+
+    def _call_soon(self, loop, sample):
+        try:
+            loop.call_soon_threadsafe(self._publish, sample)
+            return True
+        except RuntimeError:
+            # Event loop was closed
+            with self._lock:
+                self._thread = None
+            return False
+
+    def _publish(self, sample):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(sample)
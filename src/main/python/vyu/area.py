@@ -1,8 +1,20 @@
+import numpy as np
+
+
 class Area(object):
 
     def __contains__(self, point):
         raise NotImplementedError
 
+    def contains(self, points):
+        # Vectorised version of __contains__ for an (N, 2) array of points
+        raise NotImplementedError
+
+    @property
+    def bounding_box(self):
+        # (left, low, right, up)
+        raise NotImplementedError
+
 
 class Rectangle(Area):
 
@@ -15,6 +27,15 @@ class Rectangle(Area):
         return (x >= self.left and x <= self.right and
                 y >= self.low and y <= self.up)
 
+    def contains(self, points):
+        x, y = np.asarray(points, 'd').T
+        return ((x >= self.left) & (x <= self.right) &
+                (y >= self.low) & (y <= self.up))
+
+    @property
+    def bounding_box(self):
+        return self.left, self.low, self.right, self.up
+
 
 class Circle(Area):
 
@@ -26,3 +47,147 @@ class Circle(Area):
         squared_distance_from_center = ((self.center[0] - point[0])**2 +
                                         (self.center[1] - point[1])**2)
         return squared_distance_from_center < self.radius_squared
+
+    def contains(self, points):
+        x, y = np.asarray(points, 'd').T
+        squared_distance_from_center = ((self.center[0] - x)**2 +
+                                        (self.center[1] - y)**2)
+        return squared_distance_from_center < self.radius_squared
+
+    @property
+    def bounding_box(self):
+        radius = np.sqrt(self.radius_squared)
+        return (self.center[0] - radius, self.center[1] - radius,
+                self.center[0] + radius, self.center[1] + radius)
+
+
+class Ellipse(Area):
+
+    def __init__(self, center, radii, angle=0.):
+        # angle (in radians) rotates the first axis counterclockwise
+        self.center = center
+        self.radii = radii
+        self.angle = angle
+
+    def __contains__(self, point):
+        return bool(self.contains(np.reshape(point, (1, 2)))[0])
+
+    def contains(self, points):
+        x, y = np.asarray(points, 'd').T
+        dx = x - self.center[0]
+        dy = y - self.center[1]
+        cos, sin = np.cos(self.angle), np.sin(self.angle)
+        u = (cos*dx + sin*dy)/self.radii[0]
+        v = (cos*dy - sin*dx)/self.radii[1]
+        return u*u + v*v < 1
+
+    @property
+    def bounding_box(self):
+        cos, sin = np.cos(self.angle), np.sin(self.angle)
+        half_width = np.hypot(self.radii[0]*cos, self.radii[1]*sin)
+        half_height = np.hypot(self.radii[0]*sin, self.radii[1]*cos)
+        return (self.center[0] - half_width, self.center[1] - half_height,
+                self.center[0] + half_width, self.center[1] + half_height)
+
+
+class Polygon(Area):
+
+    def __init__(self, vertices):
+        self.vertices = np.asarray(vertices, 'd')
+
+    def __contains__(self, point):
+        return bool(self.contains(np.reshape(point, (1, 2)))[0])
+
+    def contains(self, points):
+        # Even-odd rule: count crossings of a horizontal ray from each point
+        x, y = np.asarray(points, 'd').T
+        inside = np.zeros(x.shape, bool)
+        x1, y1 = self.vertices[-1]
+        for x2, y2 in self.vertices:
+            if y1 != y2:
+                crosses = (y1 > y) != (y2 > y)
+                x_crossing = x1 + (y - y1)*(x2 - x1)/(y2 - y1)
+                inside ^= crosses & (x < x_crossing)
+            x1, y1 = x2, y2
+        return inside
+
+    @property
+    def bounding_box(self):
+        left, low = self.vertices.min(0)
+        right, up = self.vertices.max(0)
+        return left, low, right, up
+
+
+class AreaSet(object):
+    # Collection of areas with a uniform grid index over their bounding
+    # boxes. Only areas whose bounding box overlaps the grid cell of a point
+    # are tested exactly.
+
+    def __init__(self, areas, cell_size=None):
+        self.areas = list(areas)
+        boxes = np.array([area.bounding_box for area in self.areas], 'd')
+        self.origin = boxes[:, :2].min(0)
+        extent = boxes[:, 2:].max(0) - self.origin
+        if cell_size is None:
+            # Roughly one cell per typical area
+            cell_size = np.median(boxes[:, 2:] - boxes[:, :2])
+        self.cell_size = max(cell_size, 1e-9)
+        # One extra cell so that points on the upper edges are on the grid
+        self.shape = np.floor(extent/self.cell_size).astype(int) + 1
+
+        # Range of cells (first, last) covered by each bounding box
+        self._cell_ranges = np.concatenate([self._cell(boxes[:, :2]),
+                                            self._cell(boxes[:, 2:])], 1)
+        self._cells = {}
+        for i, (x0, y0, x1, y1) in enumerate(self._cell_ranges):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self._cells.setdefault((cx, cy), []).append(i)
+
+    def __len__(self):
+        return len(self.areas)
+
+    def __iter__(self):
+        return iter(self.areas)
+
+    def __contains__(self, point):
+        return bool(self.find(point))
+
+    def find(self, point):
+        # Indices of all areas that contain point
+        cell = tuple(self._cell(np.reshape(point, (1, 2)))[0])
+        return [i for i in self._cells.get(cell, ())
+                if point in self.areas[i]]
+
+    def contains(self, points):
+        # (N, len(self)) boolean array, element [n, i] is True if areas[i]
+        # contains points[n]
+        points = np.asarray(points, 'd').reshape((-1, 2))
+        result = np.zeros((len(points), len(self.areas)), bool)
+
+        cells = self._cell(points)
+        on_grid = ((cells >= 0) & (cells < self.shape)).all(1)
+        cell_ids = np.where(on_grid, cells[:, 0]*self.shape[1] + cells[:, 1],
+                            -1)
+        order = np.argsort(cell_ids, kind='stable')
+        sorted_ids = cell_ids[order]
+
+        for i, (x0, y0, x1, y1) in enumerate(self._cell_ranges):
+            # Cells of one grid column are consecutive in the sorted ids
+            columns = np.arange(x0, x1 + 1)*self.shape[1]
+            starts = np.searchsorted(sorted_ids, columns + y0, 'left')
+            stops = np.searchsorted(sorted_ids, columns + y1, 'right')
+            candidates = np.concatenate([order[start:stop] for start, stop
+                                         in zip(starts, stops)])
+            if len(candidates):
+                result[candidates, i] = self.areas[i].contains(
+                    points[candidates])
+        return result
+
+    def first(self, points):
+        # Index of the first area that contains each point or -1
+        hits = self.contains(points)
+        return np.where(hits.any(1), hits.argmax(1), -1)
+
+    def _cell(self, points):
+        return np.floor((points - self.origin)/self.cell_size).astype(int)
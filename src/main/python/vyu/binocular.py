@@ -0,0 +1,129 @@
+import copy
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+
+from vyu.timer import Timer
+from vyu.tracker import EyeTracker
+
+
+class BinocularTracker(object):
+    # One EyeTracker per camera, usually one camera per eye. Every camera is
+    # read and processed by its own FramePipeline, so the cameras don't share
+    # a Python loop and each runs at its own frame rate. Samples of the
+    # cameras are paired by time stamp, every eye has its own calibration and
+    # the gaze is the average over the eyes that were found.
+
+    def __init__(self, cameras=('<video0>', '<video1>'), locate=None,
+                 max_offset=0.01, buffer_size=1024):
+        if locate is None or callable(locate):
+            # Stateful locators like vyu.image.PupilLocator remember the last
+            # position, so every eye needs its own
+            locate = [copy.deepcopy(locate) for _ in cameras]
+        self.eyes = [EyeTracker(camera, eye_locate, buffer_size)
+                     for camera, eye_locate in zip(cameras, locate)]
+        # Samples of different cameras are only paired if their time stamps
+        # differ by at most max_offset seconds
+        self.max_offset = max_offset
+        # Image positions of all eyes at the last successful fixation
+        self.last_fixation = None
+
+    def start(self, nworkers=1, size=64):
+        for eye in self.eyes:
+            eye.start_pipeline(nworkers, size)
+
+    def stop(self):
+        for eye in self.eyes:
+            eye.stop_capture()
+
+    def samples(self):
+        # (timestamp, positions) with one row of image coordinates per eye.
+        # Reading the cameras here instead of in their pipelines would tie
+        # them to one loop and the slowest frame rate.
+        if any(eye.source is None for eye in self.eyes):
+            raise RuntimeError('Start the pipelines before reading samples')
+        return pair_samples([eye.samples() for eye in self.eyes],
+                            self.max_offset)
+
+    def image2screen(self, positions):
+        return np.array([eye.image2screen(position)
+                         for eye, position in zip(self.eyes, positions)])
+
+    def gaze(self, positions):
+        return combine_gaze(self.image2screen(positions))
+
+    def gaze_samples(self):
+        for timestamp, positions in self.samples():
+            yield timestamp, self.gaze(positions)
+
+    def wait_for_fixation(self, target_area, patience=0.2):
+        timer = Timer()
+        for timestamp, positions in self.samples():
+            if self.gaze(positions) in target_area:
+                if timer.start_or_check(patience, timestamp):
+                    self.last_fixation = positions
+                    # Allows drift correction per eye
+                    for eye, position in zip(self.eyes, positions):
+                        eye.last_fixation = position
+                    return
+            else:
+                timer.clear()
+
+    @contextmanager
+    def calibrate(self, order=1, **kw):
+        with ExitStack() as stack:
+            calibrators = [stack.enter_context(eye.calibrate(order, **kw))
+                           for eye in self.eyes]
+            yield BinocularCalibrator(calibrators)
+
+    @property
+    def current_gaze(self):
+        samples = [eye.current_sample for eye in self.eyes]
+        timestamp = max(timestamp for timestamp, _ in samples)
+        return timestamp, combine_gaze(np.array([screen_coords for _,
+                                                 screen_coords in samples]))
+
+
+class BinocularCalibrator(object):
+    # Adds a target to the calibrators of all eyes, but only if all eyes were
+    # tracked, so that every eye is calibrated with the same targets
+
+    def __init__(self, calibrators):
+        self.calibrators = calibrators
+
+    def append(self, target_location, timestamp=None):
+        image_locations = [calibrator.image_location(timestamp)
+                           for calibrator in self.calibrators]
+        for calibrator, image_location in zip(self.calibrators,
+                                              image_locations):
+            calibrator.add(target_location, image_location)
+
+
+def pair_samples(streams, max_offset):
+    # Merges time ordered streams of (timestamp, value) into one sample per
+    # stream with time stamps at most max_offset apart. Samples that have no
+    # partner in every other stream are dropped. Pairs get the time stamp of
+    # their newest sample.
+    streams = [iter(stream) for stream in streams]
+    try:
+        heads = [next(stream) for stream in streams]
+        while True:
+            newest = max(timestamp for timestamp, _ in heads)
+            if min(timestamp for timestamp, _ in heads) >= newest - max_offset:
+                yield newest, np.array([value for _, value in heads])
+                heads = [next(stream) for stream in streams]
+            else:
+                heads = [next(stream) if head[0] < newest - max_offset
+                         else head for stream, head in zip(streams, heads)]
+    except StopIteration:
+        return
+
+
+def combine_gaze(screen_coords):
+    # Average of the eyes with valid screen coordinates, e.g. a blinking eye
+    # is ignored
+    screen_coords = np.asarray(screen_coords, 'd')
+    valid = np.isfinite(screen_coords).all(1)
+    if not valid.any():
+        return np.full(screen_coords.shape[1], np.nan)
+    return screen_coords[valid].mean(0)
@@ -1,3 +1,5 @@
+from collections import deque
+
 import numpy as np
 
 
@@ -6,24 +8,81 @@ class EmptyTrackingError(Exception):
 
 
 class Calibrator(object):
+    # Averages the newest nframes image locations for each target. With a
+    # timestamped queue (a cursor of a RingBuffer or SharedRing), samples can
+    # further be restricted to the window seconds before the time stamp
+    # passed to append, e.g. the key press. nframes bounds the work per
+    # target and should cover the window. statistic is one of 'mean',
+    # 'median' or 'trimmed', the latter drops the fraction trim of the
+    # samples on either side.
 
-    def __init__(self, queue, nframes=5):
+    def __init__(self, queue, nframes=5, model=None, window=None,
+                 statistic='mean', trim=0.2):
         self.nframes = nframes
         self.queue = queue
+        self.window = window
+        self.statistic = statistic
+        self.trim = trim
         self.target_locations = []
         self.image_locations = []
+        # Optional CalibrationModel that is updated with every new target
+        self.model = model
 
-    def append(self, target_location):
-        image_locations = []
-        while not self.queue.empty():
-            image_locations.append(self.queue.get())
+    def append(self, target_location, timestamp=None):
+        self.add(target_location, self.image_location(timestamp))
+
+    def image_location(self, timestamp=None):
+        timestamps, image_locations = self.recent_samples(timestamp)
 
-        if not image_locations:
+        if timestamp is not None or self.window is not None:
+            if timestamps is None:
+                raise ValueError('Selecting samples by time requires a '
+                                 'timestamped queue')
+            if timestamp is None and len(timestamps):
+                timestamp = timestamps[-1]
+            keep = timestamps <= timestamp
+            if self.window is not None:
+                keep &= timestamps > timestamp - self.window
+            image_locations = image_locations[keep]
+        # Samples without a pupil, e.g. blinks
+        image_locations = image_locations[
+            np.isfinite(image_locations).all(1)]
+
+        if not len(image_locations):
             raise EmptyTrackingError
+        return aggregate_locations(image_locations, self.statistic, self.trim)
 
+    def add(self, target_location, image_location):
         self.target_locations.append(target_location)
-        self.image_locations.append(
-            np.mean(image_locations[-self.nframes:], 0))
+        self.image_locations.append(image_location)
+        if self.model is not None:
+            self.model.add(image_location, target_location)
+
+    def recent_samples(self, until=None):
+        # The newest nframes samples up to the time stamp until, so that
+        # samples that arrive after the key press don't displace those
+        # before it
+        if hasattr(self.queue, 'get_recent'):
+            return self.queue.get_recent(self.nframes, until)
+        # Plain queues have to be drained, but only the newest nframes
+        # locations are kept
+        image_locations = deque(maxlen=self.nframes)
+        while not self.queue.empty():
+            image_locations.append(self.queue.get())
+        return None, np.array(image_locations, 'd').reshape((-1, 2))
+
+
+def aggregate_locations(image_locations, statistic='mean', trim=0.2):
+    image_locations = np.asarray(image_locations, 'd')
+    if statistic == 'mean':
+        return image_locations.mean(0)
+    if statistic == 'median':
+        return np.median(image_locations, 0)
+    if statistic == 'trimmed':
+        n = len(image_locations)
+        k = min(int(trim*n), (n - 1)//2)
+        return np.sort(image_locations, 0)[k:n - k].mean(0)
+    raise ValueError('Unknown statistic {!r}'.format(statistic))
 
 
 def estimate_matrices(target_locations, image_locations):
@@ -38,3 +97,108 @@ def estimate_matrices(target_locations, image_locations):
         parameters.append(w)
     parameters = np.array(parameters)
     return parameters[:, :2], parameters[:, 2]
+
+
+def polynomial_features(image_locations, order=1):
+    x, y = np.atleast_2d(image_locations).T
+    if order == 1:
+        columns = [x, y]
+    elif order == 2:
+        columns = [x, y, x*x, x*y, y*y]
+    else:
+        raise ValueError('Only orders 1 and 2 are supported')
+    return np.column_stack(columns + [np.ones_like(x)])
+
+
+class CalibrationModel(object):
+    # Least squares map from image to screen coordinates that accumulates
+    # the normal equations, so that adding a target costs the same no matter
+    # how many targets there are. order=2 adds quadratic terms, which helps
+    # at the edges of the screen.
+
+    def __init__(self, order=1):
+        self.order = order
+        nfeatures = polynomial_features(np.zeros(2), order).shape[1]
+        self.normal_matrix = np.zeros((nfeatures, nfeatures))
+        self.moments = np.zeros((nfeatures, 2))
+        self.npoints = 0
+        self.parameters = None
+        # Image coordinates are centered and scaled using the first point to
+        # keep the quadratic normal equations well conditioned
+        self.center = None
+        self.scale = None
+
+    def add(self, image_location, target_location):
+        if self.center is None:
+            self.center = np.array(image_location, 'd')
+            self.scale = max(np.abs(self.center).max(), 1.)
+        features = self._features(image_location)[0]
+        self.normal_matrix += np.outer(features, features)
+        self.moments += np.outer(features, target_location)
+        self.npoints += 1
+        # Minimum norm solution while there are fewer targets than parameters
+        self.parameters = np.linalg.lstsq(self.normal_matrix, self.moments,
+                                          rcond=None)[0]
+
+    def apply(self, image_locations):
+        # Maps a single point to a point or an (N, 2) array to an (N, 2) array
+        screen_locations = np.dot(self._features(image_locations),
+                                  self.parameters)
+        if np.ndim(image_locations) == 1:
+            return screen_locations[0]
+        return screen_locations
+
+    @property
+    def matrices(self):
+        # A and b of the affine map A*x + b in original image coordinates
+        if self.order != 1:
+            raise ValueError('Only affine models can be written as matrices')
+        A = self.parameters[:2].T/self.scale
+        b = self.parameters[2] - np.dot(A, self.center)
+        return A, b
+
+    def _features(self, image_locations):
+        points = (np.atleast_2d(image_locations) - self.center)/self.scale
+        return polynomial_features(points, self.order)
+
+
+class DriftCorrector(object):
+    # Corrects calibrated screen coordinates by a gain and an offset per
+    # axis. These are updated by recursive least squares from fixations on
+    # known targets, and older fixations are down-weighted by the forgetting
+    # factor. prior_variance is the initial uncertainty of gain and offset
+    # (in screen units) and controls how fast the first updates move away
+    # from the identity.
+
+    def __init__(self, forgetting=0.9, prior_variance=(0.01, 1.)):
+        self.forgetting = forgetting
+        self.prior_variance = prior_variance
+        self.reset()
+
+    def reset(self):
+        # One row of (gain, offset) per screen axis
+        self.parameters = np.array([[1., 0.], [1., 0.]])
+        self.covariances = np.array([np.diag(self.prior_variance)]*2)
+        self.nupdates = 0
+
+    def add(self, screen_location, target_location):
+        parameters = self.parameters.copy()
+        covariances = self.covariances.copy()
+        for axis in range(2):
+            regressor = np.array([screen_location[axis], 1.])
+            P = covariances[axis]
+            gain = np.dot(P, regressor)/(
+                self.forgetting + np.dot(regressor, np.dot(P, regressor)))
+            error = (target_location[axis] -
+                     np.dot(regressor, parameters[axis]))
+            parameters[axis] += gain*error
+            covariances[axis] = (P - np.outer(gain, np.dot(regressor, P)))/(
+                self.forgetting)
+        # Swap in the new estimate at once, readers on other threads never see
+        # a partial update
+        self.parameters, self.covariances = parameters, covariances
+        self.nupdates += 1
+
+    def apply(self, screen_locations):
+        parameters = self.parameters
+        return screen_locations*parameters[:, 0] + parameters[:, 1]
@@ -0,0 +1,216 @@
+import threading
+
+import numpy as np
+
+from vyu.image import image2position
+from vyu.sources import FrameSource, iter_timestamped
+
+
+class RingBuffer(object):
+
+    def __init__(self, size, shape=(2,), dtype='d'):
+        self.size = size
+        self.values = np.empty((size,) + tuple(shape), dtype)
+        self.timestamps = np.empty(size, 'd')
+        # Total number of samples ever appended. Samples older than
+        # count - size have been overwritten.
+        self.count = 0
+        # Set by the producer when no more samples will be appended, error
+        # is the exception that stopped the producer
+        self.closed = False
+        self.error = None
+        self.condition = threading.Condition()
+        # Called with (timestamp, value) on the producer's thread
+        self.listeners = []
+
+    def append(self, value, timestamp):
+        with self.condition:
+            i = self.count % self.size
+            self.values[i] = value
+            self.timestamps[i] = timestamp
+            self.count += 1
+            self.condition.notify_all()
+        for listener in self.listeners:
+            listener(timestamp, value)
+
+    def close(self, error=None):
+        with self.condition:
+            self.closed = True
+            self.error = error
+            self.condition.notify_all()
+
+    def reopen(self):
+        with self.condition:
+            self.closed = False
+            self.error = None
+
+    def raise_error(self):
+        # Consumers get the producer's exception instead of waiting forever
+        if self.error is not None:
+            raise self.error
+
+    def latest(self, timeout=None):
+        with self.condition:
+            self.condition.wait_for(lambda: self.count > 0 or self.closed,
+                                    timeout)
+            self.raise_error()
+            if not self.count:
+                raise IndexError('No samples in buffer')
+            i = (self.count - 1) % self.size
+            return self.timestamps[i], self.values[i].copy()
+
+    def get_since(self, count):
+        with self.condition:
+            start = max(count, self.count - self.size)
+            indices = np.arange(start, self.count) % self.size
+            return (self.timestamps[indices], self.values[indices],
+                    self.count)
+
+    def wait(self, count, timeout=None):
+        # False if there are no samples after count before the timeout or
+        # the buffer was closed
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.count > count or self.closed, timeout)
+            return self.count > count
+
+    def cursor(self):
+        return Cursor(self)
+
+
+class Cursor(object):
+    # Queue-like view on the samples appended to a RingBuffer after the
+    # cursor was created. Samples that were overwritten before they were read
+    # are skipped. Iteration ends once the buffer is closed and all samples
+    # were read.
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.count = buffer.count
+
+    def empty(self):
+        return self.count >= self.buffer.count
+
+    def get_timestamped(self, timeout=None):
+        buffer = self.buffer
+        if not buffer.wait(self.count, timeout):
+            buffer.raise_error()
+            raise IndexError('No new samples in buffer')
+        with buffer.condition:
+            self.count = max(self.count, buffer.count - buffer.size)
+            i = self.count % buffer.size
+            sample = buffer.timestamps[i], buffer.values[i].copy()
+            self.count += 1
+            return sample
+
+    def get(self, timeout=None):
+        return self.get_timestamped(timeout)[1]
+
+    def get_recent(self, n, until=None):
+        # The newest n unread samples up to the time stamp until as arrays.
+        # All unread samples are consumed.
+        timestamps, values, self.count = self.buffer.get_since(self.count)
+        return select_recent(timestamps, values, n, until)
+
+    def __iter__(self):
+        while self.buffer.wait(self.count):
+            yield self.get_timestamped()
+        self.buffer.raise_error()
+
+
+def select_recent(timestamps, values, n, until=None):
+    # Time stamps increase, so the samples up to until are a prefix
+    stop = len(timestamps)
+    if until is not None:
+        stop = np.searchsorted(timestamps, until, 'right')
+    start = max(stop - n, 0)
+    return timestamps[start:stop], values[start:stop]
+
+
+class BackgroundCapture(object):
+    # Only the newest frame is kept if processing does not keep up. Replays
+    # (vyu.sources.FrameSource) instead wait for processing by default, so
+    # that every frame is processed and replays are deterministic.
+
+    def __init__(self, reader, locate=None, size=64, drop_frames=None):
+        self.reader = reader
+        self.locate = image2position if locate is None else locate
+        if drop_frames is None:
+            drop_frames = not isinstance(reader, FrameSource)
+        self.drop_frames = drop_frames
+        self.samples = RingBuffer(size)
+        self.dropped_frames = 0
+        self.running = False
+        self._frame = None
+        self._frame_ready = threading.Condition()
+        self._threads = []
+        self._error = None
+
+    def start(self):
+        self.running = True
+        self._error = None
+        self.samples.reopen()
+        self._threads = [threading.Thread(target=self._read, daemon=True),
+                         threading.Thread(target=self._process, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=1.):
+        with self._frame_ready:
+            self.running = False
+            self._frame_ready.notify_all()
+        for thread in self._threads:
+            # The reader thread might still wait for the camera
+            thread.join(timeout)
+        self.samples.raise_error()
+
+    def latest(self, timeout=None):
+        return self.samples.latest(timeout)
+
+    def __iter__(self):
+        return iter(self.samples.cursor())
+
+    def _read(self):
+        try:
+            for timestamp, frame in iter_timestamped(self.reader):
+                with self._frame_ready:
+                    if not self.drop_frames:
+                        self._frame_ready.wait_for(
+                            lambda: self._frame is None or not self.running)
+                    if not self.running:
+                        return
+                    if self._frame is not None:
+                        # Processing did not keep up, only keep the newest
+                        # frame
+                        self.dropped_frames += 1
+                    self._frame = timestamp, frame
+                    self._frame_ready.notify_all()
+        except Exception as error:
+            # Passed on to the consumers by the processing thread
+            self._error = error
+        finally:
+            with self._frame_ready:
+                self.running = False
+                self._frame_ready.notify_all()
+
+    def _process(self):
+        try:
+            while True:
+                with self._frame_ready:
+                    self._frame_ready.wait_for(
+                        lambda: self._frame is not None or not self.running)
+                    if self._frame is None:
+                        break
+                    timestamp, frame = self._frame
+                    self._frame = None
+                    # The reader might wait for a free frame
+                    self._frame_ready.notify_all()
+                self.samples.append(self.locate(frame), timestamp)
+        except Exception as error:
+            self._error = error
+            with self._frame_ready:
+                self.running = False
+                self._frame_ready.notify_all()
+        finally:
+            # Ends iteration over the samples once they were consumed
+            self.samples.close(self._error)
@@ -0,0 +1,182 @@
+import numpy as np
+
+# Sample classes, also used as flags in recordings
+UNCLASSIFIED, FIXATION, SACCADE, BLINK = range(4)
+
+
+class Event(object):
+    # A run of samples of the same class. position is the mean position of
+    # the samples, which is NaN for blinks.
+
+    def __init__(self, kind, start, end, nsamples, position_sum, nvalid):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.nsamples = nsamples
+        self.position_sum = position_sum
+        self.nvalid = nvalid
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    @property
+    def position(self):
+        if not self.nvalid:
+            return np.full(2, np.nan)
+        return self.position_sum/self.nvalid
+
+    def extend(self, other):
+        self.end = other.end
+        self.nsamples += other.nsamples
+        self.position_sum = self.position_sum + other.position_sum
+        self.nvalid += other.nvalid
+
+    def __repr__(self):
+        return 'Event({}, {}, {})'.format(self.kind, self.start, self.end)
+
+
+class EventDetector(object):
+    # Classifies one sample at a time. Samples without a position are blinks,
+    # samples faster than velocity_threshold (units per second) are saccades
+    # and samples are part of a fixation if the dispersion (horizontal plus
+    # vertical range) of the last window samples is at most
+    # dispersion_threshold. Classified samples are grouped into events, but a
+    # change of class only ends the current event once it lasted min_samples
+    # samples. A single noisy sample is fast twice (away and back) and makes
+    # the following windows too dispersed, which leaves these samples
+    # unclassified, so with the default it doesn't interrupt a fixation.
+    # Fixations before and after an interruption are only merged if they are
+    # at the same place, so that saccades shorter than min_samples still
+    # separate fixations.
+
+    def __init__(self, velocity_threshold, dispersion_threshold, window=5,
+                 min_samples=3):
+        self.velocity_threshold = velocity_threshold
+        self.dispersion_threshold = dispersion_threshold
+        self.window = window
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self.positions = np.full((self.window, 2), np.nan)
+        self.count = 0
+        self.previous = None
+        self.label = UNCLASSIFIED
+        self.current = None
+        self.pending = None
+        self.interrupted = False
+
+    def classify(self, timestamp, position):
+        position = np.asarray(position, 'd')
+        self.positions[self.count % self.window] = position
+        self.count += 1
+        velocity = np.nan
+        if self.previous is not None:
+            previous_timestamp, previous_position = self.previous
+            velocity = (np.hypot(*(position - previous_position)) /
+                        (timestamp - previous_timestamp))
+        self.previous = timestamp, position
+        # NaN in the window or a window that is not filled yet gives NaN
+        dispersion = np.ptp(self.positions, 0).sum()
+        return classify(position, velocity, dispersion,
+                        self.velocity_threshold, self.dispersion_threshold)
+
+    def add(self, timestamp, position):
+        # Returns the event that was completed by this sample or None
+        self.label = self.classify(timestamp, position)
+        valid = np.isfinite(position).all()
+        return self.add_run(Event(self.label, timestamp, timestamp, 1,
+                                  np.where(valid, position, 0.), int(valid)),
+                            position)
+
+    def add_run(self, run, position):
+        # position is that of the first sample of the run
+        current, pending = self.current, self.pending
+        if run.kind == UNCLASSIFIED:
+            self.interrupted = current is not None
+            return None
+        if current is None:
+            self.current = run
+        elif run.kind == current.kind:
+            moved = (self.interrupted and run.kind == FIXATION and
+                     np.abs(position - current.position).sum() >
+                     self.dispersion_threshold)
+            self.pending, self.interrupted = None, False
+            if moved:
+                self.current = run
+                return current
+            # Samples of a shorter run of another class in between are
+            # dropped
+            current.extend(run)
+        elif pending is not None and run.kind == pending.kind:
+            pending.extend(run)
+        else:
+            self.pending = pending = run
+            self.interrupted = True
+        if self.pending is not None and self.pending.nsamples >= (
+                self.min_samples):
+            self.current, self.pending = self.pending, None
+            self.interrupted = False
+            return current
+        return None
+
+
+def classify(positions, velocities, dispersions, velocity_threshold,
+             dispersion_threshold):
+    # Works on single samples and on arrays of samples
+    labels = np.where(dispersions <= dispersion_threshold, FIXATION,
+                      UNCLASSIFIED)
+    labels = np.where(velocities > velocity_threshold, SACCADE, labels)
+    labels = np.where(np.isfinite(positions).all(-1), labels, BLINK)
+    return labels[()]
+
+
+def classify_samples(timestamps, positions, velocity_threshold,
+                     dispersion_threshold, window=5):
+    # Offline version of EventDetector.classify for whole recordings, gives
+    # the same labels
+    timestamps = np.asarray(timestamps, 'd')
+    positions = np.asarray(positions, 'd')
+    velocities = np.full(len(positions), np.nan)
+    velocities[1:] = (np.hypot(*np.diff(positions, axis=0).T) /
+                      np.diff(timestamps))
+    dispersions = np.full(len(positions), np.nan)
+    if len(positions) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(positions, window,
+                                                           axis=0)
+        dispersions[window - 1:] = np.ptp(windows, -1).sum(-1)
+    return classify(positions, velocities, dispersions, velocity_threshold,
+                    dispersion_threshold)
+
+
+def detect_events(timestamps, positions, velocity_threshold,
+                  dispersion_threshold, window=5, min_samples=3):
+    # Offline version of EventDetector.add, gives the same events including
+    # the last one, which might not be complete
+    timestamps = np.asarray(timestamps, 'd')
+    positions = np.asarray(positions, 'd')
+    labels = classify_samples(timestamps, positions, velocity_threshold,
+                              dispersion_threshold, window)
+    if not len(labels):
+        return []
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)]
+    valid = np.isfinite(positions).all(1)
+    position_sums = np.add.reduceat(np.where(valid[:, None], positions, 0.),
+                                    starts)
+    nvalid = np.add.reduceat(valid.astype(int), starts)
+
+    detector = EventDetector(velocity_threshold, dispersion_threshold,
+                             window, min_samples)
+    events = []
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        event = detector.add_run(Event(labels[start], timestamps[start],
+                                       timestamps[end - 1], end - start,
+                                       position_sums[i], nvalid[i]),
+                                 positions[start])
+        if event is not None:
+            events.append(event)
+    if detector.current is not None:
+        events.append(detector.current)
+    return events
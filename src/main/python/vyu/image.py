@@ -1,25 +1,558 @@
+import itertools
+from time import perf_counter_ns
+
 import numpy as np
-from scipy.ndimage import label
-from skimage.color import rgb2gray
 
+from vyu.lazy import lazy_import
+
+ndimage = lazy_import('scipy.ndimage')
+
+# Integer approximation of the luminance weights used by rgb2gray, scaled by
+# 256 so that the weighted sum of uint8 channels fits into uint16
+LUMINANCE_WEIGHTS = (54, 183, 19)
+RGB2GRAY_WEIGHTS = np.array([0.2125, 0.7154, 0.0721])
+
+# Stacking more pixels than this per chunk makes the float intermediates fall
+# out of the cache, which costs more than the per-frame overhead it saves
+CHUNK_PIXELS = 2**18
+
+# Buffers are cached per image shape. Coarse-to-fine refinement windows vary
+# in shape, so the caches are cleared when they get larger than this.
+MAX_BUFFER_SHAPES = 8
 
-def image2position(img, thres=0.5):
+# Position of frames without a pupil, e.g. during blinks
+NO_POSITION = (np.nan, np.nan)
+
+
+def image2position(img, thres=0.5, seeded=True, centroid='mean',
+                   profiler=None):
+    # Stages are timed if a vyu.profiling.Profiler is given
+    if profiler is not None:
+        t = perf_counter_ns()
     grayscale_img = rgb2gray(img)
+    if profiler is not None:
+        profiler.record('grayscale', t)
+    return grayscale2position(grayscale_img, thres, seeded=seeded,
+                              centroid=centroid, profiler=profiler)
+
+
+def grayscale2position(grayscale_img, thres, out=None, seeded=True,
+                       centroid='mean', profiler=None):
+    if callable(thres):
+        # e.g. AdaptiveThreshold
+        thres = thres(grayscale_img)
+    region, window, _ = locate_blob(grayscale_img, thres, out, seeded,
+                                    profiler)
+    if region is None:
+        return NO_POSITION
+    if profiler is not None:
+        t = perf_counter_ns()
+    position = get_region_centroid(region, get_offset(window),
+                                   grayscale_img[window], thres, centroid)
+    if profiler is not None:
+        profiler.record('centroid', t)
+    return position
+
+
+def locate_blob(grayscale_img, thres, out=None, seeded=True, profiler=None):
+    # Connected component of the thresholded image that contains the
+    # brightest point, the part of the image it refers to and the brightest
+    # point. The component is None if nothing is above threshold.
+    if profiler is not None:
+        t = perf_counter_ns()
     x, y = get_brightest_point(grayscale_img)
-    thresholded = threshold_image(grayscale_img, thres)
-    connected_clusters, _ = label(thresholded)
-    centroid = get_centroid(connected_clusters == connected_clusters[x, y])
-    return centroid
+    thresholded = threshold_image(grayscale_img, thres, out)
+    if profiler is not None:
+        t = profiler.record('threshold', t)
+
+    if not thresholded[x, y]:
+        return None, None, (x, y)
+    if seeded:
+        region, window = grow_region(thresholded, (x, y))
+    else:
+        connected_clusters, _ = label(thresholded)
+        region = connected_clusters == connected_clusters[x, y]
+        window = slice(None), slice(None)
+    if profiler is not None:
+        profiler.record('labelling', t)
+    return region, window, (x, y)
+
+
+def image2position_batch(frames, thres=0.5, chunksize=None):
+    # frames can be an (N, H, W, 3) array, a memory map or any iterable of
+    # frames (e.g. an imageio reader). Only chunksize frames are held in
+    # memory at a time.
+    if chunksize is None:
+        chunksize = get_chunksize(frames)
+    positions = [chunk2position(chunk, thres)
+                 for chunk in iter_chunks(frames, chunksize)]
+    if not positions:
+        return np.empty((0, 2))
+    return np.concatenate(positions)
+
+
+def get_chunksize(frames):
+    if not hasattr(frames, 'shape'):
+        return 1
+    return max(1, CHUNK_PIXELS // (frames.shape[1]*frames.shape[2]))
+
+
+def iter_chunks(frames, chunksize):
+    if hasattr(frames, 'shape'):
+        for start in range(0, len(frames), chunksize):
+            yield np.asarray(frames[start:start + chunksize])
+    else:
+        frames = iter(frames)
+        while True:
+            chunk = list(itertools.islice(frames, chunksize))
+            if not chunk:
+                return
+            yield np.stack(chunk)
+
+
+def chunk2position(frames, thres):
+    nframes = len(frames)
+    grayscale_imgs = stack2gray(frames)
+    brightest = np.argmax(grayscale_imgs.reshape(nframes, -1), axis=1)
+    xvals, yvals = np.unravel_index(brightest, grayscale_imgs.shape[1:])
+    if callable(thres):
+        thres = np.array([thres(grayscale_img)
+                          for grayscale_img in grayscale_imgs])[:, None, None]
+    thresholded = threshold_image(grayscale_imgs, thres)
+
+    positions = np.empty((nframes, 2))
+    for i, seed in enumerate(zip(xvals, yvals)):
+        if thresholded[i][seed]:
+            region, window = grow_region(thresholded[i], seed)
+            positions[i] = get_centroid(region,
+                                        (window[0].start, window[1].start))
+        else:
+            positions[i] = NO_POSITION
+    return positions
+
+
+def img_as_float(img):
+    # Same conversion as skimage.util.img_as_float, integer images are
+    # scaled to [0, 1] (or [-1, 1] if signed) in double precision
+    img = np.asarray(img)
+    if img.dtype.kind in 'ui':
+        scaled = np.multiply(img, 1./np.iinfo(img.dtype).max,
+                             dtype=np.float64)
+        if img.dtype.kind == 'i':
+            np.maximum(scaled, -1., out=scaled)
+        return scaled
+    if img.dtype == np.float16:
+        return img.astype(np.float32)
+    if img.dtype.kind == 'f':
+        return img
+    return img.astype(np.float64)
+
+
+def rgb2gray(img):
+    # Gives exactly the same result as skimage.color.rgb2gray without
+    # importing scikit-image
+    img = img_as_float(img)
+    return np.matmul(img, RGB2GRAY_WEIGHTS.astype(img.dtype))
+
+
+def label(mask):
+    return ndimage.label(mask)
+
+
+def stack2gray(frames):
+    # Gives exactly the same result as rgb2gray on every frame, but uses a
+    # single matrix product for the whole stack
+    pixels = img_as_float(frames).reshape(-1, 3)
+    return np.dot(pixels, RGB2GRAY_WEIGHTS).reshape(frames.shape[:-1])
 
 
 def get_brightest_point(grayscale_img):
     return np.unravel_index(np.argmax(grayscale_img), grayscale_img.shape)
 
 
-def threshold_image(grayscale_img, thres):
-    return grayscale_img > thres
+def threshold_image(grayscale_img, thres, out=None):
+    return np.greater(grayscale_img, thres, out=out)
 
 
-def get_centroid(region):
+def get_centroid(region, offset=None):
     xvals, yvals = np.where(region)
+    if offset is not None:
+        # Offsets are added before averaging to get exactly the same result
+        # as for the full frame
+        xvals += offset[0]
+        yvals += offset[1]
     return xvals.mean(), yvals.mean()
+
+
+def get_moment_centroid(region, weights=None, offset=None):
+    # First moments from row and column sums. Unlike get_centroid, this does
+    # not allocate index arrays and supports weights (e.g. intensities).
+    if weights is None:
+        mass = region
+    else:
+        mass = np.where(region, weights, 0.)
+    row_mass = mass.sum(1, dtype='d')
+    col_mass = mass.sum(0, dtype='d')
+    total_mass = row_mass.sum()
+    x = np.dot(np.arange(len(row_mass)), row_mass)/total_mass
+    y = np.dot(np.arange(len(col_mass)), col_mass)/total_mass
+    if offset is not None:
+        x += offset[0]
+        y += offset[1]
+    return x, y
+
+
+def get_region_centroid(region, offset, grayscale_img, thres, method):
+    # grayscale_img has the same shape as region. Methods are 'mean' (pixel
+    # average as in get_centroid), 'moments' (same value from row and column
+    # sums) and 'weighted' (weighted by intensity above threshold, which
+    # gives sub-pixel precision at the blob edges).
+    if method == 'mean':
+        return get_centroid(region, offset)
+    if method == 'moments':
+        return get_moment_centroid(region, offset=offset)
+    if method == 'weighted':
+        weights = np.subtract(grayscale_img, thres, dtype='d')
+        return get_moment_centroid(region, weights, offset)
+    raise ValueError('Unknown centroid method {!r}'.format(method))
+
+
+def grow_region(mask, seed, radius=8):
+    # Only label a window around the seed and enlarge it until the connected
+    # component containing the seed no longer touches the window edge. That
+    # component is then the same as in a labelling of the full mask.
+    while True:
+        window = get_window(mask.shape, seed, radius)
+        connected_clusters, _ = label(mask[window])
+        region = connected_clusters == connected_clusters[
+            seed[0] - window[0].start, seed[1] - window[1].start]
+        if not touches_border(region, window, mask.shape):
+            return region, window
+        radius *= 2
+
+
+def get_window(shape, center, radius):
+    return tuple(_window_slice(c, radius, size)
+                 for c, size in zip(center, shape))
+
+
+def get_offset(window):
+    # None for the full image
+    if window[0].start is None:
+        return None
+    return window[0].start, window[1].start
+
+
+def _window_slice(center, radius, size):
+    # Windows are shifted rather than clipped at the image border, so that
+    # they always have the same shape
+    width = min(2*radius + 1, size)
+    start = min(max(int(round(center)) - radius, 0), size - width)
+    return slice(start, start + width)
+
+
+def touches_border(region, window, shape):
+    rows, cols = window
+    return ((rows.start > 0 and region[0].any()) or
+            (rows.stop < shape[0] and region[-1].any()) or
+            (cols.start > 0 and region[:, 0].any()) or
+            (cols.stop < shape[1] and region[:, -1].any()))
+
+
+class UInt8Grayscale(object):
+
+    def __init__(self, channel=None):
+        # Mono cameras deliver identical channels, so a single channel can be
+        # used directly
+        self.channel = channel
+        self._buffers = {}
+
+    def __call__(self, img):
+        if img.ndim == 2:
+            return img
+        if self.channel is not None:
+            return img[..., self.channel]
+
+        accumulator, product, grayscale_img = self._get_buffers(img.shape[:2])
+        np.multiply(img[..., 0], LUMINANCE_WEIGHTS[0], out=accumulator,
+                    dtype='uint16')
+        for channel in (1, 2):
+            np.multiply(img[..., channel], LUMINANCE_WEIGHTS[channel],
+                        out=product, dtype='uint16')
+            accumulator += product
+        np.right_shift(accumulator, 8, out=grayscale_img, casting='unsafe')
+        # The returned buffer is overwritten by the next frame of this shape
+        return grayscale_img
+
+    def _get_buffers(self, shape):
+        try:
+            return self._buffers[shape]
+        except KeyError:
+            if len(self._buffers) >= MAX_BUFFER_SHAPES:
+                self._buffers.clear()
+            buffers = (np.empty(shape, 'uint16'), np.empty(shape, 'uint16'),
+                       np.empty(shape, 'uint8'))
+            self._buffers[shape] = buffers
+            return buffers
+
+
+class AdaptiveThreshold(object):
+    # Threshold from a histogram of every step-th pixel in every step-th row,
+    # averaged over frames with an exponential forgetting factor. method is
+    # 'otsu' or a percentile, e.g. 99.5 if the pupil covers at most half a
+    # percent of the image. Integer images are binned in [0, 256), float
+    # images in [0, 1]. Pass it as thres, it is called with every grayscale
+    # image and returns the threshold to use.
+
+    def __init__(self, method='otsu', step=4, forgetting=0.9, bins=256):
+        if isinstance(method, str):
+            valid = method == 'otsu'
+        else:
+            valid = 0 <= method <= 100
+        if not valid:
+            raise ValueError(
+                'method has to be otsu or a percentile, not {!r}'.format(
+                    method))
+        self.method = method
+        self.step = step
+        self.forgetting = forgetting
+        self.bins = bins
+        self.reset()
+
+    def reset(self):
+        self.histogram = None
+        self.value = None
+
+    def __call__(self, grayscale_img):
+        return self.update(self.sample(grayscale_img))
+
+    def sample(self, img):
+        return img[::self.step, ::self.step]
+
+    def update(self, samples):
+        # samples are grayscale values that are already subsampled
+        if samples.dtype.kind in 'ui':
+            scale, offset = 256, 1
+        else:
+            scale, offset = 1., 0
+        if samples.dtype == np.uint8 and self.bins == 256:
+            indices = samples.ravel()
+        else:
+            indices = np.multiply(samples.ravel(), self.bins/scale)
+            indices = np.clip(indices, 0, self.bins - 1).astype(np.intp)
+        histogram = np.bincount(indices, minlength=self.bins)/indices.size
+        if self.histogram is None:
+            self.histogram = histogram
+        else:
+            self.histogram *= self.forgetting
+            self.histogram += (1 - self.forgetting)*histogram
+        if self.method == 'otsu':
+            last_background_bin = otsu_bin(self.histogram)
+        else:
+            last_background_bin = np.searchsorted(
+                np.cumsum(self.histogram), self.method/100.)
+        # Pixels in bins above the last background bin are above threshold
+        self.value = (last_background_bin + 1)*scale/self.bins - offset
+        return self.value
+
+
+def otsu_bin(histogram):
+    # Last bin of the class below Otsu's threshold, which maximizes the
+    # variance between the classes
+    levels = np.arange(len(histogram))
+    below = np.cumsum(histogram)
+    total = below[-1]
+    mean_below = np.cumsum(histogram*levels)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean_below[-1]*below - total*mean_below)**2/(
+            below*(total - below))
+    # The last bin would leave the upper class empty
+    between = between[:-1]
+    if not np.isfinite(between).any():
+        # Only a single occupied bin, e.g. a black or saturated frame
+        return int(np.argmax(histogram))
+    return int(np.nanargmax(between))
+
+
+class PupilLocator(object):
+
+    def __init__(self, thres=0.5, radius=40, grayscale=rgb2gray,
+                 centroid='mean', downsample=None, predictor=None,
+                 min_radius=10, max_blob_change=4., profiler=None):
+        # For the uint8 fast path, use grayscale=UInt8Grayscale() and an
+        # integer threshold (e.g. 128 instead of 0.5). With downsample, full
+        # frame searches first look for the pupil in every downsample-th row
+        # and column and then refine around it at full resolution. With a
+        # predictor (e.g. vyu.kalman.KalmanFilter with time in frames), the
+        # window is centered on the predicted position and spans its 99%
+        # confidence region plus min_radius, but never more than radius.
+        # thres can also be an AdaptiveThreshold, which is updated from
+        # every frame before the search. A blob in the window is only taken
+        # to be the pupil if its area and its peak above threshold changed
+        # by less than a factor of max_blob_change since the last frame,
+        # otherwise (e.g. a glint left behind by a large saccade) the full
+        # frame is searched.
+        self.thres = thres
+        self.threshold = None if callable(thres) else thres
+        self.radius = radius
+        self.grayscale = grayscale
+        self.centroid = centroid
+        self.downsample = downsample
+        self.predictor = predictor
+        self.min_radius = min_radius
+        self.max_blob_change = max_blob_change
+        # Optional vyu.profiling.Profiler that times the stages
+        self.profiler = profiler
+        self.last_position = None
+        # Area and peak intensity of the last pupil
+        self.blob = None
+        self.frame_count = 0
+        self._masks = {}
+
+    def __call__(self, img):
+        if callable(self.thres):
+            self.update_threshold(img)
+        position = None
+        if self.last_position is not None:
+            if self.predictor is None:
+                position = self.search_window(img, self.last_position)
+            else:
+                center, radius = self.predict_window()
+                position = self.search_in(
+                    img, get_window(img.shape[:2], center, radius), True)
+        if position is None:
+            position = self.search_full(img)
+        # A lost pupil (NaN) can be anywhere in the next frame
+        self.last_position = (position if np.isfinite(position).all() else
+                              None)
+        if self.predictor is not None:
+            self.predictor.update(self.frame_count, position)
+            self.frame_count += 1
+        return position
+
+    def reset(self):
+        self.last_position = None
+        self.blob = None
+        self.frame_count = 0
+        if callable(self.thres):
+            self.thres.reset()
+        if self.predictor is not None:
+            self.predictor.reset()
+
+    def update_threshold(self, img):
+        if hasattr(self.thres, 'sample'):
+            # Only the sampled pixels are converted to grayscale
+            self.threshold = self.thres.update(
+                self.grayscale(self.thres.sample(img)))
+        else:
+            self.threshold = self.thres(self.grayscale(img))
+
+    def predict_window(self):
+        region = self.predictor.confidence_region(self.frame_count, 0.99)
+        uncertainty = np.sqrt(region.radius_squared)
+        if not np.isfinite(uncertainty):
+            return self.last_position, self.radius
+        return region.center, min(self.radius,
+                                  self.min_radius + int(np.ceil(uncertainty)))
+
+    def search_full(self, img):
+        if self.downsample:
+            position = self.search_coarse_to_fine(img)
+            if position is not None:
+                return position
+        if self.profiler is not None:
+            t = perf_counter_ns()
+        grayscale_img = self.grayscale(img)
+        if self.profiler is not None:
+            self.profiler.record('grayscale', t)
+        region, window, seed = locate_blob(
+            grayscale_img, self.threshold,
+            self._get_mask(grayscale_img.shape), profiler=self.profiler)
+        self.blob = None
+        if region is None:
+            # Pupil not visible, e.g. a blink
+            return NO_POSITION
+        self.blob = np.count_nonzero(region), float(grayscale_img[seed])
+        if self.profiler is not None:
+            t = perf_counter_ns()
+        position = get_region_centroid(region, get_offset(window),
+                                       grayscale_img[window], self.threshold,
+                                       self.centroid)
+        if self.profiler is not None:
+            self.profiler.record('centroid', t)
+        return position
+
+    def search_coarse_to_fine(self, img):
+        factor = self.downsample
+        grayscale_img = self.grayscale(img[::factor, ::factor])
+        x, y = get_brightest_point(grayscale_img)
+        thresholded = threshold_image(grayscale_img, self.threshold,
+                                      self._get_mask(grayscale_img.shape))
+        if not thresholded[x, y]:
+            # Pupil too small to survive downsampling
+            return None
+        region, coarse_window = grow_region(thresholded, (x, y))
+
+        # Bounding box of the coarse blob, padded by one coarse pixel
+        rows = np.flatnonzero(region.any(1)) + coarse_window[0].start
+        cols = np.flatnonzero(region.any(0)) + coarse_window[1].start
+        window = (slice(max((rows[0] - 1)*factor, 0),
+                        min((rows[-1] + 2)*factor, img.shape[0])),
+                  slice(max((cols[0] - 1)*factor, 0),
+                        min((cols[-1] + 2)*factor, img.shape[1])))
+        return self.search_in(img, window)
+
+    def search_window(self, img, center):
+        return self.search_in(img, get_window(img.shape[:2], center,
+                                              self.radius), True)
+
+    def search_in(self, img, window, check_blob=False):
+        if self.profiler is not None:
+            t = perf_counter_ns()
+        grayscale_img = self.grayscale(img[window])
+        if self.profiler is not None:
+            t = self.profiler.record('grayscale', t)
+        x, y = get_brightest_point(grayscale_img)
+        if grayscale_img[x, y] <= self.threshold:
+            # Pupil lost
+            return None
+
+        thresholded = threshold_image(grayscale_img, self.threshold,
+                                      self._get_mask(grayscale_img.shape))
+        if self.profiler is not None:
+            t = self.profiler.record('threshold', t)
+        connected_clusters, _ = label(thresholded)
+        region = connected_clusters == connected_clusters[x, y]
+        if self.profiler is not None:
+            t = self.profiler.record('labelling', t)
+        if touches_border(region, window, img.shape):
+            # Pupil might extend beyond the window
+            return None
+
+        blob = np.count_nonzero(region), float(grayscale_img[x, y])
+        if check_blob and not self.is_same_blob(*blob):
+            return None
+        self.blob = blob
+        position = get_region_centroid(region,
+                                       (window[0].start, window[1].start),
+                                       grayscale_img, self.threshold,
+                                       self.centroid)
+        if self.profiler is not None:
+            self.profiler.record('centroid', t)
+        return position
+
+    def is_same_blob(self, area, peak):
+        if self.blob is None:
+            return True
+        last_area, last_peak = self.blob
+        change = self.max_blob_change
+        return (last_area/change <= area <= last_area*change and
+                peak - self.threshold >= (last_peak - self.threshold)/change)
+
+    def _get_mask(self, shape):
+        try:
+            return self._masks[shape]
+        except KeyError:
+            if len(self._masks) >= MAX_BUFFER_SHAPES:
+                self._masks.clear()
+            return self._masks.setdefault(shape, np.empty(shape, bool))
@@ -0,0 +1,95 @@
+import numpy as np
+
+from vyu.area import Circle
+
+
+class KalmanFilter(object):
+    # Constant velocity model of a 2d position. Both axes have the same
+    # dynamics and noise, so they share one 2x2 covariance of position and
+    # velocity. process_noise is the spectral density of random accelerations
+    # (units**2/s**3), measurement_noise the variance of a measured position
+    # (units**2). Time stamps can be in any unit, e.g. frames instead of
+    # seconds, as long as the noise is scaled accordingly. update usually
+    # runs on the capture thread while predictions are made on another, so
+    # time stamp, state and covariance are replaced together as a single
+    # tuple.
+
+    def __init__(self, process_noise=1e3, measurement_noise=1.,
+                 initial_velocity_variance=1e4):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_velocity_variance = initial_velocity_variance
+        self.reset()
+
+    def reset(self):
+        # Rows of the state are position and velocity, columns the axes. Both
+        # are unknown until the first valid position.
+        self.estimate = None, np.full((2, 2), np.nan), np.zeros((2, 2))
+
+    @property
+    def timestamp(self):
+        return self.estimate[0]
+
+    @property
+    def state(self):
+        return self.estimate[1]
+
+    @property
+    def covariance(self):
+        return self.estimate[2]
+
+    @property
+    def position(self):
+        return self.state[0].copy()
+
+    @property
+    def velocity(self):
+        return self.state[1].copy()
+
+    def update(self, timestamp, position):
+        # Returns the smoothed position. Positions with NaN (e.g. a lost
+        # pupil) only advance the filter in time.
+        position = np.asarray(position, 'd')
+        estimate = self.estimate
+        if estimate[0] is None:
+            if np.isfinite(position).all():
+                self.estimate = (timestamp,
+                                 np.array([position, np.zeros(2)]),
+                                 np.diag([self.measurement_noise,
+                                          self.initial_velocity_variance]))
+            return self.position
+
+        state, P = self._predict(timestamp, estimate)
+        if np.isfinite(position).all():
+            gain = P[:, 0]/(P[0, 0] + self.measurement_noise)
+            state = state + np.outer(gain, position - state[0])
+            P = P - np.outer(gain, P[0])
+        self.estimate = timestamp, state, P
+        return state[0].copy()
+
+    def predict(self, timestamp):
+        # Position expected at timestamp and its variance per axis
+        estimate = self.estimate
+        if estimate[0] is None:
+            return np.full(2, np.nan), np.inf
+        state, covariance = self._predict(timestamp, estimate)
+        return state[0], covariance[0, 0]
+
+    def confidence_region(self, timestamp, probability=0.95):
+        # Circle that contains the position at timestamp with the given
+        # probability
+        position, variance = self.predict(timestamp)
+        # Quantile of the chi-square distribution with 2 degrees of freedom
+        radius = np.sqrt(-2*np.log(1 - probability)*variance)
+        return Circle(position, radius)
+
+    def _predict(self, timestamp, estimate):
+        last_timestamp, state, covariance = estimate
+        dt = timestamp - last_timestamp
+        transition = np.array([[1., dt], [0., 1.]])
+        noise = self.process_noise*np.array([[dt**3/3, dt**2/2],
+                                             [dt**2/2, dt]])
+        state = np.dot(transition, state)
+        covariance = np.dot(np.dot(transition, covariance),
+                            transition.T) + noise
+        return state, covariance
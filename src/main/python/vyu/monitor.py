@@ -0,0 +1,179 @@
+import time
+from multiprocessing import Lock
+
+import numpy as np
+
+from vyu.image import rgb2gray
+from vyu.sharedmem import HEADER_SIZE, SharedBuffer
+
+
+class MonitorBuffer(SharedBuffer):
+    # The newest preview frame, its thresholded mask and the pupil position in
+    # shared memory. There is only a single slot. Writers make the counter
+    # odd while they write and even again afterwards, readers retry if the
+    # counter was odd or changed while they copied. The header holds the
+    # counter (int64), timestamp, position (2), step, rows and columns of the
+    # preview (int64).
+    _views = ('_count', '_header', '_extent', 'frame', 'mask')
+
+    def __init__(self, preview_shape=(120, 160), name=None, lock=None):
+        self.preview_shape = tuple(preview_shape)
+        # Several pipeline workers might publish, only one of them at a time
+        self.lock = Lock() if lock is None else lock
+        self._open(name)
+
+    @property
+    def nbytes(self):
+        rows, cols = self.preview_shape
+        return HEADER_SIZE + rows*cols*4
+
+    def write(self, timestamp, position, frame, thres=0.5,
+              grayscale=rgb2gray):
+        # The mask is thresholded like in the tracker, with the same
+        # grayscale conversion (e.g. vyu.image.UInt8Grayscale for integer
+        # thresholds) and threshold. Mono frames (2d) are shown in gray.
+        # Skip the frame instead of waiting for another writer
+        if not self.lock.acquire(False):
+            return False
+        try:
+            count = self.count
+            self._count[0] = count + 1
+            step = max(-(-frame.shape[0]//self.preview_shape[0]),
+                       -(-frame.shape[1]//self.preview_shape[1]))
+            decimated = frame[::step, ::step]
+            rows, cols = decimated.shape[:2]
+            preview = self.frame[:rows, :cols]
+            # Channel by channel is several times faster than copying strided
+            # pixels of three bytes
+            for channel in range(3):
+                if decimated.ndim == 2:
+                    preview[..., channel] = decimated
+                else:
+                    preview[..., channel] = decimated[..., channel]
+            np.greater(grayscale(preview), thres,
+                       out=self.mask[:rows, :cols])
+            self._header[:] = timestamp, position[0], position[1]
+            self._extent[:] = step, rows, cols
+            self._count[0] = count + 2
+        finally:
+            self.lock.release()
+        return True
+
+    def read(self, since=0):
+        # (count, timestamp, position in preview pixels, preview, mask) of the
+        # newest frame if it is newer than since. None if there is no new
+        # frame or a writer was busy, the next read will get it.
+        count = self.count
+        if count <= since or count % 2:
+            return None
+        timestamp, row, col = self._header
+        step, rows, cols = self._extent
+        preview = self.frame[:rows, :cols].copy()
+        mask = self.mask[:rows, :cols].copy()
+        if self.count != count:
+            return None
+        return count, timestamp, np.array([row, col])/step, preview, mask
+
+    def _state(self):
+        return {'preview_shape': self.preview_shape, 'lock': self.lock}
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        rows, cols = self.preview_shape
+        self._count = np.ndarray((1,), 'int64', buf)
+        self._header = np.ndarray((3,), 'd', buf, 8)
+        self._extent = np.ndarray((3,), 'int64', buf, 32)
+        self.frame = np.ndarray((rows, cols, 3), 'uint8', buf, HEADER_SIZE)
+        self.mask = np.ndarray((rows, cols), bool, buf,
+                               HEADER_SIZE + rows*cols*3)
+
+
+class MonitoredLocator(object):
+    # Wraps a locator and publishes frames and positions to a MonitorBuffer,
+    # but at most once per interval seconds, e.g. the refresh interval of the
+    # monitor. All other frames only cost a clock lookup. Unless thres is
+    # given, the mask uses the current threshold and the grayscale
+    # conversion of the locator (e.g. a vyu.image.PupilLocator), or those of
+    # vyu.image.image2position.
+
+    def __init__(self, locate, buffer, thres=None, interval=1/60.):
+        self.locate = locate
+        self.buffer = buffer
+        self.thres = thres
+        self.interval = interval
+        self.next_time = 0.
+        # Errors while publishing are counted instead of raised, the monitor
+        # must never stop tracking
+        self.errors = 0
+        self.last_error = None
+
+    def __call__(self, frame):
+        position = self.locate(frame)
+        now = time.perf_counter()
+        if now >= self.next_time:
+            try:
+                if self.publish(position, frame):
+                    self.next_time = now + self.interval
+            except Exception as error:
+                self.errors += 1
+                self.last_error = error
+                self.next_time = now + self.interval
+        return position
+
+    def publish(self, position, frame):
+        thres = self.thres
+        if thres is None:
+            thres = getattr(self.locate, 'threshold', 0.5)
+        grayscale = getattr(self.locate, 'grayscale', rgb2gray)
+        return self.buffer.write(time.time(), position, frame, thres,
+                                 grayscale)
+
+
+def run_monitor(buffer, stop, interval=1/60., size=(3., 3.), flipxy=False):
+    # Runs in its own process and redraws at most once per interval, only
+    # blitting the artists that change. matplotlib is only needed here.
+    import matplotlib.pyplot as plt
+
+    rows, cols = buffer.preview_shape
+    display = np.zeros((rows, cols, 3), 'uint8')
+    overlay = np.zeros((rows, cols, 4))
+    # Pixels above threshold are tinted
+    overlay[..., 0] = 1.
+
+    fig, ax = plt.subplots(figsize=size)
+    plt.setp(ax, frame_on=False, xticks=(), yticks=())
+    preview = ax.imshow(display, animated=True)
+    mask = ax.imshow(overlay, animated=True)
+    marker, = ax.plot([0], [0], '+', color='magenta', markersize=12,
+                      animated=True)
+    title = ax.set_title(' ', animated=True)
+    plt.show(block=False)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    count = 0
+    while not stop.is_set() and plt.fignum_exists(fig.number):
+        next_time = time.perf_counter() + interval
+        sample = buffer.read(count)
+        if sample is not None:
+            count, timestamp, (row, col), frame, pupil = sample
+            frame_rows, frame_cols = pupil.shape
+            display[:] = 0
+            display[:frame_rows, :frame_cols] = frame
+            preview.set_data(display)
+            overlay[..., 3] = 0.
+            overlay[:frame_rows, :frame_cols, 3] = .4*pupil
+            mask.set_data(overlay)
+            if flipxy:
+                row, col = col, row
+            marker.set_data([col], [row])
+            title.set_text('({:.1f}, {:.1f}) {:.0f} ms ago'.format(
+                row, col, 1000*(time.time() - timestamp)))
+
+            fig.canvas.restore_region(background)
+            for artist in (preview, mask, marker, title):
+                ax.draw_artist(artist)
+            fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+        time.sleep(max(next_time - time.perf_counter(), 0.))
+    plt.close(fig)
@@ -0,0 +1,181 @@
+import threading
+import time
+from multiprocessing import Event, Process, Queue, RawArray, Value
+
+from vyu.capture import RingBuffer
+from vyu.image import image2position
+from vyu.sharedmem import SharedRing
+from vyu.sources import FrameSource, iter_timestamped
+
+# Seconds between checks for a free slot if frames are not dropped
+SLOT_POLL_INTERVAL = 0.001
+
+
+class FramePipeline(object):
+    # Reads frames in one process, locates the pupil in a pool of worker
+    # processes and puts the results back into frame order in a RingBuffer.
+    # Frames are passed to the workers through shared memory slots. If all
+    # slots are busy, new frames are dropped, except for replays
+    # (vyu.sources.FrameSource), which wait for a free slot by default.
+
+    shutdown_timeout = 1.
+
+    def __init__(self, reader, locate=None, nworkers=2, size=64,
+                 nslots=None, frame_shape=None, drop_frames=None):
+        self.reader = reader
+        self.locate = image2position if locate is None else locate
+        if drop_frames is None:
+            drop_frames = not isinstance(reader, FrameSource)
+        self.drop_frames = drop_frames
+        self.nworkers = nworkers
+        self.nslots = 2*nworkers + 2 if nslots is None else nslots
+        self.frame_shape = frame_shape
+        self.samples = RingBuffer(size)
+        self._dropped_frames = Value('q', 0)
+        self._processes = []
+        self._reorder_thread = None
+
+    @property
+    def dropped_frames(self):
+        return self._dropped_frames.value
+
+    def start(self):
+        if self.frame_shape is None:
+            self.frame_shape = next(iter(self.reader)).shape
+        self._slots = SharedRing(self.nslots, self.frame_shape)
+        # Only the reader marks slots as busy and only the worker that
+        # processes a slot marks it as free again
+        self._busy_slots = RawArray('b', self.nslots)
+        self._tasks = Queue()
+        self._results = Queue()
+        self._stop = Event()
+        self.samples.reopen()
+
+        self._reader_process = Process(
+            target=read_frames,
+            args=(self.reader, self._slots, self._busy_slots, self._tasks,
+                  self._stop, self._dropped_frames, self.nworkers,
+                  self.drop_frames, self._results))
+        workers = [Process(target=process_frames,
+                           args=(self._slots, self._tasks, self._results,
+                                 self._busy_slots, self.locate))
+                   for _ in range(self.nworkers)]
+        self._processes = [self._reader_process] + workers
+        for process in self._processes:
+            process.daemon = True
+            process.start()
+
+        self._reorder_thread = threading.Thread(target=self._reorder,
+                                                daemon=True)
+        self._reorder_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._reader_process.join(self.shutdown_timeout)
+        if self._reader_process.is_alive():
+            # Stuck waiting for the camera, workers won't get sentinels
+            self._reader_process.terminate()
+            for _ in range(self.nworkers):
+                self._tasks.put(None)
+        for process in self._processes[1:]:
+            process.join(self.shutdown_timeout)
+        self._reorder_thread.join(self.shutdown_timeout)
+        self._slots.close()
+        self._slots.unlink()
+        self.samples.raise_error()
+
+    def join(self, timeout=None):
+        # Wait until all frames of a finite reader are processed
+        self._reorder_thread.join(timeout)
+
+    def latest(self, timeout=None):
+        return self.samples.latest(timeout)
+
+    def __iter__(self):
+        return iter(self.samples.cursor())
+
+    def _reorder(self):
+        # Errors of the reader and the workers arrive as exceptions in the
+        # results and stop the pipeline
+        pending = {}
+        next_index = 0
+        finished_workers = 0
+        error = None
+        try:
+            while finished_workers < self.nworkers:
+                result = self._results.get()
+                if result is None:
+                    finished_workers += 1
+                    continue
+                if isinstance(result, Exception):
+                    error = result
+                    break
+                index, timestamp, position = result
+                pending[index] = timestamp, position
+                while next_index in pending:
+                    timestamp, position = pending.pop(next_index)
+                    self.samples.append(position, timestamp)
+                    next_index += 1
+        except Exception as listener_error:
+            error = listener_error
+        finally:
+            if error is not None:
+                self._stop.set()
+            self.samples.close(error)
+
+
+def read_frames(reader, slots, busy_slots, tasks, stop, dropped_frames,
+                nworkers, drop_frames=True, results=None):
+    # Reader errors are put into results, the workers are always stopped
+    index = 0
+    try:
+        for timestamp, frame in iter_timestamped(reader):
+            if stop.is_set():
+                break
+            slot = find_free_slot(busy_slots)
+            if not drop_frames:
+                while slot is None and not stop.is_set():
+                    time.sleep(SLOT_POLL_INTERVAL)
+                    slot = find_free_slot(busy_slots)
+                if slot is None:
+                    break
+            if slot is None:
+                with dropped_frames.get_lock():
+                    dropped_frames.value += 1
+                continue
+            busy_slots[slot] = 1
+            slots.frames[slot] = frame
+            tasks.put((index, slot, timestamp))
+            index += 1
+    except Exception as error:
+        if results is None:
+            raise
+        results.put(error)
+    finally:
+        for _ in range(nworkers):
+            tasks.put(None)
+
+
+def find_free_slot(busy_slots):
+    for slot, busy in enumerate(busy_slots):
+        if not busy:
+            return slot
+    return None
+
+
+def process_frames(slots, tasks, results, busy_slots, locate):
+    while True:
+        task = tasks.get()
+        if task is None:
+            results.put(None)
+            return
+        index, slot, timestamp = task
+        try:
+            position = locate(slots.frames[slot])
+        except Exception as error:
+            # The pipeline stops, but the worker still takes its sentinel
+            results.put(error)
+            continue
+        finally:
+            busy_slots[slot] = 0
+        results.put((index, timestamp, tuple(position)))
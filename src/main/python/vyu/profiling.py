@@ -0,0 +1,113 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+# Upper edges of logarithmically spaced histogram bins from 1 µs to 10 s with
+# 20 bins per decade
+BIN_EDGES_NS = [int(10**(3 + i/20.)) for i in range(141)]
+
+
+class StageStats(object):
+
+    def __init__(self):
+        self.counts = [0]*(len(BIN_EDGES_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def add(self, duration_ns):
+        self.counts[bisect.bisect_left(BIN_EDGES_NS, duration_ns)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if self.max_ns is None or duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, q):
+        # Upper edge of the bin containing the q-th percentile, so the result
+        # overestimates by at most 12%
+        if not self.count:
+            return None
+        rank = q/100.*self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                if i == len(BIN_EDGES_NS):
+                    return self.max_ns
+                return min(self.max_ns, BIN_EDGES_NS[i])
+        return self.max_ns
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count,
+                'mean_us': self.total_ns/self.count/1e3,
+                'min_us': self.min_ns/1e3,
+                'max_us': self.max_ns/1e3,
+                'p50_us': self.percentile(50)/1e3,
+                'p90_us': self.percentile(90)/1e3,
+                'p99_us': self.percentile(99)/1e3}
+
+
+class Profiler(object):
+
+    def __init__(self):
+        # Stages are recorded from the capture thread while stats are read
+        # from the caller's
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.stages = OrderedDict()
+            self.frames = 0
+            self.dropped_frames = 0
+            self.first_frame_ns = None
+            self.last_frame_ns = None
+
+    def record(self, stage, start_ns):
+        now = time.perf_counter_ns()
+        with self._lock:
+            try:
+                stats = self.stages[stage]
+            except KeyError:
+                stats = self.stages[stage] = StageStats()
+            stats.add(now - start_ns)
+        return now
+
+    def count_frame(self):
+        now = time.perf_counter_ns()
+        with self._lock:
+            if self.first_frame_ns is None:
+                self.first_frame_ns = now
+            self.last_frame_ns = now
+            self.frames += 1
+
+    @property
+    def fps(self):
+        if self.frames < 2:
+            return None
+        duration_ns = self.last_frame_ns - self.first_frame_ns
+        return (self.frames - 1)*1e9/duration_ns
+
+    def stats(self):
+        with self._lock:
+            return {'stages': OrderedDict(
+                        (stage, stats.summary())
+                        for stage, stats in self.stages.items()),
+                    'frames': self.frames,
+                    'dropped_frames': self.dropped_frames,
+                    'fps': self.fps}
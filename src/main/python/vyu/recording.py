@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'),
+                         ('image', '<f8', (2,)),
+                         ('screen', '<f8', (2,)),
+                         ('flags', '<u4')])
+
+# Recordings are .npy files with a fixed size header, so that the number of
+# samples can be filled in when the recording is closed
+HEADER_SIZE = 256
+
+
+def npy_header(nsamples, dtype=RECORD_DTYPE):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False,
+                   'shape': (nsamples,)})
+    prefix = b'\x93NUMPY\x01\x00'
+    header_length = HEADER_SIZE - len(prefix) - 2
+    header = header.ljust(header_length - 1).encode('latin1') + b'\n'
+    return prefix + np.uint16(header_length).tobytes() + header
+
+
+class GazeRecorder(object):
+    # Samples are written into preallocated blocks. Full blocks are written
+    # to disk and flushed by a background thread, so that record() neither
+    # allocates nor waits for the disk. If all blocks are waiting to be
+    # written, new samples are dropped and counted.
+
+    def __init__(self, path, block_size=1024, nblocks=8):
+        self.path = path
+        self.block_size = block_size
+        self.nsamples = 0
+        self.dropped_samples = 0
+        self._file = open(path, 'wb')
+        self._file.write(npy_header(0))
+
+        self._free_blocks = queue.Queue()
+        for _ in range(nblocks):
+            self._free_blocks.put(np.zeros(block_size, RECORD_DTYPE))
+        self._full_blocks = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._next_block()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def record(self, timestamp, image, screen, flags=0):
+        with self._lock:
+            if self._block is None:
+                if self._closed:
+                    self.dropped_samples += 1
+                    return
+                self._next_block()
+                if self._block is None:
+                    self.dropped_samples += 1
+                    return
+            i = self._index
+            self._timestamps[i] = timestamp
+            self._image[i] = image
+            self._screen[i] = screen
+            self._flags[i] = flags
+            self._index += 1
+            if self._index == self.block_size:
+                self._full_blocks.put((self._block, self._index))
+                self._next_block()
+
+    def flush(self):
+        # Waits until all full blocks are on disk. Samples of the current
+        # block are only written when it is full or the recording is closed.
+        self._full_blocks.join()
+        self._file.flush()
+
+    def close(self):
+        # record usually runs on the capture thread, so samples recorded
+        # while closing are either in the last block or dropped
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._block is not None and self._index:
+                self._full_blocks.put((self._block, self._index))
+            self._block = None
+        self._full_blocks.put(None)
+        self._writer.join()
+        self._file.seek(0)
+        self._file.write(npy_header(self.nsamples))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _next_block(self):
+        try:
+            self._block = self._free_blocks.get_nowait()
+        except queue.Empty:
+            self._block = None
+            return
+        self._index = 0
+        self._timestamps = self._block['timestamp']
+        self._image = self._block['image']
+        self._screen = self._block['screen']
+        self._flags = self._block['flags']
+
+    def _write(self):
+        while True:
+            item = self._full_blocks.get()
+            if item is None:
+                self._full_blocks.task_done()
+                return
+            block, nsamples = item
+            self._file.write(block[:nsamples].data)
+            self._file.flush()
+            self.nsamples += nsamples
+            self._free_blocks.put(block)
+            self._full_blocks.task_done()
+
+
+def load_recording(path):
+    # Memory maps a recording. The number of samples is taken from the file
+    # size, so recordings that were not closed properly can be read as well.
+    return load_records(path, RECORD_DTYPE)
+
+
+def load_records(path, dtype=None):
+    if dtype is None:
+        with open(path, 'rb') as f:
+            np.lib.format.read_magic(f)
+            _, _, dtype = np.lib.format.read_array_header_1_0(f)
+    nsamples = (os.path.getsize(path) - HEADER_SIZE)//dtype.itemsize
+    if nsamples == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype, 'r', HEADER_SIZE, (nsamples,))
@@ -0,0 +1,152 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from vyu.capture import select_recent
+
+# The sample counter gets its own cache line in front of the data
+HEADER_SIZE = 64
+
+
+class SharedBuffer(object):
+    # Arrays in a block of shared memory that is created if name is None and
+    # attached to otherwise, e.g. after unpickling in another process.
+    # Subclasses define nbytes, _map_arrays, which creates the views listed
+    # in _views, and _state, the keyword arguments of __init__ apart from
+    # name.
+    _views = ()
+
+    def _open(self, name):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True,
+                                                  size=self.nbytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._map_arrays()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    def close(self):
+        # Views into the buffer have to be released before it can be closed
+        for view in self._views:
+            setattr(self, view, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def __getstate__(self):
+        return dict(self._state(), name=self.name)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class SharedRing(SharedBuffer):
+    # Ring buffer of timestamped positions (and optionally frames) in shared
+    # memory. There must only be a single writer process, but any number of
+    # processes can read. The writer fills a slot before it increments the
+    # aligned int64 sample counter, which readers use to find new samples.
+    _views = ('timestamps', 'positions', 'frames', '_count')
+
+    def __init__(self, size, frame_shape=None, frame_dtype='uint8',
+                 name=None):
+        self.size = size
+        self.frame_shape = None if frame_shape is None else tuple(frame_shape)
+        self.frame_dtype = np.dtype(frame_dtype)
+        self._open(name)
+
+    @property
+    def nbytes(self):
+        nbytes = HEADER_SIZE + self.size*3*8
+        if self.frame_shape is not None:
+            nbytes += (self.size*int(np.prod(self.frame_shape)) *
+                       self.frame_dtype.itemsize)
+        return nbytes
+
+    def put(self, position, timestamp=None, frame=None):
+        count = self.count
+        i = count % self.size
+        self.timestamps[i] = time.time() if timestamp is None else timestamp
+        self.positions[i] = position
+        if frame is not None:
+            self.frames[i] = frame
+        self._count[0] = count + 1
+
+    def latest(self):
+        count = self.count
+        if not count:
+            raise IndexError('No samples in buffer')
+        i = (count - 1) % self.size
+        return self.timestamps[i], self.positions[i].copy()
+
+    def cursor(self):
+        return SharedCursor(self)
+
+    def _state(self):
+        return {'size': self.size, 'frame_shape': self.frame_shape,
+                'frame_dtype': self.frame_dtype.str}
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        self._count = np.ndarray((1,), 'int64', buf)
+        offset = HEADER_SIZE
+        self.timestamps = np.ndarray((self.size,), 'd', buf, offset)
+        offset += self.size*8
+        self.positions = np.ndarray((self.size, 2), 'd', buf, offset)
+        offset += self.size*2*8
+        if self.frame_shape is None:
+            self.frames = None
+        else:
+            self.frames = np.ndarray((self.size,) + self.frame_shape,
+                                     self.frame_dtype, buf, offset)
+
+
+class SharedCursor(object):
+    # Queue-like reader for a SharedRing that starts at the newest sample
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.count = ring.count
+
+    def empty(self):
+        return self.count >= self.ring.count
+
+    def get_timestamped(self):
+        ring = self.ring
+        while True:
+            if self.empty():
+                raise IndexError('No new samples in buffer')
+            # The oldest slot might currently be overwritten by the writer
+            self.count = max(self.count, ring.count - ring.size + 1)
+            i = self.count % ring.size
+            sample = ring.timestamps[i], ring.positions[i].copy()
+            if ring.count - ring.size < self.count:
+                self.count += 1
+                return sample
+
+    def get(self):
+        return self.get_timestamped()[1]
+
+    def get_recent(self, n, until=None):
+        # The newest n unread samples up to the time stamp until as arrays.
+        # All unread samples are consumed.
+        ring = self.ring
+        while True:
+            count = ring.count
+            start = max(self.count, count - ring.size + 1)
+            indices = np.arange(start, count) % ring.size
+            # Only the positions of the selected samples are copied
+            timestamps, indices = select_recent(ring.timestamps[indices],
+                                                indices, n, until)
+            positions = ring.positions[indices]
+            if ring.count - ring.size < start:
+                self.count = count
+                return timestamps, positions
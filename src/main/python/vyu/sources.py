@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+
+from vyu.recording import npy_header, load_records
+
+
+class FrameSource(object):
+    # Readers that know when their frames were captured. Iterating yields
+    # frames like an imageio reader, iter_timestamped yields
+    # (timestamp, frame).
+
+    def iter_timestamped(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        for _, frame in self.iter_timestamped():
+            yield frame
+
+
+def iter_timestamped(reader):
+    if isinstance(reader, FrameSource):
+        return reader.iter_timestamped()
+    return ((time.time(), frame) for frame in reader)
+
+
+def raw_video_dtype(frame_shape, frame_dtype='uint8'):
+    return np.dtype([('timestamp', '<f8'),
+                     ('frame', frame_dtype, tuple(frame_shape))])
+
+
+class RawVideoRecorder(FrameSource):
+    # Passes frames through from another reader and appends them with their
+    # capture times to an uncompressed .npy file that RawVideoReader can
+    # replay
+
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.path = path
+        self.nframes = 0
+        self.dtype = None
+        self._file = None
+
+    def iter_timestamped(self):
+        for timestamp, frame in iter_timestamped(self.reader):
+            self.write(timestamp, frame)
+            yield timestamp, frame
+
+    def write(self, timestamp, frame):
+        frame = np.ascontiguousarray(frame)
+        if self._file is None:
+            self.dtype = raw_video_dtype(frame.shape, frame.dtype)
+            self._file = open(self.path, 'wb')
+            self._file.write(npy_header(0, self.dtype))
+        self._file.write(np.float64(timestamp).tobytes())
+        self._file.write(frame.data)
+        self.nframes += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.write(npy_header(self.nframes, self.dtype))
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RawVideoReader(FrameSource):
+    # Replays a raw video from a memory map. Frames are views into the map
+    # and are not copied. With realtime=True, frames are delivered with the
+    # original intervals, otherwise as fast as they are consumed.
+
+    def __init__(self, path, realtime=False):
+        self.records = load_records(path)
+        self.timestamps = self.records['timestamp']
+        self.frames = self.records['frame']
+        self.realtime = realtime
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_data(self, index):
+        return self.frames[index]
+
+    def iter_timestamped(self):
+        start = None
+        for timestamp, frame in zip(self.timestamps, self.frames):
+            if self.realtime:
+                if start is None:
+                    start = time.perf_counter() - timestamp
+                delay = start + timestamp - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield timestamp, frame
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def make_eye_frame(shape=(480, 640), center=None, pupil_radius=None,
+                   noise=0., glints=0, pupil_level=240, background_level=40,
+                   glint_level=200, glint_size=3, rng=None):
+    # Bright pupil on a dark background with additive gaussian noise and
+    # small specular glints. Glints are dimmer than the pupil by default, so
+    # that the brightest point stays on the pupil.
+    if rng is None:
+        rng = np.random.RandomState(0)
+    if center is None:
+        center = shape[0]/2., shape[1]/2.
+    if pupil_radius is None:
+        pupil_radius = min(shape)/16.
+
+    xx, yy = np.ogrid[:shape[0], :shape[1]]
+    frame = np.full(shape, background_level, 'd')
+    pupil = (xx - center[0])**2 + (yy - center[1])**2 <= pupil_radius**2
+    if noise:
+        frame += rng.normal(0, noise, size=shape)
+    for x, y in zip(rng.randint(0, shape[0] - glint_size, size=glints),
+                    rng.randint(0, shape[1] - glint_size, size=glints)):
+        frame[x:x+glint_size, y:y+glint_size] = glint_level
+    # Glints that overlap the pupil would change its centroid
+    frame[pupil] = pupil_level
+    frame = np.clip(frame, 0, 255).astype('uint8')
+    return np.repeat(frame[:, :, None], 3, axis=2)
+
+
+def make_trajectory(nframes, start, end, onset):
+    # Eye rests at start and jumps to end at frame onset
+    trajectory = np.empty((nframes, 2))
+    trajectory[:onset] = start
+    trajectory[onset:] = end
+    return trajectory
+
+
+class SyntheticReader(object):
+    # Stands in for an imageio reader. Frames are rendered in advance, so
+    # iterating does not cost more than a camera that delivers frames
+    # instantly.
+
+    def __init__(self, trajectory, shape=(480, 640), seed=0, **kwargs):
+        rng = np.random.RandomState(seed)
+        self.trajectory = np.asarray(trajectory, 'd')
+        self.frames = [make_eye_frame(shape, center, rng=rng, **kwargs)
+                       for center in self.trajectory]
+        self.on_frame = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        for i, frame in enumerate(self.frames):
+            if self.on_frame is not None:
+                self.on_frame(i)
+            yield frame
@@ -2,12 +2,14 @@ import time
 
 
 class Timer(object):
+    # All methods accept an optional time stamp (e.g. the capture time of a
+    # frame) and use the current time otherwise
 
     def __init__(self):
         self.t0 = None
 
-    def start(self):
-        self.t0 = time.time()
+    def start(self, now=None):
+        self.t0 = time.time() if now is None else now
 
     def clear(self):
         self.t0 = None
@@ -15,10 +17,12 @@ class Timer(object):
     def isrunning(self):
         return self.t0 is not None
 
-    def check_time(self, time_difference):
-        return time.time() - self.t0 >= time_difference
+    def check_time(self, time_difference, now=None):
+        if now is None:
+            now = time.time()
+        return now - self.t0 >= time_difference
 
-    def start_or_check(self, time_difference):
+    def start_or_check(self, time_difference, now=None):
         if not self.isrunning():
-            self.start()
-        return self.check_time(time_difference)
+            self.start(now)
+        return self.check_time(time_difference, now)
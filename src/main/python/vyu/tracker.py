@@ -1,64 +1,392 @@
-import os
-import signal
+import time
 from contextlib import contextmanager
-from multiprocessing import Process, Queue
-import imageio
+from functools import partial
+from multiprocessing import Event, Process
 import numpy as np
 
 from vyu.image import image2position
+from vyu.profiling import Profiler
 from vyu.timer import Timer
-from vyu import calibration
+from vyu import calibration, events, kalman
+from vyu.area import AreaSet
+from vyu.capture import BackgroundCapture
+from vyu.pipeline import FramePipeline
+from vyu.recording import GazeRecorder
+from vyu.sharedmem import SharedRing
+from vyu.sources import iter_timestamped
+from vyu.lazy import lazy_import
+from vyu.monitor import MonitorBuffer, MonitoredLocator, run_monitor
+
+imageio = lazy_import('imageio')
 
 
 class EyeTracker(object):
 
-    def __init__(self, camera='<video0>'):
+    shutdown_timeout = 1.
+
+    def __init__(self, camera='<video0>', locate=None, buffer_size=1024):
         # Initialize transformation from image2screen to identity
         # (i.e. do nothing)
         self.transform_matrix = np.eye(2)
         self.transform_bias = np.zeros(2)
-        self.reader = imageio.get_reader(camera)
+        # Higher order calibration model, replaces the affine transformation
+        # if set
+        self.calibration = None
+        # Optional calibration.DriftCorrector applied after the calibration
+        self.drift = None
+        # Image position of the last successful fixation
+        self.last_fixation = None
+        # Optional events.EventDetector that classifies screen positions
+        self.events = None
+        # Samples further apart than this (in seconds) don't belong to the
+        # same event
+        self.max_event_gap = 0.1
+        # Optional kalman.KalmanFilter of screen positions
+        self.prediction = None
+        self.monitor = None
+        self.recorder = None
+        if isinstance(camera, str):
+            self.reader = imageio.get_reader(camera)
+        else:
+            # Already opened reader, e.g. vyu.sources.RawVideoReader or
+            # vyu.synthetic.SyntheticReader
+            self.reader = camera
+        # Stateful locators like vyu.image.PupilLocator can be passed to
+        # restrict the search to a window around the last position
+        self.locate = image2position if locate is None else locate
+        # Optional background source of (timestamp, image position) samples
+        self.source = None
+        # Number of samples in the shared memory ring used for calibration
+        self.buffer_size = buffer_size
+        self.profiler = None
+
+    def enable_profiling(self):
+        self.profiler = Profiler()
+        self._attach_profiler(self.profiler)
+
+    def disable_profiling(self):
+        self.profiler = None
+        self._attach_profiler(None)
+
+    def _attach_profiler(self, profiler):
+        # The stages of image2position and of locators with a profiler
+        # attribute (e.g. vyu.image.PupilLocator) are timed per tracker
+        owner, locate = self, self.locate
+        if isinstance(locate, MonitoredLocator):
+            owner, locate = locate, locate.locate
+        if isinstance(locate, partial) and locate.func is image2position:
+            locate = image2position
+        if locate is image2position:
+            if profiler is not None:
+                locate = partial(image2position, profiler=profiler)
+            owner.locate = locate
+        elif hasattr(locate, 'profiler'):
+            locate.profiler = profiler
+
+    def stats(self):
+        if self.profiler is None:
+            raise RuntimeError('Profiling is not enabled')
+        if self.source is not None:
+            self.profiler.dropped_frames = self.source.dropped_frames
+        return self.profiler.stats()
+
+    def start_capture(self, size=64, drop_frames=None):
+        # By default frames are only dropped for live cameras, not for
+        # replays (vyu.sources.FrameSource)
+        self.source = BackgroundCapture(self.reader, self.locate, size,
+                                        drop_frames)
+        self._start_source()
+
+    def start_pipeline(self, nworkers=2, size=64, drop_frames=None):
+        self.source = FramePipeline(self.reader, self.locate, nworkers, size,
+                                    drop_frames=drop_frames)
+        self._start_source()
+
+    def _start_source(self):
+        # Background sources detect events in and record every sample, not
+        # only those that are consumed
+        self.source.samples.listeners.append(self._process_sample)
+        self.source.start()
+
+    def start_monitor(self, preview_shape=(120, 160), thres=None,
+                      interval=1/60., size=(3., 3.), flipxy=False):
+        # Shows downsampled frames, the thresholded pupil and its position in
+        # a separate process. Background sources take over the locator, so
+        # the monitor has to be started before and stopped after them. The
+        # mask uses the locator's threshold unless thres is given.
+        if self.source is not None:
+            raise RuntimeError('Start the monitor before the capture')
+        buffer = MonitorBuffer(preview_shape)
+        stop = Event()
+        process = Process(target=run_monitor,
+                          args=(buffer, stop, interval, size, flipxy),
+                          daemon=True)
+        process.start()
+        self.monitor = buffer, stop, process
+        self.locate = MonitoredLocator(self.locate, buffer, thres, interval)
+
+    def stop_monitor(self):
+        if self.monitor is None:
+            raise RuntimeError('The monitor is not running')
+        if self.source is not None:
+            raise RuntimeError('Stop the capture before the monitor')
+        buffer, stop, process = self.monitor
+        self.monitor = None
+        self.locate = self.locate.locate
+        stop.set()
+        process.join(self.shutdown_timeout)
+        if process.is_alive():
+            process.terminate()
+        buffer.close()
+        buffer.unlink()
+
+    def start_recording(self, path, **kwargs):
+        self.recorder = GazeRecorder(path, **kwargs)
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        recorder.close()
+
+    def _process_sample(self, timestamp, position):
+        # Called once for every sample, on the capture thread for background
+        # sources
+        recorder = self.recorder
+        if self.events is None and recorder is None and (
+                self.prediction is None):
+            return
+        screen_coords = self.image2screen(position)
+        if self.prediction is not None:
+            self.prediction.update(timestamp, screen_coords)
+        flags = 0
+        detector = self.events
+        if detector is not None:
+            if detector.previous is not None and (
+                    timestamp - detector.previous[0] > self.max_event_gap):
+                # Frames were missed, e.g. between synchronous calls
+                detector.reset()
+            detector.add(timestamp, screen_coords)
+            flags = detector.label
+        if recorder is not None:
+            recorder.record(timestamp, position, screen_coords, flags)
+
+    def stop_capture(self):
+        self.source.stop()
+        self.source = None
+
+    def samples(self):
+        if self.source is not None:
+            for sample in self.source:
+                if self.profiler is not None:
+                    self.profiler.count_frame()
+                yield sample
+        else:
+            t = time.perf_counter_ns()
+            for timestamp, frame in iter_timestamped(self.reader):
+                if self.profiler is not None:
+                    self.profiler.record('capture', t)
+                    self.profiler.count_frame()
+                position = self.locate(frame)
+                self._process_sample(timestamp, position)
+                yield timestamp, position
+                t = time.perf_counter_ns()
 
     def wait_for_fixation(self, target_area, patience=0.2):
+        if self.events is not None:
+            return self._wait_for_fixation_event(target_area, patience)
         timer = Timer()
-        for frame in self.reader:
-            centroid = self.image2screen(image2position(frame))
+        # Dwell times use frame time stamps, so that replayed recordings give
+        # the same result as the original session
+        for timestamp, position in self.samples():
+            centroid = self.image2screen(position)
             if centroid in target_area:
-                if timer.start_or_check(patience):
+                if timer.start_or_check(patience, timestamp):
+                    self.last_fixation = position
                     return
             else:
                 timer.clear()
 
+    def _wait_for_fixation_event(self, target_area, patience):
+        # The fixation has to be in the area, a single noisy sample or a
+        # blink don't end it. Only the part of the fixation after the first
+        # sample of this call counts, and the newest sample has to belong to
+        # it, not to a saccade that is not confirmed yet.
+        start = None
+        for timestamp, position in self.samples():
+            if start is None:
+                start = timestamp
+            previous = self.events.previous
+            fixation = self.events.current
+            if (fixation is not None and fixation.kind == events.FIXATION and
+                    fixation.end >= previous[0] and
+                    fixation.end - max(fixation.start, start) >= patience and
+                    fixation.position in target_area):
+                self.last_fixation = position
+                return
+
+    def wait_for_any_fixation(self, target_areas, patience=0.2):
+        # Returns the index of the first area that was fixated for patience
+        # seconds and the time stamp of the frame that completed the fixation.
+        # Dwell times are measured with frame time stamps.
+        if not isinstance(target_areas, AreaSet):
+            target_areas = AreaSet(target_areas)
+        timers = {}
+        for timestamp, position in self.samples():
+            hits = target_areas.find(self.image2screen(position))
+            # Timers of areas that were left are dropped
+            timers = {i: timers.get(i) or Timer() for i in hits}
+            for i in hits:
+                if timers[i].start_or_check(patience, timestamp):
+                    self.last_fixation = position
+                    return i, timestamp
+
     def image2screen(self, img_coords):
+        if self.profiler is not None:
+            t = time.perf_counter_ns()
+        screen_coords = self._calibrated(img_coords)
+        if self.drift is not None:
+            screen_coords = self.drift.apply(screen_coords)
+        if self.profiler is not None:
+            self.profiler.record('image2screen', t)
+        return screen_coords
+
+    def images2screen(self, img_coords):
+        # Batched image2screen for an (N, 2) array of image coordinates
+        if self.calibration is not None:
+            screen_coords = self.calibration.apply(img_coords)
+        else:
+            screen_coords = (np.dot(img_coords,
+                                    np.transpose(self.transform_matrix)) +
+                             self.transform_bias)
+        if self.drift is not None:
+            screen_coords = self.drift.apply(screen_coords)
+        return screen_coords
+
+    def _calibrated(self, img_coords):
+        if self.calibration is not None:
+            return self.calibration.apply(img_coords)
         screen_coords = np.dot(self.transform_matrix, img_coords)
         screen_coords += self.transform_bias
         return screen_coords
 
+    def enable_event_detection(self, velocity_threshold,
+                               dispersion_threshold, window=5,
+                               min_samples=3, max_gap=0.1):
+        # Thresholds are in screen units. The detector starts over after
+        # gaps of more than max_gap seconds between samples.
+        self.max_event_gap = max_gap
+        self.events = events.EventDetector(velocity_threshold,
+                                           dispersion_threshold, window,
+                                           min_samples)
+
+    def disable_event_detection(self):
+        self.events = None
+
+    def enable_prediction(self, process_noise, measurement_noise=1.,
+                          initial_velocity_variance=1e4):
+        # Noise is in screen units and seconds
+        self.prediction = kalman.KalmanFilter(process_noise,
+                                              measurement_noise,
+                                              initial_velocity_variance)
+
+    def disable_prediction(self):
+        self.prediction = None
+
+    def predict_gaze(self, timestamp=None):
+        # Screen position expected at timestamp, e.g. the next display flip,
+        # to hide the latency of camera and processing
+        if timestamp is None:
+            timestamp = time.time()
+        return self.prediction.predict(timestamp)[0]
+
+    def gaze_region(self, timestamp=None, probability=0.95):
+        if timestamp is None:
+            timestamp = time.time()
+        return self.prediction.confidence_region(timestamp, probability)
+
+    def enable_drift_correction(self, forgetting=0.9,
+                                prior_variance=(0.01, 1.)):
+        self.drift = calibration.DriftCorrector(forgetting, prior_variance)
+
+    def correct_drift(self, target_location, img_coords=None):
+        # Adds a verified fixation on a known target, by default the last
+        # successful wait_for_fixation. Cheap enough to call between trials.
+        if img_coords is None:
+            img_coords = self.last_fixation
+        if img_coords is None:
+            raise ValueError('No fixation to correct drift with')
+        if self.drift is None:
+            self.enable_drift_correction()
+        self.drift.add(self._calibrated(img_coords), target_location)
+
     @contextmanager
-    def calibrate(self):
-        queue = Queue()
-        collector = Process(target=collect_frames, args=(self.reader, queue))
-        calibrator = calibration.Calibrator(queue)
+    def calibrate(self, order=1, **kw):
+        # The calibrator's model gives a live estimate of the calibration
+        # after every target. Further keyword arguments select the samples
+        # per target, see calibration.Calibrator.
+        model = calibration.CalibrationModel(order)
+        if self.source is not None:
+            # The reader is already owned by the background capture
+            calibrator = calibration.Calibrator(self.source.samples.cursor(),
+                                                model=model, **kw)
+            yield calibrator
+            self._fit_calibration(calibrator)
+            return
+
+        ring = SharedRing(self.buffer_size)
+        stop = Event()
+        collector = Process(target=collect_frames,
+                            args=(self.reader, ring, self.locate, stop))
+        calibrator = calibration.Calibrator(ring.cursor(), model=model,
+                                            **kw)
         collector.start()
 
-        yield calibrator
+        try:
+            yield calibrator
+        finally:
+            stop.set()
+            collector.join(self.shutdown_timeout)
+            if collector.is_alive():
+                # Stuck waiting for the camera
+                collector.terminate()
+            ring.close()
+            ring.unlink()
 
-        collector.terminate()
-        # collect_frames runs infinite loop and needs to be killed
-        os.kill(collector.pid, signal.SIGKILL)
+        self._fit_calibration(calibrator)
 
+    def _fit_calibration(self, calibrator):
+        if self.drift is not None:
+            # A fresh calibration has no drift yet
+            self.drift.reset()
+        if calibrator.model.order != 1:
+            self.calibration = calibrator.model
+            return
         A, b = calibration.estimate_matrices(calibrator.target_locations,
                                              calibrator.image_locations)
         self.transform_matrix = A
         self.transform_bias = b
+        self.calibration = None
+
+    @property
+    def current_sample(self):
+        if self.source is not None:
+            timestamp, position = self.source.latest()
+        else:
+            timestamp, position = next(self.samples())
+        return timestamp, self.image2screen(position)
 
     @property
     def current_eye_position(self):
-        frame = next(iter(self.reader))
-        return self.image2screen(image2position(frame))
+        return self.current_sample[1]
 
 
-def collect_frames(reader, queue):
-    for frame in reader:
-        location = image2position(frame)
-        queue.put(location)
+def collect_frames(reader, queue, locate=None, stop=None):
+    # queue is a SharedRing. Samples carry capture time stamps, like those
+    # of background sources, so that calibration targets of a replay find
+    # their samples.
+    if locate is None:
+        locate = image2position
+    for timestamp, frame in iter_timestamped(reader):
+        if stop is not None and stop.is_set():
+            return
+        location = locate(frame)
+        queue.put(location, timestamp)
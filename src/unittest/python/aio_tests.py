@@ -0,0 +1,111 @@
+from unittest import TestCase, mock
+import asyncio
+import threading
+
+from vyu import aio, area
+
+
+def make_tracker(positions):
+    tracker = mock.Mock()
+    tracker.samples.side_effect = lambda: iter(
+        [(float(t), position) for t, position in enumerate(positions)])
+    tracker.image2screen.side_effect = lambda position: position
+    return tracker
+
+
+class BlockingSamples(object):
+    # Delivers a frame whenever release is called
+
+    def __init__(self):
+        self.semaphore = threading.Semaphore(0)
+        self.count = 0
+
+    def __call__(self):
+        while True:
+            self.semaphore.acquire()
+            self.count += 1
+            yield float(self.count), (100., 100.)
+
+    def release(self, n=1):
+        for _ in range(n):
+            self.semaphore.release()
+
+
+class TestSamples(TestCase):
+
+    def test_streams_screen_positions(self):
+        tracker = make_tracker([(0, 0), (1, 1)])
+        async_tracker = aio.AsyncEyeTracker(tracker)
+
+        async def collect():
+            return [sample async for sample in async_tracker.samples()]
+
+        samples = asyncio.run(collect())
+        self.assertEqual(samples, [(0., (0, 0)), (1., (1, 1))])
+        self.assertEqual(tracker.image2screen.call_count, 2)
+
+    def test_publish_drops_oldest_sample_of_full_queue(self):
+        async_tracker = aio.AsyncEyeTracker(mock.Mock(), maxsize=2)
+
+        async def publish():
+            queue = asyncio.Queue(2)
+            async_tracker._subscribers.add(queue)
+            for i in range(3):
+                async_tracker._publish(i)
+            return [queue.get_nowait() for _ in range(2)]
+
+        self.assertEqual(asyncio.run(publish()), [1, 2])
+
+
+class TestWaitForFixation(TestCase):
+
+    def setUp(self):
+        self.target = area.Circle((10, 10), 2)
+
+    def test_returns_timestamp_when_patience_is_over(self):
+        positions = [(0, 0), (10, 10), (10, 11), (10, 10), (10, 10)]
+        async_tracker = aio.AsyncEyeTracker(make_tracker(positions))
+        timestamp = asyncio.run(
+            async_tracker.wait_for_fixation(self.target, patience=2.))
+        self.assertEqual(timestamp, 3.)
+
+    def test_leaving_area_restarts_dwell(self):
+        positions = [(10, 10), (0, 0), (10, 10), (10, 10)]
+        async_tracker = aio.AsyncEyeTracker(make_tracker(positions))
+        timestamp = asyncio.run(
+            async_tracker.wait_for_fixation(self.target, patience=1.))
+        self.assertEqual(timestamp, 3.)
+
+    def test_timeout(self):
+        samples = BlockingSamples()
+        tracker = mock.Mock()
+        tracker.samples.side_effect = samples
+        async_tracker = aio.AsyncEyeTracker(tracker)
+
+        async def wait():
+            await async_tracker.wait_for_fixation(self.target, timeout=.05)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(wait())
+        self.assertFalse(async_tracker._subscribers)
+        self.assertTrue(async_tracker._stop.is_set())
+        samples.release()
+
+    def test_waiters_share_one_acquisition_stream(self):
+        samples = BlockingSamples()
+        tracker = mock.Mock()
+        tracker.samples.side_effect = samples
+        tracker.image2screen.side_effect = lambda position: position
+        async_tracker = aio.AsyncEyeTracker(tracker)
+
+        async def wait_for_both():
+            waiters = [asyncio.ensure_future(async_tracker.wait_for_fixation(
+                       area.Circle((100, 100), 1), patience=1.))
+                       for _ in range(2)]
+            await asyncio.sleep(.01)
+            samples.release(2)
+            return await asyncio.gather(*waiters)
+
+        self.assertEqual(asyncio.run(wait_for_both()), [2., 2.])
+        tracker.samples.assert_called_once_with()
+        samples.release()
@@ -1,5 +1,8 @@
 from unittest import TestCase
 
+import numpy as np
+import numpy.testing as npt
+
 from vyu import area
 
 
@@ -45,3 +48,94 @@ class TestCircle(TestCase):
     def test_point_outside_of_circle_should_be_false(self):
         point = (6, 9)
         self.assertFalse(point in self.circle)
+
+    def test_contains_points(self):
+        points = [(2, 2), (6, 9), (5, 0)]
+        self.assertEqual(list(self.circle.contains(points)),
+                         [True, False, False])
+
+
+class TestRectangleContainsPoints(TestCase):
+
+    def test_contains_matches_single_points(self):
+        rect = area.Rectangle((15, 15), (50, 50))
+        points = [(20, 40), (10, 10), (15, 50), (55, 25)]
+        self.assertEqual(list(rect.contains(points)),
+                         [point in rect for point in points])
+
+
+class TestEllipse(TestCase):
+
+    def setUp(self):
+        self.ellipse = area.Ellipse((0, 0), (4, 1), angle=np.pi/2)
+
+    def test_point_along_rotated_axis_is_inside(self):
+        self.assertTrue((0, 3) in self.ellipse)
+
+    def test_point_along_short_axis_is_outside(self):
+        self.assertFalse((3, 0) in self.ellipse)
+
+    def test_bounding_box_of_rotated_ellipse(self):
+        npt.assert_almost_equal(self.ellipse.bounding_box, (-1, -4, 1, 4))
+
+
+class TestPolygon(TestCase):
+
+    def setUp(self):
+        # L-shaped polygon
+        self.polygon = area.Polygon([(0, 0), (4, 0), (4, 1), (1, 1), (1, 4),
+                                     (0, 4)])
+
+    def test_point_in_polygon(self):
+        self.assertTrue((.5, 3) in self.polygon)
+        self.assertTrue((3, .5) in self.polygon)
+
+    def test_point_in_concave_part_is_outside(self):
+        self.assertFalse((3, 3) in self.polygon)
+
+    def test_bounding_box(self):
+        self.assertEqual(self.polygon.bounding_box, (0, 0, 4, 4))
+
+
+class TestAreaSet(TestCase):
+
+    def setUp(self):
+        self.areas = [area.Rectangle((0, 0), (10, 10)),
+                      area.Circle((8, 8), 3),
+                      area.Ellipse((30, 5), (5, 2)),
+                      area.Polygon([(20, 20), (30, 20), (25, 30)])]
+        self.area_set = area.AreaSet(self.areas)
+
+    def test_find_returns_all_containing_areas(self):
+        self.assertEqual(self.area_set.find((9, 9)), [0, 1])
+        self.assertEqual(self.area_set.find((25, 22)), [3])
+        self.assertEqual(self.area_set.find((100, 100)), [])
+
+    def test_contains_operator(self):
+        self.assertTrue((30, 5) in self.area_set)
+        self.assertFalse((15, 15) in self.area_set)
+
+    def test_point_on_upper_edge_is_found(self):
+        area_set = area.AreaSet([area.Rectangle((0, 0), (10, 10))])
+        self.assertEqual(area_set.find((10, 10)), [0])
+
+    def test_batch_matches_single_area_tests(self):
+        rng = np.random.RandomState(0)
+        points = rng.uniform(-5, 40, size=(2000, 2))
+        expected = np.array([[point in a for a in self.areas]
+                             for point in points])
+        npt.assert_array_equal(self.area_set.contains(points), expected)
+
+    def test_batch_with_many_areas_and_small_cells(self):
+        rng = np.random.RandomState(1)
+        areas = [area.Circle(center, 2)
+                 for center in rng.uniform(0, 100, size=(200, 2))]
+        area_set = area.AreaSet(areas, cell_size=3)
+        points = rng.uniform(0, 100, size=(200, 2))
+        expected = np.array([[a.contains([point])[0] for a in areas]
+                             for point in points])
+        npt.assert_array_equal(area_set.contains(points), expected)
+
+    def test_first(self):
+        npt.assert_array_equal(
+            self.area_set.first([(9, 9), (25, 22), (100, 100)]), [0, 3, -1])
@@ -0,0 +1,158 @@
+from unittest import TestCase, mock
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import area, binocular, image, sources
+from vyu.calibration import EmptyTrackingError
+
+
+def start(tracker, *samples):
+    # Started pipelines are only iterated by BinocularTracker.samples
+    for eye, eye_samples in zip(tracker.eyes, samples):
+        eye.source = eye_samples
+
+
+class TestPairSamples(TestCase):
+
+    def test_samples_within_offset_are_paired(self):
+        left = [(0., 'a'), (1., 'b')]
+        right = [(0.005, 'c'), (1.002, 'd')]
+        pairs = list(binocular.pair_samples([left, right], 0.01))
+        self.assertEqual([timestamp for timestamp, _ in pairs], [0.005, 1.002])
+        self.assertEqual(list(pairs[1][1]), ['b', 'd'])
+
+    def test_samples_without_partner_are_dropped(self):
+        left = [(0., 0), (1., 1), (2., 2)]
+        right = [(1., 10), (1.5, 11), (2., 12)]
+        pairs = list(binocular.pair_samples([left, right], 0.1))
+        self.assertEqual([list(values) for _, values in pairs],
+                         [[1, 10], [2, 12]])
+
+    def test_more_than_two_streams(self):
+        streams = [[(0., i), (1., i)] for i in range(3)]
+        pairs = list(binocular.pair_samples(streams, 0.))
+        self.assertEqual(len(pairs), 2)
+        self.assertEqual(list(pairs[0][1]), [0, 1, 2])
+
+    def test_stops_when_one_stream_ends(self):
+        pairs = list(binocular.pair_samples([[(0., 1)], []], 1.))
+        self.assertEqual(pairs, [])
+
+
+class TestCombineGaze(TestCase):
+
+    def test_averages_eyes(self):
+        npt.assert_array_equal(
+            binocular.combine_gaze([(0., 2.), (2., 4.)]), (1., 3.))
+
+    def test_ignores_lost_eye(self):
+        npt.assert_array_equal(
+            binocular.combine_gaze([(np.nan, np.nan), (2., 4.)]), (2., 4.))
+
+    def test_no_valid_eye(self):
+        self.assertTrue(np.isnan(
+            binocular.combine_gaze([(np.nan, 0.), (np.nan, np.nan)])).all())
+
+
+class TestBinocularTracker(TestCase):
+
+    def setUp(self):
+        self.left = mock.MagicMock(sources.FrameSource)
+        self.right = mock.MagicMock(sources.FrameSource)
+        self.tracker = binocular.BinocularTracker((self.left, self.right))
+        start(self.tracker,
+              [(0., (1., 1.)), (0.1, (2., 2.)), (0.2, (3., 3.))],
+              [(0.001, (5., 5.)), (0.1, (6., 6.)), (0.201, (7., 7.))])
+
+    def test_one_tracker_per_camera(self):
+        self.assertEqual([eye.reader for eye in self.tracker.eyes],
+                         [self.left, self.right])
+
+    def test_per_camera_locators(self):
+        locators = [mock.Mock(), mock.Mock()]
+        tracker = binocular.BinocularTracker((self.left, self.right),
+                                             locate=locators)
+        self.assertEqual([eye.locate for eye in tracker.eyes], locators)
+
+    def test_each_eye_gets_its_own_copy_of_a_locator(self):
+        locator = image.PupilLocator(radius=15)
+        tracker = binocular.BinocularTracker((self.left, self.right),
+                                             locate=locator)
+        left, right = [eye.locate for eye in tracker.eyes]
+        self.assertIsNot(left, right)
+        self.assertEqual(left.radius, 15)
+        left.last_position = (1., 1.)
+        self.assertIsNone(right.last_position)
+
+    def test_samples_require_started_pipelines(self):
+        tracker = binocular.BinocularTracker((self.left, self.right))
+        with self.assertRaises(RuntimeError):
+            next(tracker.gaze_samples())
+        self.left.iter_timestamped.assert_not_called()
+
+    def test_samples_are_paired_by_timestamp(self):
+        samples = list(self.tracker.samples())
+        self.assertEqual([timestamp for timestamp, _ in samples],
+                         [0.001, 0.1, 0.201])
+        npt.assert_array_equal(samples[1][1], [(2., 2.), (6., 6.)])
+
+    def test_each_eye_has_its_own_calibration(self):
+        self.tracker.eyes[1].transform_bias = np.array([-4., -4.])
+        _, gaze = next(self.tracker.gaze_samples())
+        npt.assert_array_equal(gaze, (1., 1.))
+
+    def test_start_runs_one_pipeline_per_camera(self):
+        for eye in self.tracker.eyes:
+            eye.start_pipeline = mock.Mock()
+            eye.stop_capture = mock.Mock()
+        self.tracker.start(nworkers=2)
+        self.tracker.stop()
+        for eye in self.tracker.eyes:
+            eye.start_pipeline.assert_called_once_with(2, 64)
+            eye.stop_capture.assert_called_once_with()
+
+    @mock.patch('vyu.binocular.Timer')
+    def test_wait_for_fixation_uses_combined_gaze(self, mock_timer):
+        mock_timer.return_value.start_or_check.side_effect = [False, True]
+        target = area.Circle((4., 4.), 1.5)
+
+        self.tracker.wait_for_fixation(target, 0.1)
+
+        mock_timer.return_value.start_or_check.assert_called_with(0.1, 0.1)
+        npt.assert_array_equal(self.tracker.last_fixation,
+                               [(2., 2.), (6., 6.)])
+        npt.assert_array_equal(self.tracker.eyes[0].last_fixation, (2., 2.))
+
+
+class TestBinocularCalibrator(TestCase):
+
+    def setUp(self):
+        self.calibrators = [mock.Mock(), mock.Mock()]
+        self.calibrator = binocular.BinocularCalibrator(self.calibrators)
+
+    def test_target_is_added_to_every_eye(self):
+        self.calibrator.append((1., 2.), timestamp=3.)
+        for calibrator in self.calibrators:
+            calibrator.image_location.assert_called_once_with(3.)
+            calibrator.add.assert_called_once_with(
+                (1., 2.), calibrator.image_location.return_value)
+
+    def test_target_is_skipped_if_one_eye_is_lost(self):
+        self.calibrators[1].image_location.side_effect = EmptyTrackingError
+        with self.assertRaises(EmptyTrackingError):
+            self.calibrator.append((1., 2.))
+        self.calibrators[0].add.assert_not_called()
+
+    def test_calibrate_enters_calibration_of_every_eye(self):
+        tracker = binocular.BinocularTracker((mock.Mock(), mock.Mock()))
+        for eye in tracker.eyes:
+            eye.calibrate = mock.MagicMock()
+        with tracker.calibrate(order=2, window=0.3) as C:
+            self.assertEqual(
+                C.calibrators,
+                [eye.calibrate.return_value.__enter__.return_value
+                 for eye in tracker.eyes])
+        for eye in tracker.eyes:
+            eye.calibrate.assert_called_once_with(2, window=0.3)
+            eye.calibrate.return_value.__exit__.assert_called_once()
@@ -3,7 +3,10 @@ import numpy.testing as npt
 
 import numpy as np
 
-from vyu.calibration import estimate_matrices, Calibrator, EmptyTrackingError
+from vyu.calibration import (estimate_matrices, Calibrator, EmptyTrackingError,
+                             CalibrationModel, DriftCorrector,
+                             aggregate_locations, polynomial_features)
+from vyu.capture import RingBuffer
 
 
 class TestEstimateMatrices(TestCase):
@@ -34,27 +37,25 @@ class TestEstimateMatrices(TestCase):
 class TestCalibrator(TestCase):
 
     def setUp(self):
-        self.mock_queue = mock.Mock()
+        self.mock_queue = mock.Mock(spec=['empty', 'get'])
         self.calibrator = Calibrator(self.mock_queue,
                                      nframes=2)
 
-    @mock.patch('vyu.calibration.np.mean')
-    def test_nframes_elements_in_queue_takes_mean_of_nframes(self, mock_mean):
+    def test_nframes_elements_in_queue_takes_mean_of_nframes(self):
         self.mock_queue.empty.side_effect = [False, False, True]
-        self.mock_queue.get.return_value = (1., 1.)
+        self.mock_queue.get.side_effect = [(1., 1.), (2., 3.)]
 
         self.calibrator.append(3)
 
-        mock_mean.assert_called_once_with([(1., 1.), (1., 1.)], 0)
+        npt.assert_almost_equal(self.calibrator.image_locations, [[1.5, 2.]])
 
-    @mock.patch('vyu.calibration.np.mean')
-    def test_less_elements_in_queue_takes_mean_of_less(self, mock_mean):
+    def test_less_elements_in_queue_takes_mean_of_less(self):
         self.mock_queue.empty.side_effect = [False, True]
         self.mock_queue.get.return_value = (1., 1.)
 
         self.calibrator.append(3)
 
-        mock_mean.assert_called_once_with([(1., 1.)], 0)
+        npt.assert_almost_equal(self.calibrator.image_locations, [[1., 1.]])
 
     def test_no_elements_in_queue_raises_exception(self):
         self.mock_queue.empty.return_value = True
@@ -62,14 +63,14 @@ class TestCalibrator(TestCase):
         with self.assertRaises(EmptyTrackingError):
             self.calibrator.append(3)
 
-    @mock.patch('vyu.calibration.np.mean')
-    def test_too_many_elements_in_queue_takes_last_nframes(self, mock_mean):
+    def test_too_many_elements_in_queue_takes_last_nframes(self):
         self.mock_queue.empty.side_effect = [False, False, False, True]
-        self.mock_queue.get.side_effect = [1, 2, 3]
+        self.mock_queue.get.side_effect = [(1., 1.), (2., 2.), (3., 3.)]
 
         self.calibrator.append(3)
 
-        mock_mean.assert_called_once_with([2, 3], 0)
+        npt.assert_almost_equal(self.calibrator.image_locations,
+                                [[2.5, 2.5]])
 
     def test_results_show_up_in_locations_lists(self):
         self.mock_queue.empty.side_effect = [False, False, True]
@@ -81,3 +82,207 @@ class TestCalibrator(TestCase):
                                  [(3., 3.)])
         npt.assert_almost_equal(self.calibrator.image_locations,
                                 np.array([[1.5, 1.]]))
+
+    def test_model_is_updated_with_mean_location(self):
+        self.calibrator.model = mock.Mock()
+        self.mock_queue.empty.side_effect = [False, False, True]
+        self.mock_queue.get.side_effect = [(1., 1.), (2., 1.)]
+
+        self.calibrator.append((3., 3.))
+
+        (location, target), _ = self.calibrator.model.add.call_args
+        npt.assert_almost_equal(location, [1.5, 1.])
+        self.assertEqual(target, (3., 3.))
+
+    def test_selecting_by_time_requires_timestamps(self):
+        self.mock_queue.empty.side_effect = [False, True]
+        self.mock_queue.get.return_value = (1., 1.)
+
+        with self.assertRaises(ValueError):
+            self.calibrator.append(3, timestamp=1.)
+
+
+class TestCalibratorTimeWindow(TestCase):
+
+    def setUp(self):
+        self.buffer = RingBuffer(16)
+        self.cursor = self.buffer.cursor()
+        # A saccade to the target followed by a fixation at (10, 10)
+        for i in range(10):
+            location = (10., 10.) if i >= 4 else (i, i)
+            self.buffer.append(location, 0.1*i)
+
+    def test_only_newest_nframes_are_read(self):
+        calibrator = Calibrator(self.cursor, nframes=3)
+
+        calibrator.append((0., 0.))
+
+        npt.assert_almost_equal(calibrator.image_locations, [[10., 10.]])
+        self.assertTrue(self.cursor.empty())
+
+    def test_window_excludes_stale_samples(self):
+        calibrator = Calibrator(self.cursor, nframes=10, window=0.25)
+
+        calibrator.append((0., 0.), timestamp=0.55)
+
+        npt.assert_almost_equal(calibrator.image_locations, [[10., 10.]])
+
+    def test_samples_after_timestamp_are_ignored(self):
+        calibrator = Calibrator(self.cursor, nframes=10)
+
+        calibrator.append((0., 0.), timestamp=0.15)
+
+        npt.assert_almost_equal(calibrator.image_locations, [[.5, .5]])
+
+    def test_samples_after_timestamp_do_not_use_up_nframes(self):
+        calibrator = Calibrator(self.cursor, nframes=3, window=0.25)
+
+        calibrator.append((0., 0.), timestamp=0.35)
+
+        npt.assert_almost_equal(calibrator.image_locations, [[2., 2.]])
+
+    def test_empty_window_raises_exception(self):
+        calibrator = Calibrator(self.cursor, nframes=3, window=0.05)
+
+        with self.assertRaises(EmptyTrackingError):
+            calibrator.append((0., 0.), timestamp=0.38)
+
+    def test_median_ignores_saccade_samples(self):
+        calibrator = Calibrator(self.cursor, nframes=7, statistic='median')
+
+        calibrator.append((0., 0.))
+
+        npt.assert_almost_equal(calibrator.image_locations, [[10., 10.]])
+
+
+class TestAggregateLocations(TestCase):
+
+    def setUp(self):
+        self.locations = np.array([(0., 1.), (1., 2.), (2., 3.), (3., 4.),
+                                   (100., 5.)])
+
+    def test_mean(self):
+        npt.assert_almost_equal(aggregate_locations(self.locations),
+                                [21.2, 3.])
+
+    def test_median(self):
+        npt.assert_almost_equal(
+            aggregate_locations(self.locations, 'median'), [2., 3.])
+
+    def test_trimmed_mean_drops_outliers(self):
+        npt.assert_almost_equal(
+            aggregate_locations(self.locations, 'trimmed', trim=0.2),
+            [2., 3.])
+
+    def test_trimmed_mean_keeps_at_least_one_sample(self):
+        npt.assert_almost_equal(
+            aggregate_locations(self.locations[:2], 'trimmed', trim=0.5),
+            [.5, 1.5])
+
+    def test_unknown_statistic(self):
+        with self.assertRaises(ValueError):
+            aggregate_locations(self.locations, 'mode')
+
+
+class TestPolynomialFeatures(TestCase):
+
+    def test_affine_features(self):
+        npt.assert_array_equal(polynomial_features((2., 3.)), [[2, 3, 1]])
+
+    def test_quadratic_features(self):
+        npt.assert_array_equal(polynomial_features([(2., 3.)], order=2),
+                               [[2, 3, 4, 6, 9, 1]])
+
+    def test_unsupported_order(self):
+        with self.assertRaises(ValueError):
+            polynomial_features((2., 3.), order=3)
+
+
+class TestCalibrationModel(TestCase):
+
+    def setUp(self):
+        grid = np.linspace(100, 500, 4)
+        self.image_locations = np.array([(x, y) for x in grid for y in grid])
+
+    def test_affine_model_matches_estimate_matrices(self):
+        A_ = np.array([[.05, .01], [-.02, .04]])
+        b_ = np.array([-10., -8.])
+        targets = np.dot(self.image_locations, A_.T) + b_
+        model = CalibrationModel()
+        for image_location, target in zip(self.image_locations, targets):
+            model.add(image_location, target)
+
+        A, b = model.matrices
+        npt.assert_almost_equal(A, A_)
+        npt.assert_almost_equal(b, b_)
+        A_lstsq, b_lstsq = estimate_matrices(targets, self.image_locations)
+        npt.assert_almost_equal(A, A_lstsq)
+        npt.assert_almost_equal(b, b_lstsq)
+
+    def test_quadratic_model_recovers_quadratic_map(self):
+        x, y = self.image_locations.T
+        targets = np.c_[.01*x + 1e-5*x*y, .02*y - 2e-5*x*x + 3]
+        model = CalibrationModel(order=2)
+        for image_location, target in zip(self.image_locations, targets):
+            model.add(image_location, target)
+
+        npt.assert_almost_equal(model.apply(self.image_locations), targets)
+
+    def test_apply_to_single_point(self):
+        model = CalibrationModel()
+        for image_location in self.image_locations:
+            model.add(image_location, image_location)
+        npt.assert_almost_equal(model.apply((250., 300.)), (250., 300.))
+
+    def test_live_estimate_after_single_target(self):
+        model = CalibrationModel(order=2)
+        model.add((300., 200.), (1., 2.))
+        self.assertEqual(model.npoints, 1)
+        npt.assert_almost_equal(model.apply((300., 200.)), (1., 2.))
+
+    def test_quadratic_model_has_no_matrices(self):
+        model = CalibrationModel(order=2)
+        model.add((300., 200.), (1., 2.))
+        with self.assertRaises(ValueError):
+            model.matrices
+
+
+class TestDriftCorrector(TestCase):
+
+    def setUp(self):
+        self.corrector = DriftCorrector(forgetting=.9)
+
+    def test_starts_as_identity(self):
+        npt.assert_array_equal(self.corrector.apply(np.array([3., 4.])),
+                               [3., 4.])
+
+    def test_learns_constant_offset(self):
+        rng = np.random.RandomState(0)
+        for _ in range(30):
+            screen = rng.uniform(-10, 10, size=2)
+            self.corrector.add(screen, screen + (1., -.5))
+        npt.assert_almost_equal(self.corrector.apply(np.zeros(2)),
+                                (1., -.5), decimal=2)
+
+    def test_learns_gain_and_offset(self):
+        rng = np.random.RandomState(1)
+        for _ in range(50):
+            screen = rng.uniform(-10, 10, size=2)
+            self.corrector.add(screen, 1.1*screen + 2.)
+        points = np.array([[5., -5.], [0., 1.]])
+        npt.assert_almost_equal(self.corrector.apply(points),
+                                1.1*points + 2., decimal=2)
+
+    def test_forgets_old_drift(self):
+        for _ in range(20):
+            self.corrector.add((0., 0.), (1., 1.))
+        for _ in range(20):
+            self.corrector.add((0., 0.), (3., 3.))
+        npt.assert_allclose(self.corrector.apply(np.zeros(2)), (3., 3.),
+                            atol=.5)
+
+    def test_reset(self):
+        self.corrector.add((0., 0.), (1., 1.))
+        self.corrector.reset()
+        self.assertEqual(self.corrector.nupdates, 0)
+        npt.assert_array_equal(self.corrector.apply(np.ones(2)), (1., 1.))
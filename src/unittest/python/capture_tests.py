@@ -0,0 +1,179 @@
+import time
+from unittest import TestCase, mock
+import numpy.testing as npt
+
+from vyu import capture, sources
+
+
+class ListSource(sources.FrameSource):
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def iter_timestamped(self):
+        for i, frame in enumerate(self.frames):
+            yield float(i), frame
+
+
+def slow_locate(frame):
+    time.sleep(0.01)
+    return frame, frame
+
+
+class TestRingBuffer(TestCase):
+
+    def setUp(self):
+        self.buffer = capture.RingBuffer(3)
+
+    def test_latest_returns_newest_sample(self):
+        self.buffer.append((1, 2), 10.)
+        self.buffer.append((3, 4), 11.)
+        timestamp, value = self.buffer.latest()
+        self.assertEqual(timestamp, 11.)
+        npt.assert_array_equal(value, (3, 4))
+
+    def test_latest_on_empty_buffer_raises_after_timeout(self):
+        with self.assertRaises(IndexError):
+            self.buffer.latest(timeout=0)
+
+    def test_overwrites_oldest_samples(self):
+        for i in range(5):
+            self.buffer.append((i, i), float(i))
+        timestamps, values, count = self.buffer.get_since(0)
+        npt.assert_array_equal(timestamps, [2, 3, 4])
+        npt.assert_array_equal(values[:, 0], [2, 3, 4])
+        self.assertEqual(count, 5)
+
+    def test_listeners_are_called_on_append(self):
+        listener = mock.Mock()
+        self.buffer.listeners.append(listener)
+        self.buffer.append((1, 2), 10.)
+        listener.assert_called_once_with(10., (1, 2))
+
+    def test_latest_on_closed_empty_buffer_raises(self):
+        self.buffer.close()
+        with self.assertRaises(IndexError):
+            self.buffer.latest()
+
+    def test_get_since_returns_only_new_samples(self):
+        for i in range(3):
+            self.buffer.append((i, i), float(i))
+        timestamps, _, _ = self.buffer.get_since(2)
+        npt.assert_array_equal(timestamps, [2])
+
+
+class TestCursor(TestCase):
+
+    def setUp(self):
+        self.buffer = capture.RingBuffer(3)
+        self.buffer.append((0, 0), 0.)
+        self.cursor = self.buffer.cursor()
+
+    def test_cursor_only_sees_new_samples(self):
+        self.assertTrue(self.cursor.empty())
+        self.buffer.append((1, 1), 1.)
+        self.assertFalse(self.cursor.empty())
+        npt.assert_array_equal(self.cursor.get(), (1, 1))
+        self.assertTrue(self.cursor.empty())
+
+    def test_cursor_skips_overwritten_samples(self):
+        for i in range(1, 6):
+            self.buffer.append((i, i), float(i))
+        self.assertEqual(self.cursor.get_timestamped()[0], 3.)
+
+    def test_get_recent_returns_newest_unread_samples(self):
+        for i in range(1, 4):
+            self.buffer.append((i, i), float(i))
+        timestamps, values = self.cursor.get_recent(2)
+        npt.assert_array_equal(timestamps, [2., 3.])
+        npt.assert_array_equal(values, [(2, 2), (3, 3)])
+        self.assertTrue(self.cursor.empty())
+
+    def test_get_recent_selects_samples_up_to_time_stamp(self):
+        for i in range(1, 4):
+            self.buffer.append((i, i), float(i))
+        timestamps, _ = self.cursor.get_recent(1, until=2.5)
+        npt.assert_array_equal(timestamps, [2.])
+        self.assertTrue(self.cursor.empty())
+
+    def test_get_raises_after_timeout(self):
+        with self.assertRaises(IndexError):
+            self.cursor.get(timeout=0)
+
+    def test_iteration_ends_once_closed_buffer_is_drained(self):
+        self.buffer.append((1, 1), 1.)
+        self.buffer.close()
+        self.assertEqual([timestamp for timestamp, _ in self.cursor], [1.])
+
+
+class TestBackgroundCapture(TestCase):
+
+    def test_processes_frames_from_reader(self):
+        locate = mock.Mock(side_effect=lambda frame: (frame, frame))
+        source = capture.BackgroundCapture(range(1, 4), locate, size=8)
+        source.start()
+        for thread in source._threads:
+            thread.join()
+
+        timestamps, values, count = source.samples.get_since(0)
+        self.assertEqual(count + source.dropped_frames, 3)
+        # The last frame is always processed
+        npt.assert_array_equal(values[-1], (3, 3))
+        self.assertTrue((timestamps[1:] >= timestamps[:-1]).all())
+
+    def test_iteration_ends_with_reader(self):
+        source = capture.BackgroundCapture(range(1, 4), slow_locate, size=8)
+        samples = iter(source)
+        source.start()
+        values = [value for _, value in samples]
+        source.stop()
+        npt.assert_array_equal(values[-1], (3, 3))
+        self.assertTrue(source.samples.closed)
+
+    def test_replays_are_not_dropped(self):
+        source = capture.BackgroundCapture(ListSource(range(5)), slow_locate,
+                                           size=8)
+        self.assertFalse(source.drop_frames)
+        samples = iter(source)
+        source.start()
+        self.assertEqual([timestamp for timestamp, _ in samples],
+                         [0., 1., 2., 3., 4.])
+        self.assertEqual(source.dropped_frames, 0)
+
+    def test_locate_errors_reach_consumers(self):
+        locate = mock.Mock(side_effect=[(1, 1), ValueError('no pupil')])
+        source = capture.BackgroundCapture(ListSource(range(5)), locate)
+        samples = iter(source)
+        source.start()
+        with self.assertRaises(ValueError):
+            list(samples)
+        with self.assertRaises(ValueError):
+            source.latest()
+        with self.assertRaises(ValueError):
+            source.stop()
+
+    def test_reader_errors_reach_consumers(self):
+        def frames():
+            yield 1
+            raise OSError('camera unplugged')
+
+        source = capture.BackgroundCapture(frames(), slow_locate)
+        samples = iter(source)
+        source.start()
+        with self.assertRaises(OSError):
+            list(samples)
+
+    def test_drops_frames_while_processing(self):
+        source = capture.BackgroundCapture([1, 2, 3], size=8)
+        source._frame = (0., 0)
+        source.running = True
+        source._read()
+        self.assertEqual(source.dropped_frames, 3)
+        self.assertEqual(source._frame[1], 3)
+
+    def test_latest_returns_newest_sample(self):
+        source = capture.BackgroundCapture([], size=8)
+        source.samples.append((1, 2), 5.)
+        timestamp, value = source.latest()
+        self.assertEqual(timestamp, 5.)
+        npt.assert_array_equal(value, (1, 2))
@@ -0,0 +1,117 @@
+from unittest import TestCase
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import events
+
+
+def make_gaze():
+    # Fixation, saccade, fixation with a noisy sample, blink, fixation
+    timestamps = 0.01*np.arange(60)
+    positions = np.zeros((60, 2))
+    positions[10:15] = np.linspace(0, 10, 7)[1:-1, None]
+    positions[15:] = 10.
+    positions[25] = 12.
+    positions[40:45] = np.nan
+    return timestamps, positions
+
+
+class TestEventDetector(TestCase):
+
+    def setUp(self):
+        self.timestamps, self.positions = make_gaze()
+        self.detector = events.EventDetector(velocity_threshold=50.,
+                                             dispersion_threshold=1.,
+                                             window=5)
+
+    def add_all(self):
+        labels, completed = [], []
+        for timestamp, position in zip(self.timestamps, self.positions):
+            event = self.detector.add(timestamp, position)
+            if event is not None:
+                completed.append(event)
+            labels.append(self.detector.label)
+        return np.array(labels), completed
+
+    def test_classifies_samples(self):
+        labels, _ = self.add_all()
+        self.assertEqual(labels[0], events.UNCLASSIFIED)
+        self.assertEqual(labels[5], events.FIXATION)
+        npt.assert_array_equal(labels[10:15], events.SACCADE)
+        npt.assert_array_equal(labels[40:45], events.BLINK)
+        self.assertEqual(labels[-1], events.FIXATION)
+
+    def test_noisy_sample_does_not_end_fixation(self):
+        _, completed = self.add_all()
+        kinds = [event.kind for event in completed]
+        self.assertEqual(kinds, [events.FIXATION, events.SACCADE,
+                                 events.FIXATION, events.BLINK])
+        fixation = completed[2]
+        npt.assert_array_equal(fixation.position, (10., 10.))
+        self.assertAlmostEqual(fixation.start, 0.19)
+        self.assertAlmostEqual(fixation.end, 0.39)
+
+    def test_blinks_have_no_position(self):
+        _, completed = self.add_all()
+        self.assertTrue(np.isnan(completed[3].position).all())
+        self.assertEqual(completed[3].nsamples, 5)
+
+    def test_current_event_is_ongoing_fixation(self):
+        self.add_all()
+        self.assertEqual(self.detector.current.kind, events.FIXATION)
+        self.assertAlmostEqual(self.detector.current.end, 0.59)
+
+    def test_reset(self):
+        self.add_all()
+        self.detector.reset()
+        self.assertIsNone(self.detector.current)
+        self.assertEqual(self.detector.count, 0)
+
+
+class TestOfflineDetection(TestCase):
+
+    def setUp(self):
+        self.timestamps, self.positions = make_gaze()
+        self.thresholds = dict(velocity_threshold=50.,
+                               dispersion_threshold=1., window=5)
+
+    def test_labels_match_online_detector(self):
+        detector = events.EventDetector(**self.thresholds)
+        online = [detector.classify(timestamp, position) for timestamp,
+                  position in zip(self.timestamps, self.positions)]
+        npt.assert_array_equal(
+            events.classify_samples(self.timestamps, self.positions,
+                                    **self.thresholds),
+            online)
+
+    def test_events_match_online_detector(self):
+        detector = events.EventDetector(**self.thresholds)
+        online = [detector.add(timestamp, position) for timestamp,
+                  position in zip(self.timestamps, self.positions)]
+        online = [event for event in online if event is not None]
+        online.append(detector.current)
+        offline = events.detect_events(self.timestamps, self.positions,
+                                       **self.thresholds)
+        self.assertEqual(len(offline), len(online))
+        for a, b in zip(offline, online):
+            self.assertEqual((a.kind, a.start, a.end, a.nsamples),
+                             (b.kind, b.start, b.end, b.nsamples))
+            npt.assert_almost_equal(a.position, b.position)
+
+    def test_short_saccade_separates_fixations(self):
+        positions = np.zeros((30, 2))
+        positions[15:] = 5.
+        fixations = events.detect_events(0.01*np.arange(30), positions,
+                                         **self.thresholds)
+        self.assertEqual([event.kind for event in fixations],
+                         [events.FIXATION, events.FIXATION])
+        npt.assert_array_equal(fixations[1].position, (5., 5.))
+
+    def test_short_recordings(self):
+        self.assertEqual(events.detect_events([], np.empty((0, 2)),
+                                              **self.thresholds), [])
+        npt.assert_array_equal(
+            events.classify_samples([0., 1.], [(0., 0.), (0., 0.)],
+                                    **self.thresholds),
+            [events.UNCLASSIFIED]*2)
@@ -0,0 +1,473 @@
+from unittest import TestCase, mock, skipIf
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import image, kalman, synthetic
+
+try:
+    from skimage.color import rgb2gray as skimage_rgb2gray
+except ImportError:
+    skimage_rgb2gray = None
+
+
+def make_frame(center, radius=6, shape=(120, 160), glints=()):
+    xx, yy = np.mgrid[:shape[0], :shape[1]]
+    frame = np.zeros(shape + (3,), 'uint8')
+    frame[(xx - center[0])**2 + (yy - center[1])**2 <= radius**2] = 230
+    for glint in glints:
+        frame[glint] = 255
+    return frame
+
+
+class TestImage2Position(TestCase):
+
+    def test_finds_center_of_disc(self):
+        npt.assert_almost_equal(image.image2position(make_frame((40, 70))),
+                                (40, 70))
+
+    def test_ignores_dimmer_blobs(self):
+        frame = make_frame((40, 70))
+        frame[100:105, 10:15] = 200
+        npt.assert_almost_equal(image.image2position(frame), (40, 70))
+
+    def test_dark_frame_has_no_position(self):
+        position = image.image2position(np.zeros((120, 160, 3), 'uint8'))
+        self.assertTrue(np.isnan(position).all())
+
+
+class TestImageProfiling(TestCase):
+
+    def setUp(self):
+        self.profiler = mock.Mock()
+        self.profiler.record.return_value = 0
+
+    def stages(self):
+        return [c[0][0] for c in self.profiler.record.call_args_list]
+
+    def test_records_stages_when_given(self):
+        image.image2position(make_frame((40, 70)), profiler=self.profiler)
+        self.assertEqual(self.stages(),
+                         ['grayscale', 'threshold', 'labelling', 'centroid'])
+
+    def test_records_stages_of_locator(self):
+        locator = image.PupilLocator(radius=15, profiler=self.profiler)
+        # Full frame search and window search
+        locator(make_frame((40, 70)))
+        locator(make_frame((41, 70)))
+        self.assertEqual(self.stages(),
+                         ['grayscale', 'threshold', 'labelling', 'centroid']*2)
+
+    def test_other_locators_are_not_profiled(self):
+        image.PupilLocator(radius=15, profiler=self.profiler)
+        image.PupilLocator(radius=15)(make_frame((40, 70)))
+        image.image2position(make_frame((40, 70)))
+        self.profiler.record.assert_not_called()
+
+
+class TestGetWindow(TestCase):
+
+    def test_window_centered_on_point(self):
+        self.assertEqual(image.get_window((100, 100), (50, 50), 10),
+                         (slice(40, 61), slice(40, 61)))
+
+    def test_window_shifted_at_border(self):
+        self.assertEqual(image.get_window((100, 100), (2, 97), 10),
+                         (slice(0, 21), slice(79, 100)))
+
+    def test_window_larger_than_image(self):
+        self.assertEqual(image.get_window((10, 100), (5, 50), 10),
+                         (slice(0, 10), slice(40, 61)))
+
+
+class TestPupilLocator(TestCase):
+
+    def setUp(self):
+        self.locator = image.PupilLocator(radius=15)
+
+    def test_first_frame_searches_full_frame(self):
+        npt.assert_almost_equal(self.locator(make_frame((40, 70))), (40, 70))
+
+    def test_follows_small_movements(self):
+        self.locator(make_frame((40, 70)))
+        npt.assert_almost_equal(self.locator(make_frame((43, 66))), (43, 66))
+        npt.assert_almost_equal(self.locator.last_position, (43, 66))
+
+    def test_window_ignores_glints_outside(self):
+        self.locator(make_frame((40, 70)))
+        frame = make_frame((41, 70), glints=[(100, 10)])
+        npt.assert_almost_equal(self.locator(frame), (41, 70))
+
+    def test_falls_back_to_full_frame_if_pupil_is_lost(self):
+        self.locator(make_frame((40, 70)))
+        npt.assert_almost_equal(self.locator(make_frame((90, 20))), (90, 20))
+
+    def test_falls_back_to_full_frame_if_pupil_touches_window_edge(self):
+        self.locator(make_frame((40, 70)))
+        frame = make_frame((40, 70), radius=20)
+        self.assertIsNone(self.locator.search_window(frame, (40, 70)))
+        npt.assert_almost_equal(self.locator(frame), (40, 70))
+
+    def test_dark_frame_has_no_position(self):
+        self.locator(make_frame((40, 70)))
+        dark = np.zeros((120, 160, 3), 'uint8')
+        self.assertTrue(np.isnan(self.locator(dark)).all())
+        self.assertIsNone(self.locator.last_position)
+        npt.assert_almost_equal(self.locator(make_frame((90, 20))), (90, 20))
+
+    def test_reset_forgets_last_position(self):
+        self.locator(make_frame((40, 70)))
+        self.locator.reset()
+        self.assertIsNone(self.locator.last_position)
+
+    def test_predictor_keeps_fast_pupil_in_small_window(self):
+        locator = image.PupilLocator(radius=15, min_radius=8,
+                                     predictor=kalman.KalmanFilter(1., .25))
+        locator.search_full = mock.Mock(wraps=locator.search_full)
+        for i in range(8):
+            position = locator(make_frame((20, 20 + 10*i)))
+        npt.assert_almost_equal(position, (20, 90))
+        # Only until the filter has learned the velocity
+        self.assertLessEqual(locator.search_full.call_count, 3)
+        center, radius = locator.predict_window()
+        npt.assert_almost_equal(center, (20, 100), decimal=1)
+        self.assertLess(radius, 15)
+
+    def test_reset_resets_predictor(self):
+        predictor = mock.Mock()
+        locator = image.PupilLocator(predictor=predictor)
+        locator(make_frame((40, 70)))
+        predictor.update.assert_called_once_with(0, mock.ANY)
+        locator.reset()
+        predictor.reset.assert_called_once_with()
+        self.assertEqual(locator.frame_count, 0)
+
+    def test_glint_left_in_window_is_not_taken_for_pupil(self):
+        # The pupil jumps further than radius and leaves a static reflection
+        # in the old window
+        start = make_frame((40, 70), radius=10)
+        end = make_frame((90, 130), radius=10)
+        for frame in (start, end):
+            frame[48:51, 78:81] = 200
+        locators = {
+            'plain': image.PupilLocator(radius=15),
+            'downsample': image.PupilLocator(radius=15, downsample=4),
+            'uint8': image.PupilLocator(thres=128, radius=15,
+                                        grayscale=image.UInt8Grayscale()),
+            'predictor': image.PupilLocator(
+                radius=15, predictor=kalman.KalmanFilter(1., .25)),
+        }
+        for name, locator in locators.items():
+            with self.subTest(name):
+                npt.assert_almost_equal(locator(start), (40, 70))
+                for _ in range(3):
+                    npt.assert_almost_equal(locator(end), (90, 130))
+
+    def test_blob_of_similar_size_is_accepted(self):
+        self.locator(make_frame((40, 70), radius=6))
+        self.locator.search_full = mock.Mock()
+        npt.assert_almost_equal(self.locator(make_frame((42, 70), radius=7)),
+                                (42, 70))
+        self.locator.search_full.assert_not_called()
+
+
+class TestGrowRegion(TestCase):
+
+    def setUp(self):
+        self.mask = np.zeros((100, 120), bool)
+        self.mask[10:14, 20:60] = True
+        self.mask[50:52, 50:52] = True
+
+    def test_region_contains_only_seed_component(self):
+        region, window = image.grow_region(self.mask, (11, 21), radius=4)
+        full_region = np.zeros_like(self.mask)
+        full_region[window] = region
+        npt.assert_array_equal(full_region[:30], self.mask[:30])
+        self.assertFalse(full_region[30:].any())
+
+    def test_window_grows_beyond_initial_radius(self):
+        region, window = image.grow_region(self.mask, (11, 21), radius=4)
+        self.assertGreaterEqual(window[1].stop - window[1].start, 40)
+
+
+class TestSeededImage2Position(TestCase):
+
+    def test_seeded_matches_full_labelling_with_glints(self):
+        rng = np.random.RandomState(1)
+        for _ in range(10):
+            frame = make_frame(rng.randint(10, 110, size=2), radius=8)
+            noise = rng.rand(*frame.shape[:2]) > .9
+            frame[noise] = 200
+            self.assertEqual(image.image2position(frame, seeded=True),
+                             image.image2position(frame, seeded=False))
+
+    def test_seed_below_threshold_uses_full_labelling(self):
+        frame = make_frame((40, 70)) // 4
+        self.assertEqual(image.image2position(frame, seeded=True),
+                         image.image2position(frame, seeded=False))
+
+
+class TestRgb2Gray(TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.frame = rng.randint(0, 256, size=(30, 40, 3)).astype('uint8')
+
+    def test_uint8_is_scaled_to_unit_range(self):
+        white = np.full((2, 2, 3), 255, 'uint8')
+        npt.assert_almost_equal(image.rgb2gray(white), 1.)
+        self.assertEqual(image.img_as_float(white).dtype, np.float64)
+
+    def test_float_precision_is_kept(self):
+        frame = self.frame.astype('float32')/255
+        self.assertEqual(image.rgb2gray(frame).dtype, np.float32)
+
+    @skipIf(skimage_rgb2gray is None, 'scikit-image not installed')
+    def test_identical_to_skimage(self):
+        for frame in [self.frame, self.frame.astype('uint16')*257,
+                      self.frame/255., (self.frame/255.).astype('float32')]:
+            grayscale_img = image.rgb2gray(frame)
+            expected = skimage_rgb2gray(frame)
+            self.assertEqual(grayscale_img.dtype, expected.dtype)
+            npt.assert_array_equal(grayscale_img, expected)
+
+
+class TestUInt8Grayscale(TestCase):
+
+    def setUp(self):
+        self.grayscale = image.UInt8Grayscale()
+
+    def test_close_to_rgb2gray(self):
+        rng = np.random.RandomState(0)
+        frame = rng.randint(0, 256, size=(30, 40, 3)).astype('uint8')
+        grayscale_img = self.grayscale(frame)
+        self.assertEqual(grayscale_img.dtype, np.uint8)
+        npt.assert_allclose(grayscale_img,
+                            255*image.rgb2gray(frame), atol=1.5)
+
+    def test_reuses_buffers(self):
+        frame = make_frame((40, 70))
+        first = self.grayscale(frame)
+        second = self.grayscale(frame)
+        self.assertIs(first, second)
+
+    def test_single_channel(self):
+        frame = make_frame((40, 70))
+        frame[..., 1] = 7
+        grayscale = image.UInt8Grayscale(channel=1)
+        self.assertTrue((grayscale(frame) == 7).all())
+
+    def test_passes_through_mono_frames(self):
+        frame = np.zeros((10, 10), 'uint8')
+        self.assertIs(self.grayscale(frame), frame)
+
+
+class TestUInt8PupilLocator(TestCase):
+
+    def test_matches_float_locator(self):
+        uint8_locator = image.PupilLocator(
+            thres=128, radius=15, grayscale=image.UInt8Grayscale())
+        float_locator = image.PupilLocator(radius=15)
+        for center in [(40, 70), (42, 72), (45, 75), (90, 20)]:
+            frame = make_frame(center, glints=[(5, 5)])
+            npt.assert_almost_equal(uint8_locator(frame),
+                                    float_locator(frame))
+
+
+class TestAdaptiveThreshold(TestCase):
+
+    def setUp(self):
+        # Dim background and a pupil that covers about 3% of the frame
+        self.frame = make_frame((60, 80), radius=12)
+        self.frame[self.frame == 0] = 40
+
+    def test_otsu_separates_pupil_from_background(self):
+        thres = image.AdaptiveThreshold(step=1)
+        value = thres(image.rgb2gray(self.frame))
+        self.assertTrue(40/255. <= value < 230/255.)
+
+    def test_integer_images_use_integer_scale(self):
+        thres = image.AdaptiveThreshold(step=2)
+        value = thres(self.frame[..., 0])
+        self.assertTrue(40 <= value < 230)
+
+    def test_percentile(self):
+        thres = image.AdaptiveThreshold(90., step=1)
+        self.assertEqual(thres(self.frame[..., 0]), 40)
+        with self.assertRaises(ValueError):
+            image.AdaptiveThreshold(110.)
+        with self.assertRaises(ValueError):
+            image.AdaptiveThreshold('foo')
+
+    def test_uniform_frames(self):
+        for level in (0, 255):
+            frame = np.full((120, 160, 3), level, 'uint8')
+            thres = image.AdaptiveThreshold()
+            self.assertEqual(thres(frame[..., 0]), level)
+            # Nothing is above threshold
+            self.assertFalse((image.rgb2gray(frame) > thres(
+                image.rgb2gray(frame))).any())
+            # No pupil
+            self.assertTrue(np.isnan(image.image2position(
+                frame, image.AdaptiveThreshold())).all())
+            locator = image.PupilLocator(thres=image.AdaptiveThreshold())
+            self.assertTrue(np.isnan(locator(frame)).all())
+
+    def test_histogram_forgets_old_frames(self):
+        thres = image.AdaptiveThreshold(99.9, step=1, forgetting=0.5)
+        thres(self.frame[..., 0])
+        dark = self.frame//2
+        values = [thres(dark[..., 0]) for i in range(10)]
+        self.assertGreater(values[0], values[-1])
+        self.assertEqual(values[-1], 115)
+
+    def test_image2position(self):
+        position = image.image2position(self.frame,
+                                        image.AdaptiveThreshold())
+        npt.assert_almost_equal(position, (60, 80))
+
+    def test_locator_follows_illumination(self):
+        locator = image.PupilLocator(thres=image.AdaptiveThreshold(),
+                                     radius=20)
+        npt.assert_almost_equal(locator(self.frame), (60, 80))
+        # Too dark for a fixed threshold of 0.5
+        dark = make_frame((62, 80), radius=12)//2
+        dark[dark == 0] = 20
+        for i in range(10):
+            position = locator(dark)
+        npt.assert_almost_equal(position, (62, 80))
+        self.assertLess(locator.threshold, 115/255.)
+
+    def test_uint8_locator(self):
+        locator = image.PupilLocator(thres=image.AdaptiveThreshold(),
+                                     radius=20,
+                                     grayscale=image.UInt8Grayscale())
+        npt.assert_almost_equal(locator(self.frame), (60, 80))
+        self.assertTrue(40 <= locator.threshold < 230)
+
+    def test_reset(self):
+        locator = image.PupilLocator(thres=image.AdaptiveThreshold())
+        locator(self.frame)
+        locator.reset()
+        self.assertIsNone(locator.thres.histogram)
+
+
+class TestImage2PositionBatch(TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.frames = np.array([
+            make_frame(rng.randint(10, 110, size=2), radius=8)
+            for _ in range(7)])
+        self.frames[rng.rand(*self.frames.shape[:3]) > .9] = 200
+        # Frame without any pixel above threshold
+        self.frames[3] //= 4
+        self.expected = np.array([image.image2position(frame)
+                                  for frame in self.frames])
+
+    def test_identical_to_single_frames(self):
+        positions = image.image2position_batch(self.frames, chunksize=3)
+        self.assertEqual(positions.shape, (7, 2))
+        npt.assert_array_equal(positions, self.expected)
+
+    def test_accepts_iterables(self):
+        positions = image.image2position_batch(iter(self.frames),
+                                               chunksize=4)
+        npt.assert_array_equal(positions, self.expected)
+
+    def test_empty_input(self):
+        self.assertEqual(image.image2position_batch([]).shape, (0, 2))
+
+    def test_stack2gray_identical_to_rgb2gray(self):
+        grayscale_imgs = image.stack2gray(self.frames)
+        for frame, grayscale_img in zip(self.frames, grayscale_imgs):
+            npt.assert_array_equal(grayscale_img, image.rgb2gray(frame))
+
+    def test_chunksize_bounds_pixels(self):
+        self.assertEqual(image.get_chunksize(np.empty((5, 480, 640, 3))), 1)
+        self.assertEqual(image.get_chunksize(self.frames),
+                         image.CHUNK_PIXELS // (120*160))
+        self.assertEqual(image.get_chunksize(iter(self.frames)), 1)
+
+
+class TestMomentCentroid(TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.region = rng.rand(30, 40) > .5
+
+    def test_unweighted_matches_get_centroid(self):
+        npt.assert_almost_equal(image.get_moment_centroid(self.region),
+                                image.get_centroid(self.region))
+
+    def test_offset(self):
+        npt.assert_almost_equal(
+            image.get_moment_centroid(self.region, offset=(5, 7)),
+            image.get_centroid(self.region, (5, 7)))
+
+    def test_weights_pull_towards_heavier_pixels(self):
+        region = np.zeros((3, 3), bool)
+        region[1, 1:] = True
+        weights = np.array([[5, 5, 5], [5, 1, 3], [5, 5, 5]], 'd')
+        npt.assert_almost_equal(
+            image.get_moment_centroid(region, weights), (1, 1.75))
+
+
+class TestCentroidMethods(TestCase):
+
+    def test_moments_match_mean(self):
+        frame = make_frame((40.3, 70.6), radius=9)
+        npt.assert_almost_equal(
+            image.image2position(frame, centroid='moments'),
+            image.image2position(frame, centroid='mean'))
+
+    def test_weighted_centroid_is_subpixel_accurate(self):
+        # Blurred disc with its center between pixels
+        xx, yy = np.mgrid[:80, :100]
+        distance = np.hypot(xx - 40.3, yy - 60.6)
+        frame = np.clip(255*(12 - distance)/4, 0, 255).astype('uint8')
+        frame = np.repeat(frame[:, :, None], 3, 2)
+        weighted = image.image2position(frame, thres=.2, centroid='weighted')
+        npt.assert_allclose(weighted, (40.3, 60.6), atol=.02)
+
+    def test_locator_uses_centroid_method(self):
+        locator = image.PupilLocator(radius=15, centroid='moments')
+        for center in [(40, 70), (42, 71)]:
+            npt.assert_almost_equal(locator(make_frame(center)), center)
+
+    def test_unknown_method_raises(self):
+        with self.assertRaises(ValueError):
+            image.image2position(make_frame((40, 70)), centroid='median')
+
+
+class TestCoarseToFine(TestCase):
+
+    def test_accuracy_against_full_resolution(self):
+        rng = np.random.RandomState(4)
+        locator = image.PupilLocator(downsample=4)
+        errors = []
+        for _ in range(10):
+            center = rng.uniform(50, 430), rng.uniform(50, 590)
+            frame = synthetic.make_eye_frame((480, 640), center, noise=10,
+                                             glints=50, rng=rng)
+            errors.append(np.subtract(locator.search_full(frame),
+                                      image.image2position(frame)))
+        # Same region is found, so only rounding differences remain
+        self.assertLess(np.abs(errors).max(), 1e-9)
+
+    def test_refinement_window_is_small(self):
+        locator = image.PupilLocator(downsample=4)
+        frame = synthetic.make_eye_frame((480, 640), (100, 200),
+                                         pupil_radius=20)
+        with mock.patch.object(locator, 'search_in',
+                               wraps=locator.search_in) as search_in:
+            npt.assert_almost_equal(locator.search_full(frame), (100, 200))
+        rows, cols = search_in.call_args[0][1]
+        self.assertLessEqual(rows.stop - rows.start, 56)
+        self.assertLessEqual(cols.stop - cols.start, 56)
+
+    def test_small_pupil_falls_back_to_full_resolution(self):
+        locator = image.PupilLocator(downsample=8)
+        frame = make_frame((41, 69), radius=1)
+        self.assertIsNone(locator.search_coarse_to_fine(frame))
+        npt.assert_almost_equal(locator.search_full(frame), (41, 69))
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import kalman
+
+
+class TestKalmanFilter(TestCase):
+
+    def setUp(self):
+        self.filter = kalman.KalmanFilter(process_noise=1.,
+                                          measurement_noise=.01)
+
+    def track(self, n=20, velocity=(2., -1.)):
+        for t in range(n):
+            self.filter.update(0.1*t, 0.1*t*np.array(velocity))
+
+    def test_learns_constant_velocity(self):
+        self.track()
+        npt.assert_almost_equal(self.filter.velocity, (2., -1.), decimal=2)
+        npt.assert_almost_equal(self.filter.position, (3.8, -1.9), decimal=2)
+
+    def test_predicts_future_positions(self):
+        self.track()
+        position, _ = self.filter.predict(2.5)
+        npt.assert_almost_equal(position, (5., -2.5), decimal=2)
+
+    def test_predict_does_not_change_state(self):
+        self.track()
+        state = self.filter.state.copy()
+        self.filter.predict(5.)
+        npt.assert_array_equal(self.filter.state, state)
+
+    def test_update_replaces_estimate_at_once(self):
+        # Readers on other threads keep a consistent snapshot
+        self.track()
+        estimate = self.filter.estimate
+        timestamp, state, covariance = [np.copy(x) for x in estimate]
+        self.filter.update(2., (4., -2.))
+        self.assertIsNot(self.filter.estimate, estimate)
+        self.assertEqual(self.filter.timestamp, 2.)
+        self.assertEqual(estimate[0], timestamp)
+        npt.assert_array_equal(estimate[1], state)
+        npt.assert_array_equal(estimate[2], covariance)
+
+    def test_uncertainty_grows_with_horizon(self):
+        self.track()
+        _, near = self.filter.predict(2.)
+        _, far = self.filter.predict(3.)
+        self.assertLess(near, far)
+
+    def test_smooths_noisy_measurements(self):
+        rng = np.random.default_rng(0)
+        errors = []
+        for t in range(200):
+            measured = rng.normal(0., .1, 2)
+            errors.append(self.filter.update(0.01*t, measured))
+        self.assertLess(np.std(errors[100:]), .05)
+
+    def test_missing_measurements_only_advance_time(self):
+        self.track()
+        position = self.filter.update(2., (np.nan, np.nan))
+        npt.assert_almost_equal(position, (4., -2.), decimal=2)
+        self.assertEqual(self.filter.timestamp, 2.)
+
+    def test_confidence_region(self):
+        self.track()
+        region = self.filter.confidence_region(2., probability=0.99)
+        self.assertIn((4., -2.), region)
+        self.assertNotIn((5., -2.), region)
+
+    def test_prediction_before_first_measurement(self):
+        position, variance = self.filter.predict(1.)
+        self.assertTrue(np.isnan(position).all())
+        self.assertEqual(variance, np.inf)
+        self.filter.update(0., (np.nan, 1.))
+        self.assertIsNone(self.filter.timestamp)
+
+    def test_update_before_first_measurement(self):
+        position = self.filter.update(0., (np.nan, np.nan))
+        self.assertTrue(np.isnan(position).all())
+        self.assertTrue(np.isnan(self.filter.position).all())
+        npt.assert_array_equal(self.filter.update(1., (2., 3.)), (2., 3.))
@@ -0,0 +1,35 @@
+from unittest import TestCase
+import subprocess
+import sys
+
+from vyu import lazy
+
+
+class TestLazyImport(TestCase):
+
+    def test_returns_already_imported_module(self):
+        self.assertIs(lazy.lazy_import('sys'), sys)
+
+    def test_missing_module_raises(self):
+        with self.assertRaises(ImportError):
+            lazy.lazy_import('vyu_no_such_module')
+
+    def test_tracker_does_not_load_heavy_dependencies(self):
+        script = ('import sys, vyu.tracker\n'
+                  'loaded = [name for name in ("scipy.ndimage", "imageio", '
+                  '"skimage")\n'
+                  '          if type(sys.modules.get(name)).__name__ == '
+                  '"module"]\n'
+                  'print(",".join(loaded))')
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(output.strip(), b'')
+
+    def test_module_is_loaded_on_first_use(self):
+        script = ('import sys\n'
+                  'from vyu.lazy import lazy_import\n'
+                  'module = lazy_import("colorsys")\n'
+                  'print(type(module).__name__)\n'
+                  'module.rgb_to_hsv\n'
+                  'print(type(module).__name__)')
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(output.split(), [b'_LazyModule', b'module'])
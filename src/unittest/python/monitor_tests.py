@@ -0,0 +1,149 @@
+from unittest import TestCase, mock, skipIf
+from multiprocessing import Process
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import image, monitor
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+except ImportError:
+    matplotlib = None
+
+
+def make_frame(shape=(480, 640)):
+    frame = np.zeros(shape + (3,), 'uint8')
+    frame[200:240, 300:340] = 230
+    return frame
+
+
+def publish(buffer, frame):
+    buffer.write(5., (220., 320.), frame, 0.5)
+
+
+class TestMonitorBuffer(TestCase):
+
+    def setUp(self):
+        self.buffer = monitor.MonitorBuffer((120, 160))
+        self.frame = make_frame()
+
+    def tearDown(self):
+        self.buffer.close()
+        self.buffer.unlink()
+
+    def test_read_returns_downsampled_frame_mask_and_position(self):
+        self.assertTrue(self.buffer.write(5., (220., 320.), self.frame, 0.5))
+        count, timestamp, position, preview, mask = self.buffer.read()
+        self.assertEqual(count, 2)
+        self.assertEqual(timestamp, 5.)
+        npt.assert_array_equal(position, (55., 80.))
+        npt.assert_array_equal(preview, self.frame[::4, ::4])
+        self.assertEqual(mask.sum(), 100)
+        self.assertTrue(mask[55, 80])
+
+    def test_preview_keeps_aspect_ratio(self):
+        self.buffer.write(0., (0., 0.), make_frame((480, 480)), 0.5)
+        _, _, _, preview, mask = self.buffer.read()
+        self.assertEqual(preview.shape, (120, 120, 3))
+        self.assertEqual(mask.shape, (120, 120))
+
+    def test_mono_frames(self):
+        self.buffer.write(0., (0., 0.), self.frame[..., 0], 128,
+                          image.UInt8Grayscale())
+        _, _, _, preview, mask = self.buffer.read()
+        npt.assert_array_equal(preview[..., 2], self.frame[::4, ::4, 0])
+        self.assertEqual(mask.sum(), 100)
+
+    def test_mask_uses_given_grayscale_and_threshold(self):
+        self.buffer.write(0., (0., 0.), self.frame, 230,
+                          image.UInt8Grayscale())
+        self.assertFalse(self.buffer.read()[4].any())
+
+    def test_read_only_returns_new_frames(self):
+        self.assertIsNone(self.buffer.read())
+        publish(self.buffer, self.frame)
+        count = self.buffer.read()[0]
+        self.assertIsNone(self.buffer.read(count))
+
+    def test_read_skips_frame_that_is_being_written(self):
+        publish(self.buffer, self.frame)
+        self.buffer._count[0] += 1
+        self.assertIsNone(self.buffer.read())
+
+    def test_write_skips_frame_if_other_writer_is_busy(self):
+        with self.buffer.lock:
+            self.assertFalse(self.buffer.write(0., (0., 0.), self.frame, .5))
+        self.assertEqual(self.buffer.count, 0)
+
+    def test_frames_written_by_other_process_are_visible(self):
+        writer = Process(target=publish, args=(self.buffer, self.frame))
+        writer.start()
+        writer.join()
+        npt.assert_array_equal(self.buffer.read()[3], self.frame[::4, ::4])
+
+
+class TestMonitoredLocator(TestCase):
+
+    def setUp(self):
+        self.buffer = mock.Mock()
+        self.locate = mock.Mock(return_value=(1., 2.))
+        self.locator = monitor.MonitoredLocator(self.locate, self.buffer,
+                                                thres=.3, interval=.1)
+
+    @mock.patch('vyu.monitor.time.perf_counter')
+    def test_publishes_at_most_once_per_interval(self, mock_clock):
+        mock_clock.side_effect = [1., 1.05, 1.1]
+        for _ in range(3):
+            self.assertEqual(self.locator('frame'), (1., 2.))
+        self.assertEqual(self.buffer.write.call_count, 2)
+        self.assertEqual(self.buffer.write.call_args[0][1:4],
+                         ((1., 2.), 'frame', .3))
+
+    def test_uses_threshold_and_grayscale_of_locator(self):
+        self.locate.threshold = 130
+        locator = monitor.MonitoredLocator(self.locate, self.buffer)
+        locator('frame')
+        self.assertEqual(self.buffer.write.call_args[0][3:],
+                         (130, self.locate.grayscale))
+
+    def test_defaults_to_image2position(self):
+        locator = monitor.MonitoredLocator(lambda frame: (1., 2.),
+                                           self.buffer)
+        locator('frame')
+        self.assertEqual(self.buffer.write.call_args[0][3:],
+                         (0.5, image.rgb2gray))
+
+    @mock.patch('vyu.monitor.time.perf_counter')
+    def test_errors_do_not_reach_tracking(self, mock_clock):
+        mock_clock.side_effect = [1., 1.05, 1.1]
+        self.buffer.write.side_effect = ValueError
+        for _ in range(3):
+            self.assertEqual(self.locator('frame'), (1., 2.))
+        self.assertEqual(self.locator.errors, 2)
+        self.assertIsInstance(self.locator.last_error, ValueError)
+
+    @mock.patch('vyu.monitor.time.perf_counter')
+    def test_retries_if_buffer_was_busy(self, mock_clock):
+        mock_clock.side_effect = [1., 1.01]
+        self.buffer.write.side_effect = [False, True]
+        self.locator('frame')
+        self.locator('frame')
+        self.assertEqual(self.buffer.write.call_count, 2)
+
+
+@skipIf(matplotlib is None, 'matplotlib not installed')
+class TestRunMonitor(TestCase):
+
+    def test_draws_until_stopped(self):
+        buffer = monitor.MonitorBuffer((120, 160))
+        publish(buffer, make_frame())
+        stop = mock.Mock()
+        stop.is_set.side_effect = [False, False, True]
+        try:
+            monitor.run_monitor(buffer, stop, interval=0.)
+        finally:
+            buffer.close()
+            buffer.unlink()
+        self.assertEqual(stop.is_set.call_count, 3)
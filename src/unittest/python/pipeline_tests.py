@@ -0,0 +1,180 @@
+from unittest import TestCase, mock
+from multiprocessing import Queue, Value
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import pipeline
+
+
+def brightness(frame):
+    return frame.max(), frame.min()
+
+
+def fail_on_five(frame):
+    if frame.max() == 5:
+        raise ValueError('no pupil')
+    return brightness(frame)
+
+
+def failing_reader(frames):
+    yield from frames
+    raise OSError('camera unplugged')
+
+
+class TestFramePipeline(TestCase):
+
+    def setUp(self):
+        self.frames = [np.full((4, 5, 3), i, 'uint8') for i in range(20)]
+
+    def test_results_are_in_frame_order(self):
+        source = pipeline.FramePipeline(self.frames, brightness, nworkers=3,
+                                        size=32, nslots=20)
+        source.start()
+        source.join(5)
+        source.stop()
+
+        timestamps, positions, count = source.samples.get_since(0)
+        self.assertEqual(count, 20)
+        self.assertEqual(source.dropped_frames, 0)
+        npt.assert_array_equal(positions[:, 0], np.arange(20))
+        self.assertTrue((np.diff(timestamps) >= 0).all())
+        self.assertTrue(source.samples.closed)
+
+    def test_iteration_ends_with_reader(self):
+        source = pipeline.FramePipeline(self.frames, brightness, nworkers=2,
+                                        nslots=20)
+        samples = iter(source)
+        source.start()
+        positions = [position for _, position in samples]
+        source.stop()
+        self.assertEqual(len(positions), 20)
+
+    def test_worker_errors_reach_consumers(self):
+        source = pipeline.FramePipeline(self.frames, fail_on_five,
+                                        nworkers=2, nslots=20)
+        samples = iter(source)
+        source.start()
+        with self.assertRaises(ValueError):
+            list(samples)
+        with self.assertRaises(ValueError):
+            source.stop()
+        self.assertIsNone(source._slots.shm.buf)
+
+    def test_reader_errors_reach_consumers(self):
+        source = pipeline.FramePipeline(failing_reader(self.frames[:3]),
+                                        brightness, nworkers=1,
+                                        frame_shape=(4, 5, 3))
+        samples = iter(source)
+        source.start()
+        with self.assertRaises(OSError):
+            list(samples)
+        with self.assertRaises(OSError):
+            source.stop()
+
+    def test_frame_shape_is_taken_from_reader(self):
+        source = pipeline.FramePipeline(self.frames, brightness)
+        with mock.patch('vyu.pipeline.SharedRing') as mock_ring, \
+                mock.patch('vyu.pipeline.Process'), \
+                mock.patch('vyu.pipeline.threading.Thread'):
+            source.start()
+        mock_ring.assert_called_once_with(source.nslots, (4, 5, 3))
+
+
+class TestReadFrames(TestCase):
+
+    def test_drops_frames_without_free_slot(self):
+        slots = mock.Mock()
+        slots.frames = np.zeros((1, 4, 5, 3), 'uint8')
+        busy_slots = [0]
+        tasks = mock.Mock()
+        stop = mock.Mock()
+        stop.is_set.return_value = False
+        dropped_frames = Value('q', 0)
+
+        frames = [np.full((4, 5, 3), i, 'uint8') for i in range(1, 4)]
+        pipeline.read_frames(frames, slots, busy_slots, tasks, stop,
+                             dropped_frames, 2)
+
+        self.assertEqual(dropped_frames.value, 2)
+        self.assertEqual(busy_slots, [1])
+        npt.assert_array_equal(slots.frames[0], 1)
+        self.assertEqual(tasks.put.call_args_list[0][0][0][:2], (0, 0))
+        # One sentinel per worker
+        self.assertEqual(tasks.put.call_args_list[1:],
+                         [mock.call(None)]*2)
+
+    def test_reader_errors_are_put_into_results(self):
+        tasks = mock.Mock()
+        results = mock.Mock()
+        pipeline.read_frames(failing_reader([]), mock.Mock(), [0], tasks,
+                             mock.Mock(), Value('q', 0), 2, results=results)
+        self.assertIsInstance(results.put.call_args[0][0], OSError)
+        self.assertEqual(tasks.put.call_args_list, [mock.call(None)]*2)
+
+    def test_waits_for_free_slot_instead_of_dropping(self):
+        slots = mock.Mock()
+        slots.frames = np.zeros((1, 4, 5, 3), 'uint8')
+        busy_slots = [0]
+        tasks = mock.Mock()
+        # A worker releases the slot whenever a task is queued
+        tasks.put.side_effect = lambda task: busy_slots.__setitem__(0, 0)
+        stop = mock.Mock()
+        stop.is_set.return_value = False
+        dropped_frames = Value('q', 0)
+
+        frames = [np.full((4, 5, 3), i, 'uint8') for i in range(1, 4)]
+        with mock.patch('vyu.pipeline.find_free_slot',
+                        side_effect=[None, 0, 0, None, None, 0]):
+            pipeline.read_frames(frames, slots, busy_slots, tasks, stop,
+                                 dropped_frames, 1, drop_frames=False)
+
+        self.assertEqual(dropped_frames.value, 0)
+        self.assertEqual([c[0][0][0] for c in tasks.put.call_args_list[:3]],
+                         [0, 1, 2])
+
+
+class TestFindFreeSlot(TestCase):
+
+    def test_returns_first_free_slot(self):
+        self.assertEqual(pipeline.find_free_slot([1, 0, 0]), 1)
+
+    def test_returns_none_if_all_slots_are_busy(self):
+        self.assertIsNone(pipeline.find_free_slot([1, 1]))
+
+
+class TestProcessFrames(TestCase):
+
+    def test_releases_slots_and_reports_results(self):
+        slots = mock.Mock()
+        slots.frames = np.arange(2*3).reshape((2, 3))
+        tasks = Queue()
+        for task in [(0, 1, 5.), None]:
+            tasks.put(task)
+        results = mock.Mock()
+        busy_slots = [0, 1]
+
+        pipeline.process_frames(slots, tasks, results, busy_slots,
+                                brightness)
+
+        self.assertEqual(busy_slots, [0, 0])
+        self.assertEqual(results.put.call_args_list,
+                         [mock.call((0, 5., (5, 3))), mock.call(None)])
+
+    def test_errors_release_slots_and_are_reported(self):
+        slots = mock.Mock()
+        slots.frames = np.array([[1, 5], [1, 2]])
+        tasks = Queue()
+        for task in [(0, 0, 5.), (1, 1, 6.), None]:
+            tasks.put(task)
+        results = mock.Mock()
+        busy_slots = [1, 1]
+
+        pipeline.process_frames(slots, tasks, results, busy_slots,
+                                fail_on_five)
+
+        self.assertEqual(busy_slots, [0, 0])
+        self.assertIsInstance(results.put.call_args_list[0][0][0],
+                              ValueError)
+        self.assertEqual(results.put.call_args_list[1:],
+                         [mock.call((1, 6., (2, 1))), mock.call(None)])
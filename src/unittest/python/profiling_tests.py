@@ -0,0 +1,87 @@
+import pickle
+import threading
+from unittest import TestCase, mock
+
+from vyu import profiling
+
+
+class TestStageStats(TestCase):
+
+    def setUp(self):
+        self.stats = profiling.StageStats()
+
+    def test_empty_stats(self):
+        self.assertIsNone(self.stats.percentile(50))
+        self.assertEqual(self.stats.summary(), {'count': 0})
+
+    def test_summary(self):
+        for duration in [1000, 2000, 3000]:
+            self.stats.add(duration)
+        summary = self.stats.summary()
+        self.assertEqual(summary['count'], 3)
+        self.assertAlmostEqual(summary['mean_us'], 2.)
+        self.assertEqual(summary['min_us'], 1.)
+        self.assertEqual(summary['max_us'], 3.)
+
+    def test_percentiles_are_accurate_to_bin_width(self):
+        for duration in range(1000, 101000, 1000):
+            self.stats.add(duration)
+        for q in [10, 50, 90]:
+            exact = 1000*q
+            self.assertGreaterEqual(self.stats.percentile(q), exact)
+            self.assertLessEqual(self.stats.percentile(q), 1.13*exact)
+
+    def test_percentile_of_durations_beyond_last_bin(self):
+        self.stats.add(10**11)
+        self.assertEqual(self.stats.percentile(99), 10**11)
+
+
+class TestProfiler(TestCase):
+
+    def setUp(self):
+        self.profiler = profiling.Profiler()
+
+    @mock.patch('vyu.profiling.time.perf_counter_ns')
+    def test_record_adds_duration_to_stage(self, mock_time):
+        mock_time.return_value = 5000
+        self.assertEqual(self.profiler.record('grayscale', 2000), 5000)
+        self.assertEqual(self.profiler.stages['grayscale'].total_ns, 3000)
+
+    @mock.patch('vyu.profiling.time.perf_counter_ns')
+    def test_fps(self, mock_time):
+        self.assertIsNone(self.profiler.fps)
+        mock_time.side_effect = [0, 10**9, 2*10**9]
+        for _ in range(3):
+            self.profiler.count_frame()
+        self.assertEqual(self.profiler.fps, 1.)
+
+    def test_stats(self):
+        self.profiler.record('capture', 0)
+        stats = self.profiler.stats()
+        self.assertEqual(list(stats['stages']), ['capture'])
+        self.assertEqual(stats['frames'], 0)
+        self.assertEqual(stats['dropped_frames'], 0)
+
+    def test_reset(self):
+        self.profiler.record('capture', 0)
+        self.profiler.count_frame()
+        self.profiler.reset()
+        self.assertEqual(self.profiler.stats()['frames'], 0)
+        self.assertFalse(self.profiler.stages)
+
+    def test_concurrent_records_are_all_counted(self):
+        def record():
+            for _ in range(10000):
+                self.profiler.record('capture', 0)
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.profiler.stages['capture'].count, 40000)
+
+    def test_pickle(self):
+        self.profiler.record('capture', 0)
+        profiler = pickle.loads(pickle.dumps(self.profiler))
+        self.assertEqual(profiler.stages['capture'].count, 1)
+        profiler.record('capture', 0)
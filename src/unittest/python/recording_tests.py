@@ -0,0 +1,96 @@
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import recording
+
+
+class TestGazeRecorder(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'gaze.npy')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, recorder, nsamples):
+        for i in range(nsamples):
+            recorder.record(float(i), (i, -i), (2*i, 0), i % 3)
+
+    def test_recording_is_valid_npy_file(self):
+        with recording.GazeRecorder(self.path, block_size=4) as recorder:
+            self.record(recorder, 10)
+
+        samples = np.load(self.path)
+        self.assertEqual(samples.dtype, recording.RECORD_DTYPE)
+        npt.assert_array_equal(samples['timestamp'], np.arange(10))
+        npt.assert_array_equal(samples['image'][:, 1], -np.arange(10))
+        npt.assert_array_equal(samples['screen'][:, 0], 2*np.arange(10))
+        npt.assert_array_equal(samples['flags'], np.arange(10) % 3)
+
+    def test_load_recording_memory_maps_file(self):
+        with recording.GazeRecorder(self.path, block_size=4) as recorder:
+            self.record(recorder, 6)
+        samples = recording.load_recording(self.path)
+        self.assertIsInstance(samples, np.memmap)
+        self.assertEqual(len(samples), 6)
+
+    def test_load_unclosed_recording(self):
+        recorder = recording.GazeRecorder(self.path, block_size=4)
+        self.record(recorder, 9)
+        recorder.flush()
+        self.assertEqual(len(recording.load_recording(self.path)), 8)
+        recorder.close()
+        self.assertEqual(len(recording.load_recording(self.path)), 9)
+
+    def test_load_empty_recording(self):
+        recording.GazeRecorder(self.path).close()
+        self.assertEqual(len(recording.load_recording(self.path)), 0)
+
+    def test_drops_samples_when_writer_falls_behind(self):
+        # Stall the writer so that blocks are not returned
+        resume = threading.Event()
+        write = recording.GazeRecorder._write
+
+        def stalled_write(recorder):
+            resume.wait()
+            write(recorder)
+
+        with mock.patch.object(recording.GazeRecorder, '_write',
+                               stalled_write):
+            recorder = recording.GazeRecorder(self.path, block_size=2,
+                                              nblocks=1)
+        self.record(recorder, 5)
+        resume.set()
+        recorder.close()
+        self.assertEqual(recorder.dropped_samples, 3)
+        self.assertEqual(len(np.load(self.path)), 2)
+
+    def test_samples_after_close_are_dropped(self):
+        recorder = recording.GazeRecorder(self.path, block_size=4)
+        self.record(recorder, 3)
+        recorder.close()
+        self.record(recorder, 2)
+        recorder.close()
+        self.assertEqual(recorder.dropped_samples, 2)
+        self.assertEqual(len(np.load(self.path)), 3)
+
+    def test_close_races_with_record(self):
+        recorder = recording.GazeRecorder(self.path, block_size=4, nblocks=64)
+        thread = threading.Thread(target=self.record, args=(recorder, 100))
+        thread.start()
+        recorder.close()
+        thread.join()
+        self.assertEqual(len(np.load(self.path)) + recorder.dropped_samples,
+                         100)
+
+    def test_header_has_fixed_size(self):
+        for nsamples in [0, 10**9]:
+            self.assertEqual(len(recording.npy_header(nsamples)),
+                             recording.HEADER_SIZE)
@@ -0,0 +1,94 @@
+from unittest import TestCase
+from multiprocessing import Process
+import pickle
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import sharedmem
+
+
+def fill_ring(ring, n):
+    for i in range(n):
+        ring.put((i, -i), float(i), np.full(ring.frame_shape, i, 'uint8'))
+
+
+class TestSharedRing(TestCase):
+
+    def setUp(self):
+        self.ring = sharedmem.SharedRing(4, frame_shape=(2, 3))
+
+    def tearDown(self):
+        self.ring.close()
+        self.ring.unlink()
+
+    def test_latest_returns_newest_sample(self):
+        fill_ring(self.ring, 6)
+        timestamp, position = self.ring.latest()
+        self.assertEqual(timestamp, 5.)
+        npt.assert_array_equal(position, (5, -5))
+        npt.assert_array_equal(self.ring.frames[5 % 4], 5)
+
+    def test_latest_on_empty_ring_raises(self):
+        with self.assertRaises(IndexError):
+            self.ring.latest()
+
+    def test_cursor_reads_new_samples_in_order(self):
+        cursor = self.ring.cursor()
+        fill_ring(self.ring, 2)
+        self.assertFalse(cursor.empty())
+        npt.assert_array_equal(cursor.get(), (0, 0))
+        npt.assert_array_equal(cursor.get(), (1, -1))
+        self.assertTrue(cursor.empty())
+        with self.assertRaises(IndexError):
+            cursor.get()
+
+    def test_cursor_skips_overwritten_samples(self):
+        cursor = self.ring.cursor()
+        fill_ring(self.ring, 10)
+        timestamps = []
+        while not cursor.empty():
+            timestamps.append(cursor.get_timestamped()[0])
+        self.assertEqual(timestamps, [7., 8., 9.])
+
+    def test_get_recent_returns_newest_samples(self):
+        cursor = self.ring.cursor()
+        fill_ring(self.ring, 10)
+        timestamps, positions = cursor.get_recent(2)
+        npt.assert_array_equal(timestamps, [8., 9.])
+        npt.assert_array_equal(positions, [(8, -8), (9, -9)])
+        self.assertTrue(cursor.empty())
+        self.assertEqual(len(cursor.get_recent(2)[0]), 0)
+
+    def test_get_recent_selects_samples_up_to_time_stamp(self):
+        cursor = self.ring.cursor()
+        fill_ring(self.ring, 4)
+        timestamps, positions = cursor.get_recent(2, until=2.)
+        npt.assert_array_equal(timestamps, [1., 2.])
+        npt.assert_array_equal(positions, [(1, -1), (2, -2)])
+        self.assertTrue(cursor.empty())
+
+    def test_get_recent_skips_overwritten_samples(self):
+        cursor = self.ring.cursor()
+        fill_ring(self.ring, 10)
+        npt.assert_array_equal(cursor.get_recent(8)[0], [7., 8., 9.])
+
+    def test_samples_written_by_other_process_are_visible(self):
+        writer = Process(target=fill_ring, args=(self.ring, 3))
+        writer.start()
+        writer.join()
+        self.assertEqual(self.ring.count, 3)
+        npt.assert_array_equal(self.ring.frames[2], 2)
+
+    def test_unpickled_ring_attaches_to_same_memory(self):
+        other = pickle.loads(pickle.dumps(self.ring))
+        other.put((1, 2), 3.)
+        self.assertEqual(self.ring.latest()[0], 3.)
+        self.assertEqual(other.frames.shape, self.ring.frames.shape)
+        other.close()
+
+    def test_close_releases_views(self):
+        other = pickle.loads(pickle.dumps(self.ring))
+        other.close()
+        self.assertIsNone(other.frames)
+        self.assertIsNone(other.positions)
@@ -0,0 +1,80 @@
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import sources
+
+
+class TestIterTimestamped(TestCase):
+
+    @mock.patch('vyu.sources.time.time')
+    def test_plain_readers_are_stamped_on_arrival(self, mock_time):
+        mock_time.side_effect = [1., 2.]
+        self.assertEqual(list(sources.iter_timestamped(['a', 'b'])),
+                         [(1., 'a'), (2., 'b')])
+
+
+class TestRawVideo(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'video.npy')
+        self.frames = np.random.randint(0, 256, size=(5, 6, 8, 3),
+                                        dtype='uint8')
+        self.reader = mock.MagicMock(sources.FrameSource)
+        self.reader.iter_timestamped.return_value = iter(
+            zip(0.25*np.arange(5), self.frames))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self):
+        with sources.RawVideoRecorder(self.reader, self.path) as recorder:
+            return list(recorder)
+
+    def test_recorder_passes_frames_through(self):
+        frames = self.record()
+        self.assertEqual(len(frames), 5)
+        npt.assert_array_equal(frames[2], self.frames[2])
+
+    def test_replay_gives_recorded_frames_and_timestamps(self):
+        self.record()
+        reader = sources.RawVideoReader(self.path)
+        self.assertEqual(len(reader), 5)
+        timestamps, frames = zip(*reader.iter_timestamped())
+        npt.assert_array_equal(timestamps, 0.25*np.arange(5))
+        npt.assert_array_equal(np.array(frames), self.frames)
+        npt.assert_array_equal(reader.get_data(3), self.frames[3])
+
+    def test_replayed_frames_are_memory_mapped(self):
+        self.record()
+        reader = sources.RawVideoReader(self.path)
+        frame = next(iter(reader))
+        self.assertIsInstance(frame.base, np.memmap)
+
+    def test_recording_is_valid_npy_file(self):
+        self.record()
+        records = np.load(self.path)
+        self.assertEqual(records.shape, (5,))
+        npt.assert_array_equal(records['frame'], self.frames)
+
+    @mock.patch('vyu.sources.time.sleep')
+    @mock.patch('vyu.sources.time.perf_counter')
+    def test_realtime_replay_waits_for_original_intervals(self,
+                                                          mock_clock,
+                                                          mock_sleep):
+        self.record()
+        mock_clock.return_value = 10.
+        reader = sources.RawVideoReader(self.path, realtime=True)
+        list(reader)
+        self.assertEqual(mock_sleep.mock_calls,
+                         [mock.call(0.25), mock.call(0.5),
+                          mock.call(0.75), mock.call(1.)])
+
+    def test_closing_without_frames_writes_nothing(self):
+        sources.RawVideoRecorder([], self.path).close()
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+import numpy as np
+import numpy.testing as npt
+
+from vyu import synthetic
+from vyu.image import image2position
+
+
+class TestMakeEyeFrame(TestCase):
+
+    def test_frame_is_rgb_uint8(self):
+        frame = synthetic.make_eye_frame((48, 64))
+        self.assertEqual(frame.shape, (48, 64, 3))
+        self.assertEqual(frame.dtype, np.uint8)
+
+    def test_pupil_is_found_at_center(self):
+        frame = synthetic.make_eye_frame((120, 160), center=(30, 100),
+                                         noise=10, glints=20)
+        npt.assert_allclose(image2position(frame), (30, 100), atol=.1)
+
+    def test_same_rng_state_gives_same_frame(self):
+        frames = [synthetic.make_eye_frame(
+                  noise=5, glints=3, rng=np.random.RandomState(1))
+                  for _ in range(2)]
+        npt.assert_array_equal(*frames)
+
+
+class TestMakeTrajectory(TestCase):
+
+    def test_jump_at_onset(self):
+        trajectory = synthetic.make_trajectory(4, (1, 1), (5, 6), 2)
+        npt.assert_array_equal(trajectory, [[1, 1], [1, 1], [5, 6], [5, 6]])
+
+
+class TestSyntheticReader(TestCase):
+
+    def test_renders_frames_along_trajectory(self):
+        reader = synthetic.SyntheticReader([(20, 30), (40, 50)],
+                                           shape=(60, 80))
+        positions = [image2position(frame) for frame in reader]
+        npt.assert_allclose(positions, [(20, 30), (40, 50)], atol=.1)
+
+    def test_calls_on_frame_before_frame_is_delivered(self):
+        reader = synthetic.SyntheticReader([(20, 30)] * 3, shape=(60, 80))
+        delivered = []
+        reader.on_frame = delivered.append
+        for i, _ in enumerate(reader):
+            self.assertEqual(delivered[-1], i)
@@ -53,7 +53,7 @@ class TimerTests(TestCase):
 
         self.assertEqual(t.start_or_check(0.2), t.check_time.return_value)
 
-        t.start.assert_called_once_with()
+        t.start.assert_called_once_with(None)
 
     def test_start_or_check_if_running(self):
         t = timer.Timer()
@@ -66,3 +66,21 @@ class TimerTests(TestCase):
         self.assertEqual(t.start_or_check(0.2), t.check_time.return_value)
 
         t.start.assert_not_called()
+
+    def test_start_with_timestamp(self):
+        t = timer.Timer()
+        t.start(3.)
+        self.assertEqual(t.t0, 3.)
+
+    @mock.patch('vyu.timer.time.time')
+    def test_check_time_with_timestamp(self, mock_time):
+        t = timer.Timer()
+        t.start(1.)
+        self.assertTrue(t.check_time(2, 3.))
+        self.assertFalse(t.check_time(2, 2.))
+        mock_time.assert_not_called()
+
+    def test_start_or_check_with_timestamps(self):
+        t = timer.Timer()
+        self.assertFalse(t.start_or_check(1., 5.))
+        self.assertTrue(t.start_or_check(1., 6.))
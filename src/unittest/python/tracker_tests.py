@@ -1,7 +1,15 @@
 from unittest import TestCase, mock
-import signal
 
-from vyu import tracker
+import numpy as np
+
+from vyu import area, events, image, sources, tracker
+
+
+def make_frame(center=(60, 80), radius=10):
+    xx, yy = np.mgrid[:120, :160]
+    frame = np.zeros((120, 160, 3), 'uint8')
+    frame[(xx - center[0])**2 + (yy - center[1])**2 <= radius**2] = 230
+    return frame
 
 
 class TestTrackerWaitForFixation(TestCase):
@@ -28,6 +36,24 @@ class TestTrackerWaitForFixation(TestCase):
         tracker.EyeTracker('ANY_CAMERA')
         self.mock_get_reader.assert_called_once_with('ANY_CAMERA')
 
+    def test_init_accepts_open_reader(self):
+        reader = mock.MagicMock()
+        T = tracker.EyeTracker(reader)
+        self.assertIs(T.reader, reader)
+        self.mock_get_reader.assert_not_called()
+
+    def test_init_uses_custom_locator(self):
+        locate = mock.Mock()
+        T = tracker.EyeTracker('ANY_CAMERA', locate=locate)
+        T.image2screen = mock.Mock()
+        self.mock_area.__contains__.return_value = True
+        self.mock_timer_instance.start_or_check.return_value = True
+
+        T.wait_for_fixation(self.mock_area)
+
+        locate.assert_called_once_with(self.frames[0])
+        self.mock_i2pos.assert_not_called()
+
     def test_time_is_up(self):
         patience = 0.2
 
@@ -44,7 +70,7 @@ class TestTrackerWaitForFixation(TestCase):
         self.mock_area.__contains__.assert_called_once_with(
             T.image2screen.return_value)
         self.mock_timer_instance.start_or_check.assert_called_once_with(
-            patience)
+            patience, mock.ANY)
 
     def test_time_is_after_second_frame(self):
         patience = 0.2
@@ -63,6 +89,20 @@ class TestTrackerWaitForFixation(TestCase):
         self.assertEqual(
             len(self.mock_timer_instance.start_or_check.mock_calls), 2)
 
+    def test_timer_uses_frame_timestamps_of_frame_sources(self):
+        reader = mock.MagicMock(sources.FrameSource)
+        reader.iter_timestamped.return_value = iter(
+            [(10., self.frames[0]), (10.5, self.frames[1])])
+        T = tracker.EyeTracker(reader)
+        T.image2screen = mock.Mock()
+        self.mock_area.__contains__.return_value = True
+        self.mock_timer_instance.start_or_check.side_effect = [False, True]
+
+        T.wait_for_fixation(self.mock_area, 0.2)
+
+        self.assertEqual(self.mock_timer_instance.start_or_check.mock_calls,
+                         [mock.call(0.2, 10.), mock.call(0.2, 10.5)])
+
     def test_point_not_in_area(self):
         T = tracker.EyeTracker('ANY_CAMERA')
         T.image2screen = mock.Mock()
@@ -74,17 +114,83 @@ class TestTrackerWaitForFixation(TestCase):
         self.assertEqual(len(self.mock_timer_instance.clear.mock_calls), 2)
 
 
+class TestTrackerProfiling(TestCase):
+
+    def setUp(self):
+        self.mock_get_reader = mock.patch('vyu.tracker.imageio.get_reader',
+                                          mock.MagicMock()).start()
+        self.mock_get_reader.return_value.__iter__.return_value = ['frame']
+        self.mock_i2pos = mock.patch('vyu.tracker.image2position').start()
+        self.mock_i2pos.return_value = (1., 1.)
+        self.tracker = tracker.EyeTracker()
+        self.tracker.enable_profiling()
+
+    def tearDown(self):
+        self.tracker.disable_profiling()
+        mock.patch.stopall()
+
+    def test_enable_profiling_instruments_image2position(self):
+        self.tracker.current_eye_position
+        self.mock_i2pos.assert_called_once_with(
+            'frame', profiler=self.tracker.profiler)
+
+    def test_disable_profiling(self):
+        self.tracker.disable_profiling()
+        self.assertIsNone(self.tracker.profiler)
+        self.assertIs(self.tracker.locate, self.mock_i2pos)
+
+    def test_enable_profiling_instruments_locator(self):
+        locator = image.PupilLocator()
+        T = tracker.EyeTracker(locate=locator)
+        T.enable_profiling()
+        self.assertIs(locator.profiler, T.profiler)
+        T.disable_profiling()
+        self.assertIsNone(locator.profiler)
+
+    def test_trackers_are_profiled_separately(self):
+        other = tracker.EyeTracker(locate=image.PupilLocator())
+        other.enable_profiling()
+        self.assertIsNot(other.locate.profiler, self.tracker.profiler)
+        self.assertEqual(self.tracker.locate.keywords,
+                         {'profiler': self.tracker.profiler})
+
+    def test_enable_profiling_instruments_monitored_locator(self):
+        self.tracker.disable_profiling()
+        self.tracker.locate = tracker.MonitoredLocator(
+            self.tracker.locate, mock.Mock())
+        self.tracker.enable_profiling()
+        self.assertEqual(self.tracker.locate.locate.keywords,
+                         {'profiler': self.tracker.profiler})
+
+    def test_records_capture_and_image2screen(self):
+        self.tracker.current_eye_position
+        stats = self.tracker.stats()
+        self.assertEqual(list(stats['stages']), ['capture', 'image2screen'])
+        self.assertEqual(stats['frames'], 1)
+
+    def test_stats_without_profiling_raise(self):
+        self.tracker.disable_profiling()
+        with self.assertRaises(RuntimeError):
+            self.tracker.stats()
+
+    def test_stats_report_dropped_frames_of_source(self):
+        self.tracker.source = mock.Mock()
+        self.tracker.source.dropped_frames = 3
+        self.assertEqual(self.tracker.stats()['dropped_frames'], 3)
+
+
 class TestTrackerCalibrate(TestCase):
 
     def setUp(self):
-        self.mock_queue = mock.patch('vyu.tracker.Queue').start()
+        self.mock_ring = mock.patch('vyu.tracker.SharedRing').start()
+        self.mock_event = mock.patch('vyu.tracker.Event').start()
         self.mock_process = mock.patch('vyu.tracker.Process').start()
         self.mock_get_reader = mock.patch(
             'vyu.tracker.imageio.get_reader').start()
         self.mock_estimate_matrices = mock.patch(
             'vyu.tracker.calibration.estimate_matrices').start()
         self.mock_estimate_matrices.return_value = ('ANY_MATRIX', 'ANY_VECTOR')
-        self.mock_kill = mock.patch('vyu.tracker.os.kill').start()
+        self.mock_process.return_value.is_alive.return_value = False
 
         self.tracker = tracker.EyeTracker()
 
@@ -94,21 +200,37 @@ class TestTrackerCalibrate(TestCase):
     def test_enter_starts_collector_process(self):
         mock_process_instance = self.mock_process.return_value
 
-        with self.tracker.calibrate():
+        with self.tracker.calibrate() as C:
+            self.mock_ring.assert_called_once_with(self.tracker.buffer_size)
             self.mock_process.assert_called_once_with(
                 target=tracker.collect_frames,
                 args=(self.mock_get_reader.return_value,
-                      self.mock_queue.return_value))
+                      self.mock_ring.return_value,
+                      tracker.image2position,
+                      self.mock_event.return_value))
             mock_process_instance.start.assert_called_once_with()
+            self.assertIs(C.queue,
+                          self.mock_ring.return_value.cursor.return_value)
 
-    def test_exit_stops_collector_process_and_kills(self):
+    def test_exit_stops_collector_process_cooperatively(self):
         mock_process_instance = self.mock_process.return_value
+        mock_stop = self.mock_event.return_value
 
         with self.tracker.calibrate():
-            mock_process_instance.terminate.assert_not_called()
+            mock_stop.set.assert_not_called()
+        mock_stop.set.assert_called_once_with()
+        mock_process_instance.join.assert_called_once_with(
+            self.tracker.shutdown_timeout)
+        mock_process_instance.terminate.assert_not_called()
+        self.mock_ring.return_value.unlink.assert_called_once_with()
+
+    def test_exit_terminates_stuck_collector_process(self):
+        mock_process_instance = self.mock_process.return_value
+        mock_process_instance.is_alive.return_value = True
+
+        with self.tracker.calibrate():
+            pass
         mock_process_instance.terminate.assert_called_once_with()
-        self.mock_kill.assert_called_once_with(mock_process_instance.pid,
-                                               signal.SIGKILL)
 
     def test_estimates_matrices_from_calibrator(self):
         with self.tracker.calibrate() as C:
@@ -119,6 +241,21 @@ class TestTrackerCalibrate(TestCase):
             C.target_locations,
             C.image_locations)
 
+    def test_calibrator_has_live_model_of_requested_order(self):
+        with self.tracker.calibrate(order=2) as C:
+            self.assertEqual(C.model.order, 2)
+
+    def test_sample_selection_is_passed_to_calibrator(self):
+        with self.tracker.calibrate(window=0.3, statistic='median') as C:
+            self.assertEqual(C.window, 0.3)
+            self.assertEqual(C.statistic, 'median')
+
+    def test_quadratic_calibration_replaces_affine_transformation(self):
+        with self.tracker.calibrate(order=2) as C:
+            pass
+        self.assertIs(self.tracker.calibration, C.model)
+        self.mock_estimate_matrices.assert_not_called()
+
     def test_assigns_transformation_matrices(self):
         with self.tracker.calibrate():
             pass
@@ -127,6 +264,101 @@ class TestTrackerCalibrate(TestCase):
         self.tracker.transform_bias = 'ANY_VECTOR'
 
 
+class TestTrackerCapture(TestCase):
+
+    def setUp(self):
+        self.mock_get_reader = mock.patch(
+            'vyu.tracker.imageio.get_reader').start()
+        self.mock_capture = mock.patch(
+            'vyu.tracker.BackgroundCapture').start()
+        self.mock_process = mock.patch('vyu.tracker.Process').start()
+        self.mock_estimate_matrices = mock.patch(
+            'vyu.tracker.calibration.estimate_matrices').start()
+        self.mock_estimate_matrices.return_value = ('ANY_MATRIX', 'ANY_VECTOR')
+
+        self.tracker = tracker.EyeTracker()
+        self.tracker.start_capture(size=10)
+        self.source = self.mock_capture.return_value
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_start_capture_starts_background_source(self):
+        self.mock_capture.assert_called_once_with(
+            self.mock_get_reader.return_value, self.tracker.locate, 10, None)
+        self.source.start.assert_called_once_with()
+
+    def test_start_pipeline_replaces_source(self):
+        with mock.patch('vyu.tracker.FramePipeline') as mock_pipeline:
+            self.tracker.start_pipeline(nworkers=4)
+        mock_pipeline.assert_called_once_with(
+            self.mock_get_reader.return_value, self.tracker.locate, 4, 64,
+            drop_frames=None)
+        mock_pipeline.return_value.start.assert_called_once_with()
+        self.assertIs(self.tracker.source, mock_pipeline.return_value)
+
+    def test_source_samples_are_recorded(self):
+        self.assertEqual(self.source.samples.listeners.append.call_args,
+                         mock.call(self.tracker._process_sample))
+
+    def test_stop_capture_stops_source(self):
+        self.tracker.stop_capture()
+        self.source.stop.assert_called_once_with()
+        self.assertIsNone(self.tracker.source)
+
+    def test_current_sample_uses_latest_sample(self):
+        self.source.latest.return_value = (5., (1., 2.))
+        timestamp, position = self.tracker.current_sample
+        self.assertEqual(timestamp, 5.)
+        self.assertEqual(tuple(position), (1., 2.))
+
+    def test_wait_for_fixation_consumes_source(self):
+        self.source.__iter__ = mock.Mock(
+            return_value=iter([(1., (0., 0.)), (2., (5., 5.))]))
+        area = mock.MagicMock()
+        area.__contains__.side_effect = [False, True]
+
+        with mock.patch('vyu.tracker.Timer') as mock_timer:
+            mock_timer.return_value.start_or_check.return_value = True
+            self.tracker.wait_for_fixation(area)
+
+        self.assertEqual(area.__contains__.call_count, 2)
+
+    def test_calibrate_reads_from_source_without_process(self):
+        with self.tracker.calibrate() as C:
+            self.assertIs(C.queue,
+                          self.source.samples.cursor.return_value)
+        self.mock_process.assert_not_called()
+        self.assertEqual(self.tracker.transform_matrix, 'ANY_MATRIX')
+
+
+class TestEndOfStream(TestCase):
+
+    def setUp(self):
+        frames = [np.zeros((4, 5, 3), 'uint8') for _ in range(5)]
+        self.tracker = tracker.EyeTracker(
+            frames, locate=lambda frame: (0., 0.))
+        self.target = area.Circle((100., 100.), 1.)
+
+    def test_wait_for_fixation_returns_after_capture(self):
+        self.tracker.start_capture()
+        self.tracker.wait_for_fixation(self.target)
+        self.tracker.stop_capture()
+        self.assertIsNone(self.tracker.last_fixation)
+
+    def test_wait_for_fixation_raises_locator_errors(self):
+        self.tracker.locate = mock.Mock(side_effect=ValueError)
+        self.tracker.start_capture()
+        with self.assertRaises(ValueError):
+            self.tracker.wait_for_fixation(self.target)
+
+    def test_wait_for_fixation_returns_after_pipeline(self):
+        self.tracker.start_pipeline(nworkers=1)
+        self.tracker.wait_for_fixation(self.target)
+        self.tracker.stop_capture()
+        self.assertIsNone(self.tracker.last_fixation)
+
+
 class TestCurrentEyePosition(TestCase):
 
     def setUp(self):
@@ -166,4 +398,321 @@ class TestCollectFrames(TestCase):
         self.assertEqual(mock_i2pos.call_count, 2)
         mock_i2pos.assert_has_calls([mock.call('frame1'),
                                      mock.call('frame2')])
-        mock_queue.put.assert_has_calls([mock.call(mock_i2pos.return_value)]*2)
+        mock_queue.put.assert_has_calls(
+            [mock.call(mock_i2pos.return_value, mock.ANY)]*2)
+
+    def test_collect_frames_uses_capture_time_stamps(self):
+        reader = mock.MagicMock(sources.FrameSource)
+        reader.iter_timestamped.return_value = iter([(3., 'frame1'),
+                                                     (4., 'frame2')])
+        mock_queue = mock.Mock()
+        locate = mock.Mock(side_effect=['pos1', 'pos2'])
+
+        tracker.collect_frames(reader, mock_queue, locate)
+
+        self.assertEqual(mock_queue.put.call_args_list,
+                         [mock.call('pos1', 3.), mock.call('pos2', 4.)])
+
+    def test_collect_frames_returns_when_stopped(self):
+        mock_reader = mock.MagicMock()
+        mock_reader.__iter__.return_value = ['frame1', 'frame2']
+        mock_queue = mock.Mock()
+        stop = mock.Mock()
+        stop.is_set.side_effect = [False, True]
+        locate = mock.Mock()
+
+        tracker.collect_frames(mock_reader, mock_queue, locate, stop)
+
+        locate.assert_called_once_with('frame1')
+
+
+class TestRecording(TestCase):
+
+    def setUp(self):
+        self.mock_get_reader = mock.patch('vyu.tracker.imageio.get_reader',
+                                          mock.MagicMock()).start()
+        self.mock_get_reader.return_value.__iter__.return_value = ['frame']
+        self.mock_i2pos = mock.patch('vyu.tracker.image2position').start()
+        self.mock_i2pos.return_value = np.array([1., 2.])
+        self.mock_recorder = mock.patch('vyu.tracker.GazeRecorder').start()
+        self.tracker = tracker.EyeTracker()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_samples_are_recorded(self):
+        self.tracker.start_recording('gaze.npy', block_size=10)
+        self.mock_recorder.assert_called_once_with('gaze.npy', block_size=10)
+        self.tracker.current_eye_position
+
+        (timestamp, image, screen, flags), _ = \
+            self.mock_recorder.return_value.record.call_args
+        np.testing.assert_array_equal(image, (1., 2.))
+        np.testing.assert_array_equal(screen, (1., 2.))
+        self.assertEqual(flags, 0)
+
+    def test_event_classes_are_recorded_as_flags(self):
+        self.tracker.enable_event_detection(50., 1.)
+        self.tracker.events.add = mock.Mock()
+        self.tracker.events.label = events.FIXATION
+        self.tracker.start_recording('gaze.npy')
+        self.tracker.current_eye_position
+
+        (timestamp, position), _ = self.tracker.events.add.call_args
+        np.testing.assert_array_equal(position, (1., 2.))
+        (_, _, _, flags), _ = self.mock_recorder.return_value.record.call_args
+        self.assertEqual(flags, events.FIXATION)
+
+    def test_stop_recording_closes_recorder(self):
+        self.tracker.start_recording('gaze.npy')
+        self.tracker.stop_recording()
+        self.mock_recorder.return_value.close.assert_called_once_with()
+        self.assertIsNone(self.tracker.recorder)
+
+
+class TestImage2Screen(TestCase):
+
+    def setUp(self):
+        mock.patch('vyu.tracker.imageio.get_reader').start()
+        self.tracker = tracker.EyeTracker()
+        self.tracker.transform_matrix = np.array([[1., 2.], [0., 1.]])
+        self.tracker.transform_bias = np.array([1., -1.])
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_images2screen_matches_image2screen(self):
+        points = np.array([(1., 2.), (3., -1.), (0., 0.)])
+        np.testing.assert_almost_equal(
+            self.tracker.images2screen(points),
+            [self.tracker.image2screen(point) for point in points])
+
+    def test_calibration_model_is_used_if_set(self):
+        self.tracker.calibration = mock.Mock()
+        self.assertIs(self.tracker.image2screen((1., 2.)),
+                      self.tracker.calibration.apply.return_value)
+        self.assertIs(self.tracker.images2screen([(1., 2.)]),
+                      self.tracker.calibration.apply.return_value)
+
+
+class TestDriftCorrection(TestCase):
+
+    def setUp(self):
+        mock.patch('vyu.tracker.imageio.get_reader').start()
+        self.tracker = tracker.EyeTracker()
+        self.tracker.transform_bias = np.array([1., 0.])
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_correct_drift_uses_last_fixation(self):
+        self.tracker.last_fixation = np.array([2., 2.])
+        self.tracker.drift = mock.Mock()
+        self.tracker.correct_drift((3., 3.))
+        (screen, target), _ = self.tracker.drift.add.call_args
+        np.testing.assert_array_equal(screen, (3., 2.))
+        self.assertEqual(target, (3., 3.))
+
+    def test_correct_drift_without_fixation_raises(self):
+        with self.assertRaises(ValueError):
+            self.tracker.correct_drift((3., 3.))
+
+    def test_drift_is_applied_after_calibration(self):
+        for _ in range(20):
+            self.tracker.correct_drift((0., 0.), np.array([0., 1.]))
+        np.testing.assert_allclose(
+            self.tracker.image2screen(np.array([0., 1.])), (0., 0.),
+            atol=.05)
+        np.testing.assert_allclose(
+            self.tracker.images2screen(np.array([[0., 1.]])), [(0., 0.)],
+            atol=.05)
+
+    def test_wait_for_fixation_remembers_fixation(self):
+        self.tracker.samples = mock.Mock(
+            return_value=iter([(0., np.array([5., 5.]))]))
+        self.tracker.wait_for_fixation(area.Circle((6., 5.), 1.), 0.)
+        np.testing.assert_array_equal(self.tracker.last_fixation, (5., 5.))
+
+    def test_new_calibration_resets_drift(self):
+        self.tracker.drift = mock.Mock()
+        calibrator = mock.Mock()
+        calibrator.model.order = 2
+        self.tracker._fit_calibration(calibrator)
+        self.tracker.drift.reset.assert_called_once_with()
+
+
+class TestWaitForAnyFixation(TestCase):
+
+    def setUp(self):
+        mock.patch('vyu.tracker.imageio.get_reader').start()
+        self.tracker = tracker.EyeTracker()
+        self.areas = [area.Circle((0, 0), 1), area.Circle((10, 0), 1)]
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def set_samples(self, positions, dt=0.125):
+        self.tracker.samples = mock.Mock(return_value=iter(
+            [(i*dt, np.array(position, 'd'))
+             for i, position in enumerate(positions)]))
+
+    def test_returns_fixated_area_and_timestamp(self):
+        self.set_samples([(5, 5), (10, 0), (10, 0.5), (10, 0), (10, 0)])
+        index, timestamp = self.tracker.wait_for_any_fixation(
+            self.areas, patience=0.25)
+        self.assertEqual(index, 1)
+        self.assertEqual(timestamp, 0.375)
+
+    def test_leaving_area_resets_its_timer(self):
+        self.set_samples([(0, 0), (0, 0), (10, 0), (0, 0), (0, 0), (0, 0)])
+        index, timestamp = self.tracker.wait_for_any_fixation(
+            self.areas, patience=0.2)
+        self.assertEqual(index, 0)
+        self.assertEqual(timestamp, 0.625)
+
+    def test_one_hit_test_per_frame(self):
+        self.set_samples([(0, 0), (0, 0)])
+        area_set = mock.Mock(spec=area.AreaSet)
+        area_set.find.return_value = [0]
+        self.tracker.wait_for_any_fixation(area_set, patience=0.1)
+        self.assertEqual(area_set.find.call_count, 2)
+
+    def test_returns_none_if_stream_ends(self):
+        self.set_samples([(5, 5)])
+        self.assertIsNone(self.tracker.wait_for_any_fixation(self.areas))
+
+
+class TestEventDetection(TestCase):
+
+    def setUp(self):
+        # Fixation at (0, 0), saccade, noisy fixation at (10, 10)
+        positions = [(0., 0.)]*10 + [(5., 5.)] + [(10., 10.)]*30
+        positions[20] = (11., 11.)
+        self.reader = mock.MagicMock(sources.FrameSource)
+        self.reader.iter_timestamped.return_value = iter(
+            (0.01*i, position) for i, position in enumerate(positions))
+        self.tracker = tracker.EyeTracker(self.reader,
+                                          locate=lambda frame: frame)
+        self.tracker.enable_event_detection(velocity_threshold=50.,
+                                            dispersion_threshold=1.)
+
+    def test_wait_for_fixation_waits_for_fixation_event(self):
+        self.tracker.wait_for_fixation(area.Circle((10., 10.), 1.), 0.15)
+        event = self.tracker.events.current
+        self.assertEqual(event.kind, events.FIXATION)
+        self.assertAlmostEqual(event.start, 0.15)
+        self.assertAlmostEqual(event.end, 0.3)
+
+    def test_fixation_outside_area_is_ignored(self):
+        self.tracker.wait_for_fixation(area.Circle((0., 0.), 1.), 0.2)
+        self.assertIsNone(self.tracker.last_fixation)
+
+    def test_fixation_of_previous_call_does_not_count(self):
+        positions = [(0., 0.)]*30 + [(20., 20.)]*30
+        samples = iter((0.01*i, position)
+                       for i, position in enumerate(positions))
+        self.reader.iter_timestamped.return_value = samples
+        target = area.Circle((0., 0.), 1.)
+        self.tracker.wait_for_fixation(target, 0.24)
+        self.assertEqual(tuple(self.tracker.last_fixation), (0., 0.))
+        # The eye leaves the target right after the first call
+        self.tracker.wait_for_fixation(target, 0.1)
+        self.assertEqual(tuple(self.tracker.last_fixation), (0., 0.))
+        self.assertEqual(list(samples), [])
+
+    def test_dark_frames_are_blinks(self):
+        frames = ([make_frame()]*10 + [np.zeros((120, 160, 3), 'uint8')]*5 +
+                  [make_frame()]*5)
+        self.reader.iter_timestamped.return_value = iter(
+            (0.01*i, frame) for i, frame in enumerate(frames))
+        self.tracker.locate = image.PupilLocator()
+        labels = []
+        for _ in self.tracker.samples():
+            labels.append(self.tracker.events.label)
+        self.assertEqual(labels[10:15], [events.BLINK]*5)
+        self.assertEqual(labels[9], events.FIXATION)
+
+    def test_detector_starts_over_after_gap(self):
+        for i in range(5):
+            self.tracker._process_sample(0.01*i, (0., 0.))
+        self.tracker._process_sample(1., (0., 0.))
+        self.assertEqual(self.tracker.events.count, 1)
+        self.assertIsNone(self.tracker.events.current)
+
+    def test_disable_event_detection(self):
+        self.tracker.disable_event_detection()
+        self.assertIsNone(self.tracker.events)
+
+
+class TestPrediction(TestCase):
+
+    def setUp(self):
+        self.reader = mock.MagicMock(sources.FrameSource)
+        self.reader.iter_timestamped.return_value = iter(
+            (0.01*i, (float(i), 0.)) for i in range(10))
+        self.tracker = tracker.EyeTracker(self.reader,
+                                          locate=lambda frame: frame)
+        self.tracker.enable_prediction(process_noise=1.,
+                                       measurement_noise=.01)
+
+    def test_predicts_gaze_at_future_time(self):
+        for _ in self.tracker.samples():
+            pass
+        np.testing.assert_almost_equal(self.tracker.predict_gaze(0.12),
+                                       (12., 0.), decimal=1)
+
+    def test_gaze_region_contains_prediction(self):
+        for _ in self.tracker.samples():
+            pass
+        self.assertIn((12., 0.), self.tracker.gaze_region(0.12))
+
+    @mock.patch('vyu.tracker.time.time')
+    def test_predicts_for_now_by_default(self, mock_time):
+        mock_time.return_value = 0.09
+        for _ in self.tracker.samples():
+            pass
+        np.testing.assert_almost_equal(self.tracker.predict_gaze(),
+                                       (9., 0.), decimal=1)
+
+    def test_disable_prediction(self):
+        self.tracker.disable_prediction()
+        self.assertIsNone(self.tracker.prediction)
+
+
+class TestMonitor(TestCase):
+
+    def setUp(self):
+        self.mock_process = mock.patch('vyu.tracker.Process').start()
+        self.mock_buffer = mock.patch('vyu.tracker.MonitorBuffer').start()
+        self.mock_process.return_value.is_alive.return_value = False
+        self.locate = mock.Mock()
+        self.tracker = tracker.EyeTracker(mock.MagicMock(), self.locate)
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_start_monitor_publishes_from_locator(self):
+        self.tracker.start_monitor(thres=0.3)
+        self.mock_process.return_value.start.assert_called_once_with()
+        self.assertIs(self.tracker.locate.locate, self.locate)
+        self.assertIs(self.tracker.locate.buffer,
+                      self.mock_buffer.return_value)
+        self.assertEqual(self.tracker.locate.thres, 0.3)
+
+    def test_stop_monitor_restores_locator(self):
+        self.tracker.start_monitor()
+        _, stop, _ = self.tracker.monitor
+        self.tracker.stop_monitor()
+        self.assertIs(self.tracker.locate, self.locate)
+        self.assertTrue(stop.is_set())
+        self.mock_buffer.return_value.unlink.assert_called_once_with()
+
+    def test_stop_monitor_without_monitor_raises(self):
+        with self.assertRaises(RuntimeError):
+            self.tracker.stop_monitor()
+        self.assertIs(self.tracker.locate, self.locate)
+
+    def test_monitor_must_be_started_before_capture(self):
+        self.tracker.source = mock.Mock()
+        with self.assertRaises(RuntimeError):
+            self.tracker.start_monitor()